@@ -0,0 +1,428 @@
+"""
+Benchmarks of the process, transform and render stages on synthetic inputs shaped like
+the raw Stats NZ files, at several multiples of their current size.
+
+    python cli.py benchmark                        # every stage at 1x, 10x and 100x
+    python cli.py benchmark --scales 1 10 --stages cpi-process cpi-transform
+    python cli.py benchmark --save-baseline        # record the results as the baseline
+
+Each stage runs in a fresh copy of its project under .benchmark/, with the synthetic
+files in place of the raw ones, and is measured in its own Python process. A result
+slower or larger than the baseline by more than the tolerance is reported as a
+regression. The baseline in benchmark_baseline.json is committed with the code; record
+it again on the machine comparing against it. Everything runs offline from the files in
+the repository.
+"""
+
+import csv
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pipeline import ROOT, STAGES, dependencies
+
+WORK_PATH = os.path.join(ROOT, ".benchmark")
+BASELINE_PATH = os.path.join(ROOT, "benchmark_baseline.json")
+
+SCALES = (1, 10, 100)
+
+# Pipeline stages benchmarked, in the order they run
+BENCHMARK_STAGES = [
+    "cpi-process",
+    "cpi-transform",
+    "cpi-plot",
+    "demographics-estimates",
+    "demographics-transform",
+    "demographics-plot",
+]
+
+# Charts drawn by the plot stages; the choropleth needs geopandas and is left out
+STAGE_CHARTS = {
+    "demographics-plot": ",".join(
+        [
+            "generation-multiples",
+            "ownership-by-generation",
+            "ownership-by-age",
+            "rent-monthly",
+            "rent-annual",
+            "population-by-age",
+        ]
+    ),
+}
+
+# Raw files replaced by synthetic ones, relative to the repository root
+POPULATION_FILE = "nz_demographics/data/raw/population_data_nz_20240417.csv"
+TENANCY_FILE = "nz_demographics/data/raw/detailed-monthly-march-2024-tla-tenancy.csv"
+CPI_FILE = "cpi_inflation_distribution/data/raw/nz_cpi_subgroup_2_2023q4.csv"
+
+RENT_COLUMNS = [
+    "Median Rent",
+    "Geometric Mean Rent",
+    "Upper Quartile Rent",
+    "Lower Quartile Rent",
+]
+
+# Runs a stage script from its own directory and writes its time and peak memory
+MEASURE = """
+import json, os, resource, runpy, sys, time
+
+script, out_path, render = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+if render:
+    # Figures are built (and cached) as usual but not opened in a browser
+    import plotly.io as pio
+    from plotly.basedatatypes import BaseFigure
+
+    pio.show = BaseFigure.show = lambda *args, **kwargs: None
+
+sys.argv = [script]
+sys.path.insert(0, os.getcwd())
+start, cpu_start = time.perf_counter(), time.process_time()
+runpy.run_path(script, run_name="__main__")
+wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+# ru_maxrss keeps the peak of the parent process across fork and exec, VmHWM does not
+with open("/proc/self/status") as f:
+    peak = [line.split()[1] for line in f if line.startswith("VmHWM:")]
+if not peak:
+    peak = [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss]
+result = {"wall_s": wall, "cpu_s": cpu, "peak_rss_mb": int(peak[0]) / 1024}
+with open(out_path, "w") as f:
+    json.dump(result, f)
+"""
+
+
+def _scaled_copies(scale, rng, size):
+    # Level of each copy of an area relative to the original (the original first)
+    factors = rng.lognormal(0, 0.3, size=(scale, size))
+    factors[0] = 1
+    return factors
+
+
+def synthetic_population(scale, rng):
+    """
+    Population estimates shaped like the Stats NZ wide table (one row per area, two
+    header rows of age band and year), with every area repeated scale times at another
+    level.
+
+    Parameters:
+    - scale (int): Number of copies of the areas of the real table.
+    - rng (np.random.Generator): Random numbers.
+
+    Returns:
+    - list: The rows of the CSV file.
+    """
+    with open(os.path.join(ROOT, POPULATION_FILE), newline="") as f:
+        rows = [row for row in csv.reader(f) if row]
+    header, body = rows[:2], rows[2:]
+
+    values = np.array([row[1:] for row in body], dtype=float)
+    factors = _scaled_copies(scale, rng, len(body))
+    out = list(header)
+    for copy in range(scale):
+        scaled = np.round(values * factors[copy][:, None] / 10) * 10
+        suffix = "" if copy == 0 else f" {copy + 1}"
+        for row, counts in zip(body, scaled.astype(int)):
+            out.append([row[0] + suffix] + counts.astype(str).tolist())
+    return out
+
+
+def synthetic_tenancy(scale, rng):
+    """
+    Monthly tenancy bonds shaped like the MBIE detailed monthly TLA file, with every
+    location repeated scale times at another rent level.
+
+    Parameters:
+    - scale (int): Number of copies of the locations of the real file.
+    - rng (np.random.Generator): Random numbers.
+
+    Returns:
+    - pd.DataFrame: The table, as strings.
+    """
+    df = pd.read_csv(
+        os.path.join(ROOT, TENANCY_FILE), dtype=str, keep_default_na=False
+    )
+    locations = df["Location"].unique()
+    factors = _scaled_copies(scale, rng, len(locations))
+    rents = df[RENT_COLUMNS].apply(pd.to_numeric).to_numpy(dtype=float)
+    codes = pd.Categorical(df["Location"], categories=locations).codes
+
+    # The national total and unknown location are only included once
+    areas = ~df["Location"].isin(["ALL", "NA"])
+    ids = pd.to_numeric(df["Location Id"]).to_numpy()
+    copies = [df]
+    for copy in range(1, scale):
+        part = df[areas].copy()
+        part["Location"] = part["Location"] + f" {copy + 1}"
+        part["Location Id"] = (ids[areas] + 1000 * copy).astype(str)
+        scaled = rents[areas.to_numpy()] * factors[copy][codes[areas.to_numpy()], None]
+        part[RENT_COLUMNS] = np.round(scaled).astype(int).astype(str)
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True).sort_values("Time Frame", kind="stable")
+
+
+def synthetic_cpi(scale, rng):
+    """
+    CPI subgroup indexes shaped like the Stats NZ quarterly table, with every subgroup
+    repeated scale times at another level.
+
+    Parameters:
+    - scale (int): Number of copies of the subgroups of the real table.
+    - rng (np.random.Generator): Random numbers.
+
+    Returns:
+    - list: The rows of the CSV file, with ".." for missing values.
+    """
+    with open(os.path.join(ROOT, CPI_FILE), newline="") as f:
+        rows = [row for row in csv.reader(f) if row]
+    header, body = rows[0], rows[1:]
+
+    values = pd.DataFrame([row[1:] for row in body]).replace("..", np.nan)
+    values = values.to_numpy(dtype=float)
+    factors = _scaled_copies(scale, rng, len(header) - 1)
+    out_header, columns = [header[0]], []
+    for copy in range(scale):
+        suffix = "" if copy == 0 else f" {copy + 1}"
+        out_header += [name + suffix for name in header[1:]]
+        columns.append(values * factors[copy])
+    scaled = np.concatenate(columns, axis=1)
+
+    out = [out_header]
+    for row, levels in zip(body, scaled):
+        out.append([row[0]] + [".." if np.isnan(v) else f"{v:.6f}" for v in levels])
+    return out
+
+
+def generate_inputs(scale, directory, seed=0):
+    """
+    Write the synthetic raw files of a scale, unless they were already generated.
+
+    Parameters:
+    - scale (int): Multiple of the size of the real inputs.
+    - directory (str): Folder of the generated files (mirroring the repository paths).
+    - seed (int): Seed of the random levels, so every run uses the same data.
+
+    Returns:
+    - str: The folder.
+    """
+    done = os.path.join(directory, ".complete")
+    if os.path.exists(done):
+        return directory
+
+    rng = np.random.default_rng(seed)
+    for path in (POPULATION_FILE, TENANCY_FILE, CPI_FILE):
+        os.makedirs(os.path.dirname(os.path.join(directory, path)), exist_ok=True)
+    with open(os.path.join(directory, POPULATION_FILE), "w", newline="") as f:
+        csv.writer(f).writerows(synthetic_population(scale, rng))
+    synthetic_tenancy(scale, rng).to_csv(
+        os.path.join(directory, TENANCY_FILE), index=False, quoting=csv.QUOTE_ALL
+    )
+    with open(os.path.join(directory, CPI_FILE), "w", newline="") as f:
+        csv.writer(f).writerows(synthetic_cpi(scale, rng))
+
+    open(done, "w").close()
+    return directory
+
+
+def prepare_workspace(workspace, inputs):
+    """
+    Copy the code and raw data of every project (and the shared modules at the root)
+    into an empty workspace, with the synthetic files in place of the real ones.
+
+    Parameters:
+    - workspace (str): Folder to create (removed first if it exists).
+    - inputs (str): Folder of the synthetic files from generate_inputs.
+
+    Returns:
+    - None
+    """
+    shutil.rmtree(workspace, ignore_errors=True)
+    ignore = shutil.ignore_patterns("__pycache__", "render_cache")
+    for project in {STAGES[name]["script"].split("/")[0] for name in BENCHMARK_STAGES}:
+        shutil.copytree(
+            os.path.join(ROOT, project, "src"),
+            os.path.join(workspace, project, "src"),
+            ignore=ignore,
+        )
+        shutil.copytree(
+            os.path.join(ROOT, project, "data", "raw"),
+            os.path.join(workspace, project, "data", "raw"),
+            ignore=ignore,
+        )
+        for folder in ("interim", "processed"):
+            os.makedirs(os.path.join(workspace, project, "data", folder))
+    # Modules shared by the projects, at the repository root
+    for name in BENCHMARK_STAGES:
+        for path in STAGES[name]["code"]:
+            if os.path.isfile(os.path.join(ROOT, path)):
+                shutil.copyfile(os.path.join(ROOT, path), os.path.join(workspace, path))
+    for path in (POPULATION_FILE, TENANCY_FILE, CPI_FILE):
+        shutil.copyfile(os.path.join(inputs, path), os.path.join(workspace, path))
+
+
+def measure_stage(name, workspace):
+    """
+    Run a stage script in the workspace, in a new Python process from its own directory.
+
+    Parameters:
+    - name (str): The pipeline stage name.
+    - workspace (str): The workspace from prepare_workspace.
+
+    Returns:
+    - dict: The wall time, CPU time and peak RSS of the run (None if it failed), the
+      exit code and the output of the script.
+    """
+    script = os.path.join(workspace, STAGES[name]["script"])
+    out_path = os.path.join(workspace, f"{name}.json")
+    env = dict(os.environ, MPLBACKEND="Agg")
+    env.pop("PROFILE", None)
+    if name in STAGE_CHARTS:
+        env["PLOT_CHARTS"] = STAGE_CHARTS[name]
+    render = "1" if name in STAGE_CHARTS else "0"
+
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE, os.path.basename(script), out_path, render],
+        cwd=os.path.dirname(script),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    measured = {"result": None, "code": result.returncode, "output": result.stdout}
+    if result.returncode == 0:
+        with open(out_path) as f:
+            measured["result"] = json.load(f)
+    return measured
+
+
+def run_benchmarks(scales=SCALES, stages=BENCHMARK_STAGES, repeat=1):
+    """
+    Benchmark stages at several scales. Every repetition starts from a fresh workspace,
+    so caches of earlier runs are not reused, and the fastest repetition is kept.
+
+    Parameters:
+    - scales (list): Multiples of the size of the real inputs.
+    - stages (list): Stage names from BENCHMARK_STAGES; their upstream stages also run
+      (to produce their inputs) but are only measured if listed.
+    - repeat (int): Number of runs of every stage.
+
+    Returns:
+    - dict: "<stage>@<scale>x" -> {"wall_s", "cpu_s", "peak_rss_mb"}, or None for a
+      stage that failed.
+    """
+    upstream = dependencies()
+    needed, pending = set(), list(stages)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(upstream[name])
+    to_run = [name for name in BENCHMARK_STAGES if name in needed]
+
+    results = {}
+    for scale in scales:
+        print(f"Generating inputs at {scale}x")
+        inputs = generate_inputs(scale, os.path.join(WORK_PATH, "inputs", f"{scale}x"))
+        for _ in range(repeat):
+            workspace = os.path.join(WORK_PATH, "workspace")
+            prepare_workspace(workspace, inputs)
+            failed = set()
+            for name in to_run:
+                key = f"{name}@{scale}x"
+                project = STAGES[name]["script"].split("/")[0]
+                if project in failed:
+                    results[key] = None
+                    continue
+                measured = measure_stage(name, workspace)
+                result = measured["result"]
+                if result is None:
+                    failed.add(project)
+                    results[key] = None
+                    print(measured["output"].rstrip("\n"))
+                    # A negative code is the killing signal, e.g. -9 when out of memory
+                    print(f"[{key}] failed (exit code {measured['code']})")
+                    continue
+                if name not in stages:
+                    continue
+                # A stage failing in any repetition stays failed
+                best = results.get(key)
+                if key not in results or best and result["wall_s"] < best["wall_s"]:
+                    results[key] = result
+                print(
+                    f"[{key}] {result['wall_s']:.2f} s wall, "
+                    f"{result['cpu_s']:.2f} s CPU, "
+                    f"{result['peak_rss_mb']:.0f} MB peak RSS"
+                )
+    return {key: value for key, value in results.items() if key.split("@")[0] in stages}
+
+
+def compare_to_baseline(results, baseline, tolerance=0.3, min_seconds=1.0):
+    """
+    Find the results that regressed against the baseline: failed, or slower or larger
+    by more than the tolerance.
+
+    Parameters:
+    - results (dict): Results from run_benchmarks.
+    - baseline (dict): Results of an earlier run.
+    - tolerance (float): Allowed relative increase of the wall time and peak RSS.
+    - min_seconds (float): Allowed absolute increase of the wall time, so short stages
+      do not fail on timing noise.
+
+    Returns:
+    - list: A description of every regression.
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if result is None:
+            regressions.append(f"{key}: failed")
+            continue
+        limit = max(before["wall_s"] * (1 + tolerance), before["wall_s"] + min_seconds)
+        if result["wall_s"] > limit:
+            regressions.append(
+                f"{key}: wall time {result['wall_s']:.2f} s (baseline "
+                f"{before['wall_s']:.2f} s)"
+            )
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB (baseline "
+                f"{before['peak_rss_mb']:.0f} MB)"
+            )
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["results"]
+    return {}
+
+
+def save_results(results, path):
+    """
+    Write benchmark results, merged into the results already in the file.
+
+    Parameters:
+    - results (dict): Results from run_benchmarks.
+    - path (str): The JSON file.
+
+    Returns:
+    - None
+    """
+    merged = load_baseline(path)
+    merged.update({key: value for key, value in results.items() if value is not None})
+    report = {
+        "updated": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "results": dict(sorted(merged.items())),
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
@@ -0,0 +1,103 @@
+"""
+Helpers shared by the chart caches of every project: content hashing of the inputs of a
+chart and least-recently-used eviction of a cache folder.
+"""
+
+import inspect
+import os
+import sys
+import threading
+
+import numpy as np
+
+# Evictions of this process run one at a time (caches are written from export threads)
+_evict_lock = threading.Lock()
+
+
+def function_source(function):
+    """
+    Source of a function, or its bytecode if it was defined interactively.
+
+    Parameters:
+    - function (callable): The function.
+
+    Returns:
+    - str: The source, hashed as part of a cache key.
+    """
+    try:
+        return inspect.getsource(function)
+    except OSError:
+        code = function.__code__
+        return repr((code.co_code, code.co_consts))
+
+
+def update_digest(digest, value):
+    """
+    Add a chart input to a hash: frames and series by content (column labels and row
+    hashes), numpy arrays by dtype, shape and bytes, and anything else (scalars,
+    strings, small lists) by its repr.
+
+    Parameters:
+    - digest (hashlib object): The hash to update.
+    - value (object): The input.
+
+    Returns:
+    - None
+    """
+    # A frame can only be passed if pandas was imported, which is not done here so that
+    # keys of charts restored from the cache do not pay for importing it
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        # The hash of the rows does not include the column labels
+        columns = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr(list(columns)).encode())
+        hashes = pd.util.hash_pandas_object(value, index=True)
+        digest.update(hashes.to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        # The repr of a large array elides its middle values
+        digest.update(f"{value.dtype.str}{value.shape}".encode())
+        if value.dtype.hasobject:
+            digest.update(repr(value.tolist()).encode())
+        else:
+            digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+def evict_least_recent(directory, suffix, max_bytes):
+    """
+    Drop the least recently used entries of a cache folder (oldest modification time
+    first) until it fits in max_bytes.
+
+    Entries removed by another process while scanning are skipped.
+
+    Parameters:
+    - directory (str): Folder holding the entries.
+    - suffix (str): File suffix of the entries (e.g. ".pkl").
+    - max_bytes (int): Size limit of the folder.
+
+    Returns:
+    - list: The keys (file names without suffix) that were dropped.
+    """
+    with _evict_lock:
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        dropped = []
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            dropped.append(os.path.basename(path)[: -len(suffix)])
+        return dropped
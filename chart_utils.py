@@ -0,0 +1,20 @@
+"""
+Chart selection shared by the plot scripts of every project.
+"""
+
+import os
+
+
+def chart_selected(name):
+    """
+    Whether a chart should be drawn. All charts are drawn unless the PLOT_CHARTS
+    environment variable lists the ones to draw (as set by cli.py plot).
+
+    Parameters:
+    - name (str): The chart name, e.g. "cpi-density" or "choropleth".
+
+    Returns:
+    - bool: Whether the chart is selected.
+    """
+    charts = os.environ.get("PLOT_CHARTS")
+    return charts is None or name in charts.split(",")
@@ -0,0 +1,336 @@
+"""
+Command-line entry point for the stages and charts of every project.
+
+    python cli.py process cpi
+    python cli.py transform demographics
+    python cli.py plot cpi                      # every CPI chart
+    python cli.py plot choropleth rent-annual   # selected charts only
+    python cli.py --importtime plot cpi-density
+    python cli.py run                           # every out-of-date stage (pipeline.py)
+    python cli.py --profile transform demographics
+    python cli.py profile-diff old.json new.json
+    python cli.py benchmark --scales 1 10        # synthetic inputs (benchmark.py)
+
+Each command runs the stage script from its own directory, as when running it by hand.
+This module only imports the standard library, and the scripts import plotting libraries
+in the charts that use them, so a command only pays for the imports it needs.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CPI_SRC = os.path.join(ROOT, "cpi_inflation_distribution", "src")
+DEMOGRAPHICS_SRC = os.path.join(ROOT, "nz_demographics", "src")
+DEMOGRAPHICS_DATA = os.path.join(DEMOGRAPHICS_SRC, "data")
+
+CPI_PLOT = os.path.join(CPI_SRC, "visualization", "003_visualize.py")
+DEMOGRAPHICS_PLOT = os.path.join(
+    DEMOGRAPHICS_SRC, "vizualisation", "003_vizualisation.py"
+)
+POPULATION_PLOT = os.path.join(
+    DEMOGRAPHICS_SRC, "vizualisation", "pop_vizualisation.py"
+)
+
+# Stage scripts of each project, run in order
+STAGES = {
+    "process": {
+        "cpi": [os.path.join(CPI_SRC, "data", "001_process_data.py")],
+        "demographics": [
+            os.path.join(
+                DEMOGRAPHICS_SRC, "data", "001_nz_demographics_process_data.py"
+            ),
+            os.path.join(
+                DEMOGRAPHICS_SRC, "data", "001_nz_demographics_process_projections.py"
+            ),
+        ],
+    },
+    "transform": {
+        "cpi": [os.path.join(CPI_SRC, "features", "002_transform_data.py")],
+        "demographics": [
+            os.path.join(
+                DEMOGRAPHICS_SRC, "features", "002_nz_demographics_transform.py"
+            )
+        ],
+    },
+}
+
+# Plot scripts, each drawing all of its charts
+PLOTS = {
+    "cpi": CPI_PLOT,
+    "demographics": DEMOGRAPHICS_PLOT,
+    "population": POPULATION_PLOT,
+}
+
+# Single charts and the script drawing them (see chart_utils.chart_selected)
+CHARTS = {
+    "cpi-density": CPI_PLOT,
+    "cpi-heatmap": CPI_PLOT,
+    "cpi-ridgeline": CPI_PLOT,
+    "choropleth": DEMOGRAPHICS_PLOT,
+    "generation-multiples": DEMOGRAPHICS_PLOT,
+    "ownership-by-generation": DEMOGRAPHICS_PLOT,
+    "ownership-by-age": DEMOGRAPHICS_PLOT,
+    "rent-monthly": DEMOGRAPHICS_PLOT,
+    "rent-annual": DEMOGRAPHICS_PLOT,
+    "population-by-age": DEMOGRAPHICS_PLOT,
+    "boomers-by-age": POPULATION_PLOT,
+    "boomer-millennial-multiples": POPULATION_PLOT,
+    "waffle": POPULATION_PLOT,
+    "generation-heatmap": POPULATION_PLOT,
+}
+
+
+def load_profile_utils():
+    # Shared with the scripts importing it by name, so their sections nest in the stage
+    if DEMOGRAPHICS_DATA not in sys.path:
+        sys.path.append(DEMOGRAPHICS_DATA)
+    import profile_utils
+
+    return profile_utils
+
+
+def run_script(path, charts=None):
+    """
+    Run a stage script as __main__ from its own directory, so its relative data paths
+    and sibling imports resolve as when it is run by hand. With --profile the run is
+    recorded as a section named after the script.
+
+    Parameters:
+    - path (str): Path of the script.
+    - charts (list, optional): Charts to draw (passed to the script as PLOT_CHARTS).
+      All charts of the script are drawn if omitted.
+
+    Returns:
+    - None
+    """
+    directory = os.path.dirname(path)
+    cwd, argv, sys_path = os.getcwd(), sys.argv, list(sys.path)
+    env = os.environ.get("PLOT_CHARTS")
+    if charts is None:
+        os.environ.pop("PLOT_CHARTS", None)
+    else:
+        os.environ["PLOT_CHARTS"] = ",".join(charts)
+
+    try:
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+        sys.argv = [path]
+        with load_profile_utils().profile_section(os.path.basename(path)):
+            runpy.run_path(path, run_name="__main__")
+    finally:
+        # Finders of the relative paths the script added (e.g. "../data") are cached by
+        # path, so they would resolve against this script's directory in the next one
+        for entry in set(sys.path) - set(sys_path):
+            sys.path_importer_cache.pop(entry, None)
+        os.chdir(cwd)
+        sys.argv, sys.path[:] = argv, sys_path
+        if env is None:
+            os.environ.pop("PLOT_CHARTS", None)
+        else:
+            os.environ["PLOT_CHARTS"] = env
+
+
+def plot(targets):
+    """
+    Draw plot scripts and single charts. Charts of the same script are drawn in one run
+    of it, and scripts run in the order their first target was given.
+
+    Parameters:
+    - targets (list): Names from PLOTS (all charts of a script) or CHARTS.
+
+    Returns:
+    - None
+    """
+    runs = {}
+    for target in targets:
+        if target in PLOTS:
+            runs[PLOTS[target]] = None
+        else:
+            path = CHARTS[target]
+            if path not in runs:
+                runs[path] = []
+            if runs[path] is not None:
+                runs[path].append(target)
+
+    for path, charts in runs.items():
+        run_script(path, charts)
+
+
+def import_times(stderr):
+    """
+    Parse the -X importtime report of a run into the time of every top-level import.
+
+    Parameters:
+    - stderr (str): Standard error of a run with -X importtime.
+
+    Returns:
+    - tuple: The cumulative time in seconds of each top-level module (dict, slowest
+      first) and the remaining standard error lines (str).
+    """
+    times, other = {}, []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:") :].split("|")
+        # Nested imports are indented under the module importing them
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            name = fields[2]
+            if not name[1:].startswith(" "):
+                times[name.strip()] = int(fields[1]) / 1e6
+
+    times = dict(sorted(times.items(), key=lambda item: -item[1]))
+    return times, "\n".join(other)
+
+
+def report_import_times(argv, top=15):
+    """
+    Run the command again with -X importtime and print its slowest top-level imports.
+
+    Parameters:
+    - argv (list): The command-line arguments without --importtime.
+    - top (int): Number of imports to list.
+
+    Returns:
+    - int: Exit code of the command.
+    """
+    import subprocess
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    times, other = import_times(result.stderr)
+    if other:
+        print(other, file=sys.stderr)
+
+    print(f"\n{'cumulative (s)':>14}  module")
+    for name, seconds in list(times.items())[:top]:
+        print(f"{seconds:>14.3f}  {name}")
+    print(f"Imports: {sum(times.values()):.3f} s of {elapsed:.3f} s in total")
+    return result.returncode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Run the stages and charts of py_econ_plots."
+    )
+    parser.add_argument(
+        "--importtime",
+        action="store_true",
+        help="report the time spent importing each module (as python -X importtime)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="write a JSON report of the time and memory of each stage and section",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    for stage, projects in STAGES.items():
+        command = commands.add_parser(stage, help=f"run the {stage} stage of a project")
+        command.add_argument("project", choices=list(projects))
+    command = commands.add_parser("plot", help="draw all or single charts of a script")
+    command.add_argument("targets", nargs="+", choices=list(PLOTS) + list(CHARTS))
+    command = commands.add_parser(
+        "run", help="run the out-of-date pipeline stages (see pipeline.py)"
+    )
+    command.add_argument("stages", nargs="*", help="stages to bring up to date (all)")
+    command.add_argument(
+        "--force", action="store_true", help="run the given stages even if up to date"
+    )
+    command.add_argument("--workers", type=int, help="number of stages run at once")
+    command = commands.add_parser(
+        "profile-diff", help="compare two --profile reports section by section"
+    )
+    command.add_argument("old", help="baseline report")
+    command.add_argument("new", help="report compared with the baseline")
+    command = commands.add_parser(
+        "benchmark", help="time the stages on synthetic inputs (see benchmark.py)"
+    )
+    command.add_argument(
+        "--scales", type=int, nargs="+", help="multiples of the real input sizes"
+    )
+    command.add_argument("--stages", nargs="+", help="stages to measure (all)")
+    command.add_argument(
+        "--repeat", type=int, default=1, help="runs of each stage (fastest kept)"
+    )
+    command.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="relative slowdown or memory growth reported as a regression",
+    )
+    command.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="record the results as the baseline instead of comparing with it",
+    )
+
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        return report_import_times([arg for arg in argv if arg != "--importtime"])
+    if args.profile:
+        # Also read by the pipeline stages, which run as separate processes
+        os.environ["PROFILE"] = "1"
+
+    if args.command == "profile-diff":
+        profile_utils = load_profile_utils()
+        rows = profile_utils.diff_reports(
+            profile_utils.load_report(args.old), profile_utils.load_report(args.new)
+        )
+        print(profile_utils.format_diff(rows))
+    elif args.command == "benchmark":
+        import benchmark
+
+        unknown = set(args.stages or ()) - set(benchmark.BENCHMARK_STAGES)
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+        results = benchmark.run_benchmarks(
+            args.scales or benchmark.SCALES,
+            args.stages or benchmark.BENCHMARK_STAGES,
+            repeat=args.repeat,
+        )
+        if args.save_baseline:
+            benchmark.save_results(results, benchmark.BASELINE_PATH)
+            print(f"Baseline saved to {benchmark.BASELINE_PATH}")
+            return int(None in results.values())
+
+        baseline = benchmark.load_baseline()
+        missing = sorted(key for key in results if key not in baseline)
+        if missing:
+            print(f"No baseline for {', '.join(missing)} (record with --save-baseline)")
+        regressions = benchmark.compare_to_baseline(
+            results, baseline, tolerance=args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return int(bool(regressions) or None in results.values())
+    elif args.command == "plot":
+        plot(args.targets)
+    elif args.command == "run":
+        from pipeline import STAGES as PIPELINE_STAGES, run_pipeline
+
+        unknown = set(args.stages) - set(PIPELINE_STAGES)
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+        force = (args.stages or list(PIPELINE_STAGES)) if args.force else ()
+        status = run_pipeline(args.stages or None, force=force, workers=args.workers)
+        return int(any(s in ("failed", "blocked") for s in status.values()))
+    else:
+        for path in STAGES[args.command][args.project]:
+            run_script(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import pandas as pd
+from cpi_store_utils import VintageStore
 
 # --------------------------------------------------------------
 # 1. Define objective
@@ -6,6 +7,8 @@ import pandas as pd
 
 """ 
 The objective of this script is to clean the dataset of the cpi data, set the index, and enforce the correct data type.
+Each release is added to the interim vintage store, which only records the cells that are new or revised since the
+previous release.
 
 """
 
@@ -13,8 +16,11 @@ The objective of this script is to clean the dataset of the cpi data, set the in
 # 2. Read raw data
 # --------------------------------------------------------------
 
+# Latest release (update new data release)
+raw_file = '../../data/raw/nz_cpi_subgroup_2_2023q4.csv'
+
 # Loading all the datasets using the provided format
-cpi_data = pd.read_csv('../../data/raw/nz_cpi_subgroup_2_2023q4.csv', sep=',')
+cpi_data = pd.read_csv(raw_file, sep=',')
 
 
 # --------------------------------------------------------------
@@ -40,4 +46,8 @@ cpi_data = cpi_data.apply(pd.to_numeric, errors='coerce')
 # Export
 # --------------------------------------------------------------
 
-cpi_data.to_pickle("../../data/interim/nz_cpi_group_3_clean_2023q4.pkl")
+# Add the release to the vintage store, labelled by its latest quarter (a corrected
+# re-issue of an ingested release gets its own label)
+store = VintageStore("../../data/interim/nz_cpi_group_3_vintages")
+changed = store.update(cpi_data, release=cpi_data.index[-1])
+print(f"Stored {len(changed)} new or revised quarters")
@@ -0,0 +1,340 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def row_hashes(df):
+    """
+    Compute a content hash for every row (quarter) of a table.
+
+    Parameters:
+    - df (pd.DataFrame): The table, indexed by quarter.
+
+    Returns:
+    - pd.Series: A uint64 hash per quarter.
+    """
+    return pd.util.hash_pandas_object(df, index=True)
+
+
+class QuarterStore:
+    """
+    Append-only store of a quarterly table.
+
+    Each update writes a new segment holding only the quarters that are new or whose
+    content hash changed, and appends one manifest line per written quarter. The current
+    table is the latest stored version of every quarter.
+
+    Layout:
+    - manifest.csv: segment, release, Quarter, hash (one line per stored quarter version)
+    - segment-NNNN.pkl: the rows written by one update
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.csv")
+        os.makedirs(path, exist_ok=True)
+
+    def manifest(self):
+        """
+        Return every manifest line, oldest first.
+        """
+        if not os.path.exists(self.manifest_path):
+            return pd.DataFrame(
+                {
+                    "segment": pd.Series(dtype=int),
+                    "release": pd.Series(dtype=str),
+                    "Quarter": pd.Series(dtype=str),
+                    "hash": pd.Series(dtype=np.uint64),
+                }
+            )
+        return pd.read_csv(
+            self.manifest_path, dtype={"release": str, "Quarter": str, "hash": np.uint64}
+        )
+
+    def _latest(self):
+        return self.manifest().drop_duplicates("Quarter", keep="last").set_index("Quarter")
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"segment-{segment:04d}.pkl")
+
+    def hashes(self):
+        """
+        Return the stored hash of the latest version of every quarter.
+
+        Returns:
+        - pd.Series: uint64 hashes indexed by quarter.
+        """
+        return self._latest()["hash"]
+
+    def read(self):
+        """
+        Return the current table, built from the latest version of every quarter.
+
+        Returns:
+        - pd.DataFrame: The table, indexed and sorted by quarter.
+        """
+        latest = self._latest()
+        if latest.empty:
+            return pd.DataFrame()
+
+        parts = []
+        for segment, quarters in latest.groupby("segment").groups.items():
+            parts.append(pd.read_pickle(self._segment_path(segment)).loc[quarters])
+        return pd.concat(parts).sort_index()
+
+    def changed(self, hashes):
+        """
+        Return the quarters that are new or whose hash differs from the stored one.
+
+        Parameters:
+        - hashes (pd.Series): uint64 hashes indexed by quarter.
+
+        Returns:
+        - pd.Index: The new or changed quarters.
+        """
+        stored = self.hashes()
+        known = hashes.index.isin(stored.index)
+        differs = np.ones(len(hashes), dtype=bool)
+        differs[known] = (
+            hashes.to_numpy()[known] != stored.loc[hashes.index[known]].to_numpy()
+        )
+        return hashes.index[differs]
+
+    def update(self, df, release=None, hashes=None):
+        """
+        Store the quarters of df that are new or changed.
+
+        Parameters:
+        - df (pd.DataFrame): The table, indexed by quarter.
+        - release (str, optional): Label recorded in the manifest for this update.
+        - hashes (pd.Series, optional): Hash per quarter to compare and store instead of
+          the row content hash (e.g. a hash of the inputs a row was computed from).
+
+        Returns:
+        - pd.Index: The quarters that were written.
+        """
+        if hashes is None:
+            hashes = row_hashes(df)
+        hashes = hashes.astype(np.uint64)
+
+        changed = self.changed(hashes)
+        if changed.empty:
+            return changed
+
+        manifest = self.manifest()
+        segment = int(manifest["segment"].max()) + 1 if len(manifest) else 0
+        df.loc[changed].to_pickle(self._segment_path(segment))
+
+        pd.DataFrame(
+            {
+                "segment": segment,
+                "release": release if release is not None else "",
+                "Quarter": changed,
+                "hash": hashes.loc[changed].to_numpy(),
+            }
+        ).to_csv(
+            self.manifest_path,
+            mode="a",
+            header=not os.path.exists(self.manifest_path),
+            index=False,
+        )
+        return changed
+
+
+class VintageStore:
+    """
+    Store of every published release (vintage) of a quarterly table.
+
+    The first release is kept as a full base table. Every later release only records the
+    cells that differ from the previous release: values of new quarters and subgroups,
+    and revised values of published ones. Any release can be rebuilt by applying the
+    deltas up to it to the base table.
+
+    Layout:
+    - releases.csv: number, release, cells (one line per ingested release, oldest first)
+    - base.pkl: the table as published in the first release
+    - delta-NNNN.pkl: Quarter, Subgroup, value of the cells changed by release NNNN
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.releases_path = os.path.join(path, "releases.csv")
+        self.base_path = os.path.join(path, "base.pkl")
+        os.makedirs(path, exist_ok=True)
+
+    def releases(self):
+        """
+        Return the ingested releases, oldest first.
+        """
+        if not os.path.exists(self.releases_path):
+            return pd.DataFrame(
+                {
+                    "number": pd.Series(dtype=int),
+                    "release": pd.Series(dtype=str),
+                    "cells": pd.Series(dtype=int),
+                }
+            )
+        return pd.read_csv(self.releases_path, dtype={"release": str})
+
+    def _delta_path(self, number):
+        return os.path.join(self.path, f"delta-{number:04d}.pkl")
+
+    def _number(self, release):
+        releases = self.releases()
+        if releases.empty:
+            raise ValueError(f"No releases in {self.path}")
+        if release is None:
+            return int(releases["number"].iloc[-1])
+        matches = releases.loc[releases["release"] == str(release), "number"]
+        if matches.empty:
+            raise KeyError(f"Release {release} not in {self.path}")
+        return int(matches.iloc[0])
+
+    def _deltas(self, last):
+        # Changed cells of releases 1..last, oldest first
+        return [pd.read_pickle(self._delta_path(number)) for number in range(1, last + 1)]
+
+    def as_of(self, release=None):
+        """
+        Return the table as published in a release.
+
+        Parameters:
+        - release (str, optional): The release label. The latest release if omitted.
+
+        Returns:
+        - pd.DataFrame: The table, indexed and sorted by quarter.
+        """
+        table = pd.read_pickle(self.base_path)
+        deltas = self._deltas(self._number(release))
+        if not deltas:
+            return table
+
+        # A cell changed by several releases keeps the value of the latest one
+        cells = pd.concat(deltas).drop_duplicates(["Quarter", "Subgroup"], keep="last")
+        quarters = table.index.append(
+            pd.Index(cells["Quarter"].unique()).difference(table.index, sort=False)
+        )
+        subgroups = table.columns.append(
+            pd.Index(cells["Subgroup"].unique()).difference(table.columns, sort=False)
+        )
+
+        values = table.reindex(index=quarters, columns=subgroups).to_numpy(copy=True)
+        values[
+            quarters.get_indexer(cells["Quarter"]), subgroups.get_indexer(cells["Subgroup"])
+        ] = cells["value"].to_numpy()
+        return pd.DataFrame(
+            values,
+            index=quarters.rename(table.index.name),
+            columns=subgroups.rename(table.columns.name),
+        ).sort_index()
+
+    def read(self):
+        """
+        Return the table as published in the latest release.
+        """
+        return self.as_of()
+
+    def revisions(self, subgroup):
+        """
+        Return the revision triangle of one subgroup: the value of every quarter as
+        published in every release, NaN where the quarter was not yet published.
+
+        Parameters:
+        - subgroup (str): The column of the table.
+
+        Returns:
+        - pd.DataFrame: Values indexed by quarter, with one column per release.
+        """
+        releases = self.releases()
+        base = pd.read_pickle(self.base_path)
+        deltas = [
+            delta[delta["Subgroup"] == subgroup]
+            for delta in self._deltas(len(releases) - 1)
+        ]
+        quarters = base.index.append(
+            pd.Index(
+                pd.concat([delta["Quarter"] for delta in deltas] + [pd.Series(dtype=str)])
+            )
+            .unique()
+            .difference(base.index, sort=False)
+        )
+
+        if subgroup in base:
+            current = base[subgroup].reindex(quarters).to_numpy(copy=True)
+            published = quarters.isin(base.index)
+        else:
+            current = np.full(len(quarters), np.nan)
+            published = np.zeros(len(quarters), dtype=bool)
+
+        triangle = np.empty((len(quarters), len(releases)))
+        triangle[:, 0] = np.where(published, current, np.nan)
+        for number, delta in enumerate(deltas, start=1):
+            pos = quarters.get_indexer(delta["Quarter"])
+            current[pos] = delta["value"].to_numpy()
+            published[pos] = True
+            triangle[:, number] = np.where(published, current, np.nan)
+
+        return pd.DataFrame(
+            triangle,
+            index=quarters.rename(base.index.name),
+            columns=pd.Index(releases["release"], name="Release"),
+        ).sort_index()
+
+    def update(self, df, release):
+        """
+        Ingest a release, recording only the cells that are new or revised. A release
+        whose label was already ingested is skipped if none of its cells differ from the
+        latest release, and stored as a re-issue labelled "<release>-r<n>" otherwise.
+        Quarters or subgroups missing from a release are kept as last published.
+
+        Parameters:
+        - df (pd.DataFrame): The table as published in the release, indexed by quarter.
+        - release (str): The release label.
+
+        Returns:
+        - pd.Index: The quarters with at least one new or revised cell.
+        """
+        releases = self.releases()
+        number = len(releases)
+        if number == 0:
+            df.to_pickle(self.base_path)
+            changed = df.index
+            cells = df.size
+        else:
+            previous = self.as_of()
+            new = df.to_numpy(dtype=float)
+            old = previous.reindex(index=df.index, columns=df.columns).to_numpy()
+
+            # NaN in both releases is unchanged, unless the quarter or subgroup is new
+            differs = ~((new == old) | (np.isnan(new) & np.isnan(old)))
+            differs |= ~df.index.isin(previous.index)[:, None]
+            differs |= ~df.columns.isin(previous.columns)[None, :]
+            rows, cols = np.nonzero(differs)
+
+            labels = set(releases["release"])
+            if str(release) in labels:
+                if len(rows) == 0:
+                    return df.index[:0]
+                reissue = 1
+                while f"{release}-r{reissue}" in labels:
+                    reissue += 1
+                release = f"{release}-r{reissue}"
+
+            pd.DataFrame(
+                {
+                    "Quarter": df.index[rows],
+                    "Subgroup": df.columns[cols],
+                    "value": new[rows, cols],
+                }
+            ).to_pickle(self._delta_path(number))
+            changed = df.index[np.unique(rows)]
+            cells = len(rows)
+
+        pd.DataFrame({"number": [number], "release": [str(release)], "cells": [cells]}).to_csv(
+            self.releases_path,
+            mode="a",
+            header=not os.path.exists(self.releases_path),
+            index=False,
+        )
+        return changed
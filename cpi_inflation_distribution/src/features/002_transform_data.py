@@ -1,34 +1,127 @@
+import sys
+
+import numpy as np
 import pandas as pd
 
+sys.path.append("../data")
+from cpi_store_utils import QuarterStore, VintageStore, row_hashes
+from core_utils import core_inflation
+from distance_utils import distance_matrices, nearest_analogues
+from growth_utils import HORIZONS, growth_rates
+from seasonal_utils import decompose_columns
+from stats_utils import quarter_movers, quarter_stats
+
+interim_store = VintageStore("../../data/interim/nz_cpi_group_3_vintages")
+apc_store = QuarterStore("../../data/processed/nz_cpi_group_3_apc")
 
-data = pd.read_pickle("../../data/interim/nz_cpi_group_3_clean_2023q4.pkl")
+data = interim_store.read()
 
 # --------------------------------------------------------------
 # Transform data
 # --------------------------------------------------------------
 
-# Calculate annual percent change
-cpi_data_apc=data.pct_change(periods=4) * 100
+# Calculate annual percent change (as data.pct_change(periods=4) * 100) only for the
+# quarters whose inputs changed. pct_change pads missing values forward, so the inputs
+# of a quarter are its padded row and the padded row four quarters earlier.
+filled = data.ffill()
+current = row_hashes(filled).to_numpy()
+lagged = np.concatenate([np.zeros(4, dtype=np.uint64), current[:-4]])
+input_hashes = pd.util.hash_pandas_object(
+    pd.DataFrame({"current": current, "lagged": lagged}, index=filled.index), index=False
+)
+
+affected = apc_store.changed(input_hashes)
+pos = filled.index.get_indexer(affected)
+values = filled.to_numpy()
+previous = np.where((pos >= 4)[:, None], values[pos - 4], np.nan)
+apc_affected = pd.DataFrame(
+    (values[pos] / previous - 1) * 100, index=affected, columns=filled.columns
+)
+
+apc_store.update(apc_affected, hashes=input_hashes.loc[affected])
+print(f"Updated annual percent change for {len(affected)} quarters")
+
+cpi_data_apc = apc_store.read().reindex(columns=data.columns)
+
+# --------------------------------------------------------------
+# Seasonal adjustment
+# --------------------------------------------------------------
+
+# STL decomposition of every subgroup, only recomputing subgroups whose data changed.
+# Subgroups with less than two years without gaps are not seasonally adjusted (NaN).
+cpi_components, recomputed, skipped = decompose_columns(
+    data, "../../data/interim/nz_cpi_group_3_stl.pkl", period=4
+)
+print(f"Decomposed {len(recomputed)} subgroups ({len(skipped)} too short, skipped)")
+
+# --------------------------------------------------------------
+# Growth rates
+# --------------------------------------------------------------
+
+# Percent changes over every horizon in growth_utils.HORIZONS, stacked by horizon. The
+# "yoy" horizon is the annual percent change from the store above, and "qoq_saar" the
+# annualised change of the seasonally adjusted index.
+other_horizons = {name: spec for name, spec in HORIZONS.items() if name != "yoy"}
+cpi_growth = pd.concat(
+    [
+        growth_rates(
+            data, horizons=other_horizons, adjusted=data - cpi_components["seasonal"]
+        ),
+        pd.concat({"yoy": cpi_data_apc}, names=["horizon"]),
+    ]
+).loc[list(HORIZONS)]
+
+# --------------------------------------------------------------
+# Cross-sectional statistics
+# --------------------------------------------------------------
+
+# Statistics and top/bottom movers of every quarter and horizon, computed for all rows
+# at once, with 90% bootstrap bands for the shares above thresholds
+cpi_stats = quarter_stats(cpi_growth, thresholds=[0, 2, 5], bands=0.9)
+cpi_movers = quarter_movers(cpi_growth, k=3)
+
+# Trimmed means (0-45 percent from each end) and median of every quarter and horizon,
+# from one sort
+cpi_core = core_inflation(cpi_growth)
+
+# Horizon to compare quarters on and to display
+horizon = "yoy"
+
+# Wasserstein-1 and Kolmogorov-Smirnov distances between the distributions of all quarters
+cpi_wasserstein, cpi_ks = distance_matrices(cpi_growth.loc[horizon])
 
 # Display top and bottom movers
 
-index_to_filter = '2023Q4'
+latest_quarter = cpi_data_apc.index[-1]
+index_to_filter = (horizon, latest_quarter)
 
-filtered_df = cpi_data_apc.loc[[index_to_filter]]
-transposed_df=filtered_df.T
-transposed_df_sorted=transposed_df.sort_values(by=index_to_filter, ascending=True).round(2)
+movers = cpi_movers.loc[index_to_filter].round(2)
 print('Top 3 apc:')
-print(transposed_df_sorted.tail(3))
+print(movers.loc['top'])
 print('\nBottom 3 apc:')
-print(transposed_df_sorted.head(3))
+print(movers.loc['bottom'])
 
 # Display share above 2%
-share_above_2=len(transposed_df_sorted[transposed_df_sorted[index_to_filter]>2])/len(transposed_df_sorted)
 print('\nshare above 2%:')
-print(share_above_2)
+print(cpi_stats.loc[index_to_filter, 'share_above_2'])
+print('90% bootstrap band:')
+print(cpi_stats.loc[index_to_filter, ['share_above_2_low', 'share_above_2_high']].tolist())
+
+# Display core inflation
+print('\ncore inflation (trimmed mean by percent trimmed from each end, 50 = median):')
+print(cpi_core.loc[index_to_filter].round(2))
+
+# Display the closest historical quarters
+print('\nnearest historical analogues (Wasserstein distance):')
+print(nearest_analogues(cpi_wasserstein, latest_quarter, n=5).round(2))
 
 # --------------------------------------------------------------
 # Export data
 # --------------------------------------------------------------
 
-cpi_data_apc.to_pickle("../../data/processed/nz_cpi_group_3_apc_2023q4.pkl")
+cpi_growth.to_pickle("../../data/processed/nz_cpi_group_3_growth.pkl")
+cpi_stats.to_pickle("../../data/processed/nz_cpi_group_3_stats.pkl")
+cpi_movers.to_pickle("../../data/processed/nz_cpi_group_3_movers.pkl")
+cpi_core.to_pickle("../../data/processed/nz_cpi_group_3_core.pkl")
+cpi_wasserstein.to_pickle("../../data/processed/nz_cpi_group_3_wasserstein.pkl")
+cpi_ks.to_pickle("../../data/processed/nz_cpi_group_3_ks.pkl")
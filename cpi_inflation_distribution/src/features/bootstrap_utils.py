@@ -0,0 +1,227 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from density_utils import scott_bandwidths, smooth_on_grid, trim_percentiles
+from pool_utils import pool_imap
+
+# Size of the resample positions of a block of rows, in bytes
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def resample(ordered, n, replicates, rng):
+    """
+    Draw bootstrap resamples of every row at once as one index array. Every statistic
+    of a replicate is computed from the same positions.
+
+    Parameters:
+    - ordered (np.ndarray): Rows sorted with missing values last.
+    - n (np.ndarray): Number of values present in each row.
+    - replicates (int): Number of resamples per row.
+    - rng (np.random.Generator): Random number generator.
+
+    Returns:
+    - np.ndarray: Positions of the resampled values in their sorted row (replicates x
+      rows x columns), int16 if the rows are short enough. Each row draws with
+      replacement from its own present values only; the columns past its count are -1.
+    """
+    shape = (replicates,) + ordered.shape
+    dtype = np.int16 if ordered.shape[1] <= np.iinfo(np.int16).max else np.int32
+    # Single precision halves the cost of the draws; truncation floors the positions
+    draws = rng.random(shape, dtype=np.float32)
+    pos = (draws * n[:, None].astype(np.float32)).astype(dtype)
+    pos[:, np.arange(ordered.shape[1])[None, :] >= n[:, None]] = -1
+    return pos
+
+
+def histogram_percentile(histogram, q):
+    """
+    Percentile of integer values from their histogram, with the linear interpolation
+    of np.percentile on the values themselves.
+
+    Parameters:
+    - histogram (np.ndarray): Number of occurrences of the values 0, 1, 2, ... along the
+      last axis.
+    - q (float): Percentile between 0 and 100.
+
+    Returns:
+    - np.ndarray: The percentile of every histogram (shape of histogram without its last
+      axis).
+    """
+    cumulative = histogram.cumsum(axis=-1)
+    rank = q / 100 * (cumulative[..., -1] - 1)
+    below = np.floor(rank)
+    # The i-th smallest value is the number of values whose cumulative count is <= i
+    value_below = (cumulative <= below[..., None]).sum(axis=-1)
+    value_above = (cumulative <= below[..., None] + 1).sum(axis=-1)
+    return value_below + (rank - below) * (value_above - value_below)
+
+
+def _share_chunk(ordered, n, replicates, seed, thresholds):
+    # Histogram over the resamples of the count of values above each threshold (rows x
+    # thresholds x counts 0..columns). Counts are integers, so the histograms of all
+    # chunks add up to exact percentiles without keeping every resample's shares.
+    rng = np.random.default_rng(seed)
+    columns = ordered.shape[1]
+    # Rows are sorted, so the values above a threshold are the last positions
+    first_above = np.stack([n - (ordered > t).sum(axis=1) for t in thresholds], axis=1)
+    histogram = np.zeros((len(ordered), len(thresholds), columns + 1), dtype=np.int64)
+
+    # Positions of the resamples are drawn for one block of rows at a time
+    block_size = max(1, BLOCK_BYTES // (replicates * columns * 8))
+    for start in range(0, len(ordered), block_size):
+        block = slice(start, start + block_size)
+        pos = resample(ordered[block], n[block], replicates, rng)
+        cells = np.arange(len(pos[0]))[:, None] * (columns + 1)
+        for i in range(len(thresholds)):
+            above = pos >= first_above[block, i, None].astype(pos.dtype)
+            counts = above.sum(axis=2, dtype=pos.dtype)
+            histogram[block, i] = np.bincount(
+                (cells + counts.T).ravel(), minlength=cells.size * (columns + 1)
+            ).reshape(-1, columns + 1)
+    return histogram
+
+
+def _density_chunk(ordered, n, replicates, seed, grid, bw, q):
+    # Percentiles q of the densities of the chunk's resamples on the grid (len(q) x rows
+    # x grid points), times the number of resamples, so that summing the chunks and
+    # dividing by the total replicates averages them
+    pos = resample(ordered, n, replicates, np.random.default_rng(seed))
+    rows = np.arange(len(ordered))[:, None]
+    sample = np.where(pos >= 0, ordered[rows, pos], np.nan)
+    flat = sample.reshape(-1, sample.shape[2])
+    density = smooth_on_grid(flat, grid, np.tile(bw, replicates))
+    density = density.reshape(replicates, len(ordered), len(grid))
+    return np.percentile(density, q, axis=0) * replicates
+
+
+def run_bootstrap(
+    chunk_function, values, replicates, seed=0, chunk_size=250, workers=None, **kwargs
+):
+    """
+    Run a bootstrap in chunks of replicates, spread across a process pool with pool_imap.
+
+    Every chunk gets its own seed spawned from the base seed, so results are the same
+    for any number of workers. Each chunk reduces its resamples to an accumulator (e.g.
+    a histogram) before returning, and the accumulators are summed as they arrive, so
+    the statistics of all replicates are never held at once.
+
+    Parameters:
+    - chunk_function (callable): Module-level function(ordered, n, replicates, seed,
+      **kwargs) returning an array that adds up across chunks.
+    - values (np.ndarray): 2-D array with one cross-section per row.
+    - replicates (int): Total number of resamples per row.
+    - seed (int): Base seed.
+    - chunk_size (int): Number of replicates per chunk.
+    - workers (int, optional): Number of worker processes. Defaults to the CPU count.
+    - **kwargs: Passed on to chunk_function.
+
+    Returns:
+    - np.ndarray: The sum of the chunk results.
+    """
+    ordered = np.sort(values, axis=1)  # NaNs are sorted to the end of each row
+    n = np.sum(~np.isnan(values), axis=1)
+    sizes = [
+        min(chunk_size, replicates - start) for start in range(0, replicates, chunk_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(ordered, n, size, child) for size, child in zip(sizes, seeds)]
+    total = 0
+    for result in pool_imap(partial(chunk_function, **kwargs), jobs, workers):
+        total = total + result
+    return total
+
+
+def share_bands(df, thresholds, replicates=10000, level=0.9, seed=0, **kwargs):
+    """
+    Bootstrap confidence bands for the share of each row's values above thresholds.
+    The percentiles are exact, from the histogram of the counts above each threshold.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row.
+    - thresholds (list): Thresholds for the share of values above them.
+    - replicates (int): Number of resamples per row.
+    - level (float): Coverage of the bands.
+    - seed (int): Base seed.
+    - **kwargs: Passed on to run_bootstrap (chunk_size, workers).
+
+    Returns:
+    - pd.DataFrame: Columns share_above_<threshold>_low and _high for each threshold.
+    """
+    values = df.to_numpy(dtype=float)
+    histogram = run_bootstrap(
+        _share_chunk, values, replicates, seed, thresholds=thresholds, **kwargs
+    )
+    tail = (1 - level) / 2 * 100
+    n = np.sum(~np.isnan(values), axis=1)[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        low, high = (
+            np.where(n > 0, histogram_percentile(histogram, q) / n, np.nan)
+            for q in (tail, 100 - tail)
+        )
+
+    bands = {}
+    for i, threshold in enumerate(thresholds):
+        bands[f"share_above_{threshold}_low"] = low[:, i]
+        bands[f"share_above_{threshold}_high"] = high[:, i]
+    return pd.DataFrame(bands, index=df.index)
+
+
+def density_bands(
+    df,
+    densities,
+    index_rows,
+    bw_adjust=1.0,
+    percentile_range=None,
+    replicates=10000,
+    level=0.9,
+    seed=0,
+    **kwargs,
+):
+    """
+    Bootstrap confidence bands for densities estimated with kde_grid. Each resample is
+    smoothed on the same grid with the bandwidth of the original estimate. The bands are
+    the average of the percentiles of every chunk of replicates, so only one chunk of
+    resampled densities is held at a time.
+
+    Parameters:
+    - df (pd.DataFrame): The data passed to kde_grid.
+    - densities (pd.DataFrame): The densities from kde_grid.
+    - index_rows (list): The rows to compute bands for.
+    - bw_adjust (float): The bw_adjust passed to kde_grid.
+    - percentile_range (float, optional): The percentile_range passed to kde_grid.
+    - replicates (int): Number of resamples per row.
+    - level (float): Coverage of the bands.
+    - seed (int): Base seed.
+    - **kwargs: Passed on to run_bootstrap (chunk_size, workers).
+
+    Returns:
+    - tuple: The lower and upper band (pd.DataFrame, index_rows x grid points), NaN
+      outside each row's support as in densities.
+    """
+    values = df.loc[index_rows].to_numpy(dtype=float)
+    if percentile_range is not None:
+        values = trim_percentiles(values, percentile_range)
+
+    tail = (1 - level) / 2 * 100
+    low, high = (
+        run_bootstrap(
+            _density_chunk,
+            values,
+            replicates,
+            seed,
+            grid=densities.columns.to_numpy(),
+            bw=scott_bandwidths(values, bw_adjust),
+            q=[tail, 100 - tail],
+            **kwargs,
+        )
+        / replicates
+    )
+
+    outside = densities.loc[index_rows].isna().to_numpy()
+    return tuple(
+        pd.DataFrame(
+            np.where(outside, np.nan, band), index=index_rows, columns=densities.columns
+        )
+        for band in (low, high)
+    )
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Percent trimmed from each end of the distribution; 50 gives the (weighted) median
+TRIM_PERCENTS = list(range(0, 55, 5))
+
+
+def sorted_cross_sections(df, weights=None):
+    """
+    Sort every row (quarter) of a table once, together with the subgroup weights.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row and one column per subgroup.
+    - weights (pd.Series, optional): Weight of each subgroup. Equal weights if omitted.
+
+    Returns:
+    - tuple: The sorted values (missing values last) and their weights, normalised to sum
+      to one over the values present in each row (both np.ndarray of the shape of df).
+    """
+    values = df.to_numpy(dtype=float)
+    if weights is None:
+        weights = np.ones(values.shape[1])
+    else:
+        weights = weights.reindex(df.columns).to_numpy(dtype=float)
+
+    order = np.argsort(values, axis=1)  # NaNs are sorted to the end of each row
+    values = np.take_along_axis(values, order, axis=1)
+    weights = np.where(np.isnan(values), 0, weights[order])
+    with np.errstate(invalid="ignore"):
+        weights = weights / weights.sum(axis=1, keepdims=True)
+    return values, weights
+
+
+def core_inflation(df, trim_percents=TRIM_PERCENTS, weights=None):
+    """
+    Compute trimmed means over a range of trim levels and the weighted median for every
+    row (quarter) from one sort of the table.
+
+    Each trimmed mean drops the given percent of weight from both ends of the row's
+    distribution (partially weighting the values straddling the cut) and averages the
+    rest. A trim of 50 percent gives the weighted median.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row and one column per subgroup.
+    - trim_percents (list): Percent of weight to trim from each end, between 0 and 50.
+    - weights (pd.Series, optional): Weight of each subgroup. Equal weights if omitted.
+
+    Returns:
+    - pd.DataFrame: One row per row of df and one column per trim percent.
+    """
+    values, weights = sorted_cross_sections(df, weights)
+    upper = np.cumsum(weights, axis=1)
+    lower = upper - weights
+    trims = np.asarray(trim_percents, dtype=float) / 100
+
+    core = np.empty((len(values), len(trims)))
+    for i, trim in enumerate(trims):
+        if trim < 0.5:
+            # Weight of every value that lies between the trim and 1 - trim
+            kept = np.clip(np.minimum(upper, 1 - trim) - np.maximum(lower, trim), 0, None)
+            core[:, i] = np.nansum(kept * values, axis=1) / (1 - 2 * trim)
+        else:
+            # First value whose cumulative weight reaches one half, averaged with the
+            # next value if it ends exactly at one half (as the median of an even count)
+            rows = np.arange(len(values))
+            at_half = np.isclose(upper, 0.5)
+            pos = np.argmax((upper >= 0.5) | at_half, axis=1)
+            following = np.minimum(pos + 1, values.shape[1] - 1)
+            core[:, i] = np.where(
+                at_half[rows, pos],
+                (values[rows, pos] + values[rows, following]) / 2,
+                values[rows, pos],
+            )
+
+    # Rows without any values
+    core[np.isnan(weights).all(axis=1)] = np.nan
+
+    return pd.DataFrame(
+        core, index=df.index, columns=pd.Index(trim_percents, name="trim_percent")
+    )
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+
+def row_percentiles(values, q):
+    """
+    Percentiles of every row, ignoring missing values, with one sort of the whole array.
+    Uses the same linear interpolation as np.percentile.
+
+    Parameters:
+    - values (np.ndarray): 2-D array with one cross-section per row.
+    - q (float or list): Percentile(s) between 0 and 100.
+
+    Returns:
+    - np.ndarray: Array of shape (len(q), n_rows) (NaN for rows without values).
+    """
+    ordered = np.sort(values, axis=1)  # NaNs are sorted to the end of each row
+    n = np.sum(~np.isnan(values), axis=1)
+    rank = np.atleast_1d(q)[:, None] / 100 * np.maximum(n - 1, 0)
+    below = np.floor(rank).astype(int)
+    above = np.minimum(below + 1, np.maximum(n - 1, 0))
+    rows = np.arange(len(values))
+    result = ordered[rows, below] + (rank - below) * (
+        ordered[rows, above] - ordered[rows, below]
+    )
+    return np.where(n > 0, result, np.nan)
+
+
+def trim_percentiles(values, percentile_range):
+    """
+    Mask the values of every row that fall outside the row's bottom and top percentiles.
+    All rows are trimmed at once; missing values are ignored.
+
+    Parameters:
+    - values (np.ndarray): 2-D array with one cross-section per row.
+    - percentile_range (float): Percentile to cut from each end of every row.
+
+    Returns:
+    - np.ndarray: A copy of values with the trimmed entries set to NaN.
+    """
+    lower, upper = row_percentiles(values, [percentile_range, 100 - percentile_range])
+    with np.errstate(invalid="ignore"):
+        keep = (values >= lower[:, None]) & (values <= upper[:, None])
+    return np.where(keep, values, np.nan)
+
+
+def scott_bandwidths(values, bw_adjust=1.0):
+    """
+    Gaussian kernel bandwidth of every row, using Scott's rule as seaborn's kdeplot does
+    (standard deviation * n ** (-1 / 5) * bw_adjust). Missing values are ignored.
+
+    Parameters:
+    - values (np.ndarray): 2-D array with one cross-section per row.
+    - bw_adjust (float): Factor that scales the bandwidth, as in sns.kdeplot.
+
+    Returns:
+    - np.ndarray: The bandwidth of every row (NaN for rows with fewer than 2 values).
+    """
+    present = ~np.isnan(values)
+    n = present.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(present, values, 0).sum(axis=1) / n
+        squares = np.where(present, values - mean[:, None], 0) ** 2
+        std = np.sqrt(squares.sum(axis=1) / (n - 1))
+        return np.where(n > 1, std * n ** (-1 / 5) * bw_adjust, np.nan)
+
+
+def smooth_on_grid(values, grid, bw):
+    """
+    Gaussian kernel density of every row on an evenly spaced grid: each row is linearly
+    binned onto the grid and all rows are smoothed at once by multiplying their FFTs
+    with the Fourier transform of each row's kernel. Missing values are ignored.
+
+    Parameters:
+    - values (np.ndarray): 2-D array with one sample per row, within the grid range.
+    - grid (np.ndarray): The evenly spaced grid.
+    - bw (np.ndarray): The kernel bandwidth of every row (NaN rows give NaN densities).
+
+    Returns:
+    - np.ndarray: Densities with one row per row of values and one column per grid point.
+    """
+    gridsize = len(grid)
+    step = grid[1] - grid[0]
+    valid = np.isfinite(bw) & (bw > 0)
+
+    # Linear binning: every value splits its weight between the two nearest grid points
+    rows, cols = np.nonzero(valid[:, None] & ~np.isnan(values))
+    pos = np.clip((values[rows, cols] - grid[0]) / step, 0, gridsize - 1)
+    left = np.minimum(np.floor(pos).astype(int), gridsize - 2)
+    weight = pos - left
+    flat = rows * gridsize + left
+    counts = np.bincount(
+        np.concatenate([flat, flat + 1]),
+        weights=np.concatenate([1 - weight, weight]),
+        minlength=len(values) * gridsize,
+    ).reshape(len(values), gridsize)
+
+    # Zero padding keeps the circular FFT convolution from wrapping around the grid
+    size = 2 ** int(np.ceil(np.log2(2 * gridsize)))
+    freqs = np.fft.rfftfreq(size, d=step)
+    kernel = np.exp(-2 * (np.pi * freqs[None, :] * np.where(valid, bw, 0)[:, None]) ** 2)
+    density = np.fft.irfft(np.fft.rfft(counts, n=size, axis=1) * kernel, n=size, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        density = density[:, :gridsize] / (counts.sum(axis=1, keepdims=True) * step)
+
+    # Clip tiny negative FFT round-off
+    density = np.maximum(density, 0)
+    density[~valid] = np.nan
+    return density
+
+
+def kde_grid(df, bw_adjust=1.0, percentile_range=None, gridsize=512, cut=3):
+    """
+    Estimate the density of every row (quarter) of a table on one shared grid.
+
+    Each row is smoothed with smooth_on_grid, using the row's own Scott bandwidth scaled
+    by bw_adjust. As with sns.kdeplot, every density
+    integrates to one and is only defined up to `cut` bandwidths beyond the row's
+    extreme values (NaN elsewhere).
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row.
+    - bw_adjust (float): Factor that scales the bandwidth, as in sns.kdeplot.
+    - percentile_range (float, optional): If provided, exclude data points outside the
+      top and bottom percentiles of each row.
+    - gridsize (int): Number of points of the shared grid.
+    - cut (float): Number of bandwidths the grid extends beyond the extreme values.
+
+    Returns:
+    - pd.DataFrame: Densities with one row per row of df and one column per grid point.
+    """
+    values = df.to_numpy(dtype=float)
+    if percentile_range is not None:
+        values = trim_percentiles(values, percentile_range)
+
+    bw = scott_bandwidths(values, bw_adjust)
+    valid = np.isfinite(bw) & (bw > 0)
+    present = valid[:, None] & ~np.isnan(values)
+    low = np.where(present, values, np.inf).min(axis=1) - cut * bw
+    high = np.where(present, values, -np.inf).max(axis=1) + cut * bw
+
+    grid = np.linspace(low[valid].min(), high[valid].max(), gridsize)
+    density = smooth_on_grid(values, grid, np.where(valid, bw, np.nan))
+
+    # Blank the grid outside each row's support
+    with np.errstate(invalid="ignore"):
+        outside = (grid[None, :] < low[:, None]) | (grid[None, :] > high[:, None])
+    density[outside | ~valid[:, None]] = np.nan
+
+    return pd.DataFrame(density, index=df.index, columns=pd.Index(grid, name="value"))
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from density_utils import trim_percentiles
+
+
+# Size of the largest temporary array of a block of pairs, in bytes
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def probability_grid(n):
+    """
+    Shared probability grid of the quantile functions of rows with n values each.
+
+    The grid holds every breakpoint k / n of every row count n, so each quantile function
+    is constant between consecutive grid points.
+
+    Parameters:
+    - n (np.ndarray): Number of values present in each row (at least one).
+
+    Returns:
+    - tuple: The grid points and the width of the grid interval ending at each point.
+    """
+    breaks = np.unique(np.concatenate([np.arange(1, c + 1) / c for c in np.unique(n)]))
+    return breaks, np.diff(np.r_[0, breaks])
+
+
+def quantile_functions(ordered, n, breaks):
+    """
+    Evaluate the empirical quantile function of every row on a probability grid.
+
+    Parameters:
+    - ordered (np.ndarray): Rows sorted with missing values last.
+    - n (np.ndarray): Number of values present in each row (at least one).
+    - breaks (np.ndarray): The grid from probability_grid.
+
+    Returns:
+    - np.ndarray: The quantiles (rows x grid points).
+    """
+    # Quantile at u is the ceil(u * n)-th smallest value
+    pos = np.ceil(breaks[None, :] * n[:, None] - 1e-9).astype(int) - 1
+    pos = np.clip(pos, 0, (n - 1)[:, None])
+    return np.take_along_axis(ordered, pos, axis=1)
+
+
+def distribution_functions(filled, n):
+    """
+    Evaluate the empirical distribution function of every row at every distinct value
+    of the rows.
+
+    Parameters:
+    - filled (np.ndarray): Rows sorted, with each row's missing values replaced by its
+      largest value.
+    - n (np.ndarray): Number of values present in each row (at least one).
+
+    Returns:
+    - tuple: The share of each row's values at or below each distinct value (rows x
+      distinct values), and the position of every value of filled among the distinct
+      values.
+    """
+    support, codes = np.unique(filled, return_inverse=True)
+    codes = codes.reshape(filled.shape)
+
+    # Count each row's values at every distinct value (leaving out the repeated ones),
+    # then accumulate the counts along the values
+    present = np.arange(filled.shape[1])[None, :] < n[:, None]
+    offsets = np.arange(len(filled))[:, None] * len(support)
+    counts = np.bincount(
+        (codes + offsets)[present], minlength=len(filled) * len(support)
+    ).reshape(len(filled), len(support))
+    return np.cumsum(counts, axis=1) / n[:, None], codes
+
+
+def largest_gap(cdf, own_cdf, codes):
+    """
+    Largest absolute difference between distribution functions at the values of rows.
+
+    Parameters:
+    - cdf (np.ndarray): Distribution functions of one set of rows (a x distinct values).
+    - own_cdf (np.ndarray): Distribution functions of the rows whose values are compared
+      at (b x distinct values).
+    - codes (np.ndarray): Positions of the values of those rows among the distinct
+      values (b x values).
+
+    Returns:
+    - np.ndarray: The largest difference of every pair (a x b).
+    """
+    gaps = cdf[:, codes]
+    gaps -= np.take_along_axis(own_cdf, codes, axis=1)
+    return np.abs(gaps, out=gaps).max(axis=2)
+
+
+def distance_matrices(df, percentile_range=None, block_bytes=BLOCK_BYTES):
+    """
+    Compute the Wasserstein-1 and Kolmogorov-Smirnov distances between the distributions
+    of every pair of rows (quarters).
+
+    Every row is sorted once and pairs are evaluated in square blocks of rows.
+    Wasserstein distances are integrals of the absolute difference between quantile
+    functions on one shared probability grid. Kolmogorov-Smirnov distances are the
+    largest difference between distribution functions, which is reached at a value of
+    one of the two rows, so each pair is only compared at its own values (looked up in
+    the distribution functions of the block's distinct values). The block size follows
+    from the grid size and the number of values per row, so the temporaries of a block
+    fit in block_bytes however many subgroups there are.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row.
+    - percentile_range (float, optional): If provided, exclude data points outside the
+      top and bottom percentiles of each row.
+    - block_bytes (int): Size limit of the temporary arrays of a block.
+
+    Returns:
+    - tuple: The Wasserstein-1 and Kolmogorov-Smirnov distances (pd.DataFrame, quarters
+      x quarters, NaN for rows without values).
+    """
+    values = df.to_numpy(dtype=float)
+    if percentile_range is not None:
+        values = trim_percentiles(values, percentile_range)
+
+    n = np.sum(~np.isnan(values), axis=1)
+    present = np.flatnonzero(n > 0)
+    n = n[present]
+    size = len(present)
+    wasserstein = np.full((len(values), len(values)), np.nan)
+    ks = np.full((len(values), len(values)), np.nan)
+    if size == 0:
+        empty = pd.DataFrame(wasserstein, index=df.index, columns=df.index)
+        return empty, empty.copy()
+
+    ordered = np.sort(values[present], axis=1)[:, : n.max()]  # NaNs are sorted last
+    # Repeating a row's largest value in place of its missing values leaves its
+    # distribution function unchanged
+    largest = ordered[np.arange(size), n - 1]
+    filled = np.where(np.isnan(ordered), largest[:, None], ordered)
+    breaks, widths = probability_grid(n)
+
+    # A block of b x b pairs holds b x b x (grid points) quantile differences and
+    # b x b x (values per row) distribution function differences, next to the counts
+    # and distribution functions of its 2 x b x (values per row) distinct values
+    per_pair = (len(breaks) + 12 * filled.shape[1]) * 8
+    block_size = max(1, min(size, int(np.sqrt(block_bytes / per_pair))))
+
+    # Distances are symmetric, so only blocks on or above the diagonal are computed
+    for start in range(0, size, block_size):
+        rows = np.arange(start, min(start + block_size, size))
+        quantiles = quantile_functions(ordered[rows], n[rows], breaks)
+        for col_start in range(start, size, block_size):
+            cols = np.arange(col_start, min(col_start + block_size, size))
+            other = quantile_functions(ordered[cols], n[cols], breaks)
+            gaps = quantiles[:, None] - other[None]
+            w = np.abs(gaps, out=gaps) @ widths
+
+            block = np.r_[rows, cols]
+            cdf, codes = distribution_functions(filled[block], n[block])
+            row_cdf, col_cdf = cdf[: len(rows)], cdf[len(rows) :]
+            row_codes, col_codes = codes[: len(rows)], codes[len(rows) :]
+            # Largest difference at the values of the rows, then at those of the columns
+            at_rows = largest_gap(col_cdf, row_cdf, row_codes)
+            at_cols = largest_gap(row_cdf, col_cdf, col_codes)
+            k = np.maximum(at_rows.T, at_cols)
+
+            i, j = np.ix_(present[rows], present[cols])
+            wasserstein[i, j], wasserstein[j.T, i.T] = w, w.T
+            ks[i, j], ks[j.T, i.T] = k, k.T
+
+    return (
+        pd.DataFrame(wasserstein, index=df.index, columns=df.index),
+        pd.DataFrame(ks, index=df.index, columns=df.index),
+    )
+
+
+def nearest_analogues(distances, quarter, n=5, exclude_window=4):
+    """
+    Find the earlier quarters whose distribution is closest to a quarter's.
+
+    Parameters:
+    - distances (pd.DataFrame): A quarters x quarters distance matrix from distance_matrices.
+    - quarter (str): The quarter to find analogues for.
+    - n (int): Number of analogues to return.
+    - exclude_window (int): Number of directly preceding quarters to skip, as their annual
+      changes overlap with the quarter's.
+
+    Returns:
+    - pd.Series: The distances of the nearest earlier quarters, closest first.
+    """
+    pos = distances.index.get_loc(quarter)
+    history = distances.iloc[pos, : max(pos - exclude_window, 0)].dropna()
+    return history.nsmallest(n)
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Growth-rate horizons: the change over `periods` quarters, optionally annualised, of the
+# index or of its `window`-quarter average, using the seasonally adjusted index when
+# `seasonally_adjusted` is set. Labels are used in chart titles and axes.
+HORIZONS = {
+    "qoq": {
+        "periods": 1,
+        "label": "Quarterly inflation",
+        "axis_label": "Quarterly percent change",
+    },
+    "qoq_annualized": {
+        "periods": 1,
+        "annualize": True,
+        "label": "Annualised quarterly inflation (not seasonally adjusted)",
+        "axis_label": "Annualised quarterly percent change",
+    },
+    "qoq_saar": {
+        "periods": 1,
+        "annualize": True,
+        "seasonally_adjusted": True,
+        "label": "Annualised quarterly inflation (seasonally adjusted)",
+        "axis_label": "Seasonally adjusted annualised quarterly percent change",
+    },
+    "yoy": {
+        "periods": 4,
+        "label": "Annual inflation",
+        "axis_label": "Annual percent change",
+    },
+    "two_year_annualized": {
+        "periods": 8,
+        "annualize": True,
+        "label": "Annualised two-year inflation",
+        "axis_label": "Annualised two-year percent change",
+    },
+    "annual_average": {
+        "periods": 4,
+        "window": 4,
+        "label": "Annual average inflation",
+        "axis_label": "Annual average percent change",
+    },
+}
+
+
+def rolling_mean(values, window):
+    """
+    Trailing mean over `window` rows (NaN until a full window is available).
+
+    Parameters:
+    - values (np.ndarray): 2-D array with one period per row.
+    - window (int): Number of rows to average.
+
+    Returns:
+    - np.ndarray: The rolling means, same shape as values.
+    """
+    means = np.full(values.shape, np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    means[window - 1 :] = windows.mean(axis=-1)
+    return means
+
+
+def growth_rates(df, horizons=HORIZONS, periods_per_year=4, adjusted=None):
+    """
+    Compute percent changes of an index table over several horizons in one pass over its
+    values, stacked into one horizon-indexed table.
+
+    Missing values are padded forward first, as pct_change does, so the "yoy" horizon is
+    identical to df.pct_change(periods=4) * 100. Annualised horizons use log differences
+    (one log of the levels shared by all of them) instead of a power per horizon.
+    Seasonally adjusted horizons are left out unless the adjusted index is given.
+
+    Parameters:
+    - df (pd.DataFrame): Index levels, one row per quarter and one column per subgroup.
+    - horizons (dict): Horizon name -> {"periods", optional "annualize", "window",
+      "seasonally_adjusted"}.
+    - periods_per_year (int): Number of periods in a year, used to annualise.
+    - adjusted (pd.DataFrame, optional): The seasonally adjusted index, same shape as df.
+
+    Returns:
+    - pd.DataFrame: Percent changes indexed by (horizon, quarter), one column per subgroup.
+    """
+    # Imported here, as the plot scripts only read HORIZONS from this module
+    import pandas as pd
+
+    if adjusted is None:
+        horizons = {
+            name: spec
+            for name, spec in horizons.items()
+            if not spec.get("seasonally_adjusted")
+        }
+    values = {False: df.ffill().to_numpy(dtype=float)}
+    if adjusted is not None:
+        values[True] = adjusted.reindex_like(df).ffill().to_numpy(dtype=float)
+    levels = {}
+    logs = {}
+
+    rates = np.full((len(horizons), len(df), len(df.columns)), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i, spec in enumerate(horizons.values()):
+            periods, window = spec["periods"], spec.get("window", 1)
+            # The first rate needs `periods` rows after the first full window
+            if periods + window - 1 >= len(df):
+                continue
+            key = (bool(spec.get("seasonally_adjusted")), window)
+            if key not in levels:
+                levels[key] = rolling_mean(values[key[0]], window)
+            level = levels[key]
+
+            if spec.get("annualize") and periods != periods_per_year:
+                if key not in logs:
+                    logs[key] = np.log(level)
+                log_change = logs[key][periods:] - logs[key][:-periods]
+                rates[i, periods:] = np.expm1(log_change * periods_per_year / periods) * 100
+            else:
+                rates[i, periods:] = (level[periods:] / level[:-periods] - 1) * 100
+
+    index = pd.MultiIndex.from_product(
+        [list(horizons), df.index], names=["horizon", df.index.name]
+    )
+    return pd.DataFrame(
+        rates.reshape(-1, len(df.columns)), index=index, columns=df.columns
+    )
@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_imap(function, jobs, workers=None):
+    """
+    Run a function over a list of argument tuples, spread across a process pool, and
+    yield the results as they are consumed, so a caller reducing them (e.g. summing)
+    does not hold all of them at once.
+
+    Pools use the fork start method, so the calling scripts do not need a main guard;
+    where fork is not available (e.g. Windows) the jobs run in this process.
+
+    Parameters:
+    - function (callable): Module-level function to call with each job's arguments.
+    - jobs (list): Argument tuples, one per call.
+    - workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Yields:
+    - object: The results, in the order of the jobs.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    can_fork = "fork" in multiprocessing.get_all_start_methods()
+    if workers > 1 and len(jobs) > 1 and can_fork:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            mp_context=multiprocessing.get_context("fork"),
+        ) as pool:
+            yield from pool.map(function, *zip(*jobs))
+    else:
+        for job in jobs:
+            yield function(*job)
+
+
+def pool_map(function, jobs, workers=None):
+    """
+    Run a function over a list of argument tuples, spread across a process pool (see
+    pool_imap).
+
+    Parameters:
+    - function (callable): Module-level function to call with each job's arguments.
+    - jobs (list): Argument tuples, one per call.
+    - workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Returns:
+    - list: The results, in the order of the jobs.
+    """
+    return list(pool_imap(function, jobs, workers))
@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from pool_utils import pool_map
+from statsmodels.tsa.seasonal import STL
+
+COMPONENTS = ["trend", "seasonal", "resid"]
+
+
+def column_key(series, period, robust):
+    """
+    Content hash of one column and the STL settings, used as its cache key.
+
+    Parameters:
+    - series (pd.Series): The column without missing values.
+    - period (int): The seasonal period.
+    - robust (bool): Whether the robust STL fit is used.
+
+    Returns:
+    - str: The hex digest.
+    """
+    digest = hashlib.sha1(f"{period}-{robust}".encode())
+    digest.update(pd.util.hash_pandas_object(series, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def longest_span(series):
+    """
+    The longest run of consecutive observed values of a column. Values on either side of
+    a gap are not joined, as that would shift the seasonal phase after the gap.
+
+    Parameters:
+    - series (pd.Series): The column, on a regular index (e.g. every quarter).
+
+    Returns:
+    - pd.Series: The values of the longest run (the earliest of equally long runs),
+      empty if nothing is observed.
+    """
+    present = series.notna().to_numpy().astype(np.int8)
+    # Runs start where a value follows a gap and end where a gap follows a value
+    edges = np.diff(np.concatenate([[0], present, [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return series.iloc[:0]
+    longest = np.argmax(ends - starts)
+    return series.iloc[starts[longest] : ends[longest]]
+
+
+def _decompose(values, period, robust):
+    # Trend, seasonal and remainder of one series (series x components)
+    result = STL(values, period=period, robust=robust).fit()
+    return np.column_stack([result.trend, result.seasonal, result.resid])
+
+
+def decompose_columns(df, cache_path, period=4, robust=True, workers=None):
+    """
+    Run an STL decomposition of every column over its longest span without gaps (see
+    longest_span), reusing cached components of columns whose data did not change.
+    Columns whose span is shorter than two periods, the least STL can fit, are skipped.
+
+    The cache is one pickle of {column hash: components}. Columns that are not cached
+    are decomposed across a process pool, and entries no longer used are dropped.
+
+    Parameters:
+    - df (pd.DataFrame): The data, indexed by quarter with one column per subgroup.
+    - cache_path (str): Path of the cache pickle.
+    - period (int): The seasonal period (4 for quarterly data).
+    - robust (bool): Use the robust STL fit, which downweights outliers.
+    - workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Returns:
+    - tuple: The components (pd.DataFrame with (component, subgroup) columns, NaN outside
+      each column's span and for skipped columns), the list of columns that were
+      recomputed and the list of columns that were skipped.
+    """
+    cache = pd.read_pickle(cache_path) if os.path.exists(cache_path) else {}
+
+    spans = {col: longest_span(df[col]) for col in df}
+    series = {col: span for col, span in spans.items() if len(span) >= 2 * period}
+    skipped = [col for col in df if col not in series]
+    keys = {col: column_key(values, period, robust) for col, values in series.items()}
+    missing = [col for col in series if keys[col] not in cache]
+
+    jobs = [(series[col].to_numpy(), period, robust) for col in missing]
+    for col, components in zip(missing, pool_map(_decompose, jobs, workers)):
+        cache[keys[col]] = pd.DataFrame(
+            components, index=series[col].index, columns=COMPONENTS
+        )
+
+    cache = {keys[col]: cache[keys[col]] for col in series}
+    pd.to_pickle(cache, cache_path)
+
+    unadjusted = pd.DataFrame(np.nan, index=df.index, columns=COMPONENTS)
+    components = pd.concat(
+        {col: cache[keys[col]] if col in keys else unadjusted for col in df}, axis=1
+    ).reindex(df.index).swaplevel(axis=1)
+    return components[COMPONENTS], missing, skipped
+
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from bootstrap_utils import share_bands
+from density_utils import row_percentiles
+
+PERCENTILES = [10, 25, 50, 75, 90]
+THRESHOLDS = [0, 2, 5]
+
+
+def quarter_stats(
+    df, percentiles=PERCENTILES, thresholds=THRESHOLDS, bands=None, replicates=10000
+):
+    """
+    Compute cross-sectional statistics of every row (quarter) at once, ignoring missing
+    values: count, mean, standard deviation, skew, percentiles, interquartile range and
+    the share of values above each threshold. Optionally adds bootstrap confidence bands
+    for the shares.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row.
+    - percentiles (list): Percentiles to compute (columns p10, p50, ...).
+    - thresholds (list): Thresholds for the share of values above them (columns share_above_2, ...).
+    - bands (float, optional): If provided, the coverage of bootstrap bands for the shares
+      (columns share_above_2_low, share_above_2_high, ...).
+    - replicates (int): Number of bootstrap resamples per quarter.
+
+    Returns:
+    - pd.DataFrame: One row per row of df and one column per statistic.
+    """
+    values = df.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    n = present.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(present, values, 0).sum(axis=1) / n
+        deviation = np.where(present, values - mean[:, None], 0)
+        m2 = (deviation**2).sum(axis=1) / n
+        m3 = (deviation**3).sum(axis=1) / n
+        std = np.sqrt(m2 * n / (n - 1))
+        # Adjusted Fisher-Pearson skew, as pandas' DataFrame.skew
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2**1.5
+
+        stats = {
+            "count": n,
+            "mean": mean,
+            "std": np.where(n > 1, std, np.nan),
+            "skew": np.where(n > 2, skew, np.nan),
+        }
+
+        quartiles = sorted(set(percentiles) | {25, 75})
+        values_at = dict(zip(quartiles, row_percentiles(values, quartiles)))
+        stats.update({f"p{q}": values_at[q] for q in percentiles})
+        stats["iqr"] = values_at[75] - values_at[25]
+
+        for threshold in thresholds:
+            above = (values > threshold).sum(axis=1) / n
+            stats[f"share_above_{threshold}"] = np.where(n > 0, above, np.nan)
+
+    stats = pd.DataFrame(stats, index=df.index)
+    if bands is not None:
+        stats = stats.join(share_bands(df, thresholds, replicates, level=bands))
+    return stats
+
+
+def quarter_movers(df, k=3):
+    """
+    Find the k highest and k lowest values of every row (quarter) with argpartition,
+    ignoring missing values.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with one cross-section per row and one column per subgroup.
+    - k (int): Number of movers on each side.
+
+    Returns:
+    - pd.DataFrame: Subgroup and value indexed by the index of df (e.g. quarter), side
+      ('top' or 'bottom') and rank (1 is the most extreme).
+    """
+    values = df.to_numpy(dtype=float)
+    k = min(k, values.shape[1])
+    rows = np.arange(len(values))[:, None]
+    parts = []
+
+    for side, fill, sign in [("top", -np.inf, -1), ("bottom", np.inf, 1)]:
+        # Missing values are pushed to the far end so they are only picked if a row has
+        # fewer than k values
+        keyed = sign * np.where(np.isnan(values), fill, values)
+        cols = np.argpartition(keyed, k - 1, axis=1)[:, :k]
+        cols = np.take_along_axis(cols, np.argsort(keyed[rows, cols], axis=1), axis=1)
+        picked = values[rows, cols]
+        keep = ~np.isnan(picked)
+
+        parts.append(
+            pd.DataFrame(
+                {
+                    "side": side,
+                    "rank": np.tile(np.arange(1, k + 1), len(values))[keep.ravel()],
+                    "Subgroup": df.columns[cols[keep]],
+                    "value": picked[keep],
+                },
+                index=df.index.repeat(k)[keep.ravel()],
+            )
+        )
+
+    return pd.concat(parts).set_index(["side", "rank"], append=True).sort_index()
@@ -1,10 +1,53 @@
-import matplotlib.pyplot as plt
+import functools
+import sys
+
+import matplotlib as mpl
 import numpy as np
-import pandas as pd
-import seaborn as sns
-from plot_utils import save_plot_as_image
+from matplotlib.colors import to_rgba
+from export_utils import wait_for_exports
+from plot_utils import restore_plot_image, save_plot_as_image, show_plots
+from render_cache_utils import chart_key
+
+# pyplot and pandas are only imported by the charts that are drawn, so restoring charts
+# from the render cache (e.g. python cli.py plot cpi-density) does not load them
+sys.path.append("../../..")
+sys.path.append("../data")
+sys.path.append("../features")
+from chart_utils import chart_selected
+from growth_utils import HORIZONS
+
+# Growth-rate horizon to chart (any key of growth_utils.HORIZONS, e.g. "qoq_saar" for
+# seasonally adjusted annualised quarterly inflation)
+horizon = "yoy"
+
+GROWTH_PATH = "../../data/processed/nz_cpi_group_3_growth.pkl"
+horizon_label = HORIZONS[horizon]["label"]
+axis_label = HORIZONS[horizon]["axis_label"]
+
+# Density estimate of every quarter (top/bottom 2 percent removed)
+DENSITY_PARAMS = {"bw_adjust": 0.5, "percentile_range": 2}
+
+# The charts are keyed on the growth rates file and the code estimating the densities,
+# so cached charts are restored without reading or computing anything
+DENSITY_FILES = [GROWTH_PATH, "../features/density_utils.py"]
+BAND_FILES = ["../features/bootstrap_utils.py", "../features/pool_utils.py"]
+
+
+@functools.cache
+def estimate_densities():
+    """
+    Read the growth rates of the charted horizon and estimate the density of every
+    quarter on one shared grid, once for all the charts drawn.
+
+    Returns:
+    - tuple: The growth rates and the densities from kde_grid (pd.DataFrame).
+    """
+    import pandas as pd
+    from density_utils import kde_grid
+
+    cpi_rates = pd.read_pickle(GROWTH_PATH).loc[horizon]
+    return cpi_rates, kde_grid(cpi_rates, **DENSITY_PARAMS)
 
-cpi_data_apc = pd.read_pickle("../../data/processed/nz_cpi_group_3_apc_2023q4.pkl")
 
 # --------------------------------------------------------------
 # Set styling
@@ -28,74 +71,82 @@ GREEN = "#029e73"
 
 # Set font family
 font_family = "Consolas"  # techy feel
-plt.rcParams["font.family"] = font_family
+mpl.rcParams["font.family"] = font_family
 
 # Set global spine customizations
-plt.rcParams["axes.spines.right"] = False
-plt.rcParams["axes.spines.top"] = False
-plt.rcParams["axes.spines.left"] = False
-plt.rcParams["axes.spines.bottom"] = True
+mpl.rcParams["axes.spines.right"] = False
+mpl.rcParams["axes.spines.top"] = False
+mpl.rcParams["axes.spines.left"] = False
+mpl.rcParams["axes.spines.bottom"] = True
 
 # Set tick color for the x-axis
-plt.rcParams["xtick.color"] = GREY40
-# plt.rcParams['ytick.color'] = GREY40
-plt.rcParams["ytick.left"] = False
+mpl.rcParams["xtick.color"] = GREY40
+# mpl.rcParams['ytick.color'] = GREY40
+mpl.rcParams["ytick.left"] = False
 
 # Choose grid options
-plt.rcParams["axes.grid"] = True
-plt.rcParams["axes.grid.axis"] = "y"
-plt.rcParams["grid.color"] = GREY91
-plt.rcParams["grid.linewidth"] = 1.0
+mpl.rcParams["axes.grid"] = True
+mpl.rcParams["axes.grid.axis"] = "y"
+mpl.rcParams["grid.color"] = GREY91
+mpl.rcParams["grid.linewidth"] = 1.0
 
 # Set global tick label font size
-plt.rcParams["xtick.labelsize"] = 12
-plt.rcParams["ytick.labelsize"] = 12
+mpl.rcParams["xtick.labelsize"] = 12
+mpl.rcParams["ytick.labelsize"] = 12
 
 # --------------------------------------------------------------
 # Create plot
 # --------------------------------------------------------------
 
 
-def plot_multiple_densities_seaborn(df, index_rows, percentile_range=None):
+def plot_multiple_densities_seaborn(densities, index_rows, bands=None):
     """
-    Plot density curves of the CPI annual percentage change for specified index rows using seaborn.
-    Optionally exclude data points outside the top and bottom percentiles.
+    Plot density curves of the CPI annual percentage change for specified index rows.
+    The densities are estimated beforehand for all quarters at once with kde_grid.
+    Optionally shade bootstrap confidence bands around the curves.
 
     Parameters:
-    df (pd.DataFrame): The DataFrame containing the CPI data.
+    densities (pd.DataFrame): Densities from kde_grid, with one row per quarter and one column per grid point.
     index_rows (list): A list of index labels for the rows for which to plot the density curves.
-    percentile_range (float, optional): If provided, exclude data points outside the top and bottom percentiles.
+    bands (tuple, optional): The lower and upper band from density_bands.
     """
+    import matplotlib.pyplot as plt
 
     # Set up the matplotlib figure and axes
     fig, ax = plt.subplots(figsize=(10, 6))
 
     custom_palette = [BLUE, GREEN, RED]
+    grid = densities.columns.to_numpy()
 
     for index_row, color in zip(index_rows, custom_palette):
-        # Select the row for the specified index
-        row_data = df.loc[index_row]
-
-        # Exclude outliers if percentile_range is provided
-        if percentile_range is not None:
-            lower_percentile = np.percentile(row_data, percentile_range)
-            upper_percentile = np.percentile(row_data, 100 - percentile_range)
-            row_data = row_data[
-                (row_data >= lower_percentile) & (row_data <= upper_percentile)
-            ]
-
-        # Plot a density curve with seaborn on the specified axes
-        sns.kdeplot(
-            row_data,
-            bw_adjust=0.5,
+        # Select the density for the specified index
+        density = densities.loc[index_row].to_numpy()
+
+        # Draw the filled density curve (as sns.kdeplot with fill=True)
+        area = ax.fill_between(
+            grid,
+            density,
             label=index_row,
-            ax=ax,
-            fill=True,
-            alpha=0.1,
+            facecolor=to_rgba(color, 0.1),
+            edgecolor=color,
             linewidth=2,
-            color=color,
         )
 
+        # Keep the y-axis starting at zero density
+        area.sticky_edges.y[:] = [0]
+
+        # Shade the bootstrap confidence band
+        if bands is not None:
+            lower, upper = bands
+            ax.fill_between(
+                grid,
+                lower.loc[index_row].to_numpy(),
+                upper.loc[index_row].to_numpy(),
+                color=color,
+                alpha=0.2,
+                linewidth=0,
+            )
+
     # Adding a horizontal line at y=0
     ax.axvline(0, color=GREY40, linestyle="--", alpha=0.75)
 
@@ -109,9 +160,10 @@ def plot_multiple_densities_seaborn(df, index_rows, percentile_range=None):
     return fig, ax
 
 
-fig, ax = plot_multiple_densities_seaborn(
-    cpi_data_apc, ["2023Q4", "2022Q4", "2020Q4"], percentile_range=2 # Update new data release
-)
+quarters_to_plot = ["2023Q4", "2022Q4", "2020Q4"]  # Update new data release
+
+# Add 90% bootstrap confidence bands to the density curves
+SHOW_BANDS = False
 
 # --------------------------------------------------------------
 # Plot specific customizations
@@ -124,100 +176,333 @@ x_frequency = 5
 x_ticks = np.arange(x_start, x_end + x_frequency, x_frequency)
 x_ticks = np.round(x_ticks).astype(int)
 
-ax.set_xticks(x_ticks)
-ax.set_xticklabels(x_ticks, weight=500, color=GREY40)
-
-# Customize the start, end, and frequency of the y tick labels
-current_ticks = ax.get_yticks()
-new_ticks = np.arange(current_ticks.min(), current_ticks.max() + 0.05, 0.05)
-ax.set_yticks(new_ticks)
-new_ticks = np.round(new_ticks,2)
-ax.set_yticklabels(new_ticks, weight=500, color=GREY40)
-
-# customize legend
-# ax.legend(title=None, fontsize="12")
-
-# Customize x labels
-ax.set_xlabel("Annual percent change", fontsize=14, labelpad=15)
-
-# Set y labels size and padding
-ax.set_ylabel("Density", fontsize=14, labelpad=15)
-
-# Customize y labels
-colors = [BLUE, GREEN, RED]  # List of colors for each curve
-points = [
-    (6.25, 0.11), # Update new data release
-    (15, 0.025), # Update new data release
-    (-2.5, 0.0425), # Update new data release
-]  # List of points to annotate (x, y) on the density curves
-texts = ["2023-Q4", "2022-Q4", "2020-Q4"]  # List of annotation texts (update new data release)
-connectionstyles = [
-    "arc3,rad=-0.3",
-    "arc3,rad=-0.3",
-    "arc3,rad=0.2",
-]  # Different connection styles for each annotation
-
-for point, text, color, conn_style in zip(points, texts, colors, connectionstyles):
+
+def customize_density_chart(fig, ax):
+    """
+    Style the density chart: ticks, axis labels, curve annotations, titles and footer.
+
+    Parameters:
+    fig (matplotlib.figure.Figure): The figure from plot_multiple_densities_seaborn.
+    ax (matplotlib.axes.Axes): Its axes.
+    """
+    ax.set_xticks(x_ticks)
+    ax.set_xticklabels(x_ticks, weight=500, color=GREY40)
+
+    # Customize the start, end, and frequency of the y tick labels
+    current_ticks = ax.get_yticks()
+    new_ticks = np.arange(current_ticks.min(), current_ticks.max() + 0.05, 0.05)
+    ax.set_yticks(new_ticks)
+    new_ticks = np.round(new_ticks,2)
+    ax.set_yticklabels(new_ticks, weight=500, color=GREY40)
+
+    # customize legend
+    # ax.legend(title=None, fontsize="12")
+
+    # Customize x labels
+    ax.set_xlabel(axis_label, fontsize=14, labelpad=15)
+
+    # Set y labels size and padding
+    ax.set_ylabel("Density", fontsize=14, labelpad=15)
+
+    # Customize y labels
+    colors = [BLUE, GREEN, RED]  # List of colors for each curve
+    points = [
+        (6.25, 0.11), # Update new data release
+        (15, 0.025), # Update new data release
+        (-2.5, 0.0425), # Update new data release
+    ]  # List of points to annotate (x, y) on the density curves
+    texts = ["2023-Q4", "2022-Q4", "2020-Q4"]  # List of annotation texts (update new data release)
+    connectionstyles = [
+        "arc3,rad=-0.3",
+        "arc3,rad=-0.3",
+        "arc3,rad=0.2",
+    ]  # Different connection styles for each annotation
+
+    for point, text, color, conn_style in zip(points, texts, colors, connectionstyles):
+        ax.annotate(
+            text,
+            xy=point,
+            xytext=(point[0] - 0.1, point[1] + 0.05),
+            arrowprops=dict(
+                facecolor=color, # Set the color of the arrowhead (the "face" of the arrow) 
+                shrink=0.01,# Shrink the start and end of the arrow by a small fraction to avoid overlap with the text and point
+                headwidth=8,  # Set the width of the arrowhead
+                width=0.6,  # Set the width of the arrow's body (the line part)
+                connectionstyle=conn_style,
+                alpha=0.5,
+            ),
+            fontsize=12,
+            color=color,
+            ha="center",
+        )
+
+    # Add title
+    fig.suptitle(
+        "CPI Inflation Density Distribution in New Zealand",
+        fontsize=22,
+        x=0.05,
+        y=0.97,
+        ha="left",
+        color=CHARCOAL,
+        weight="bold",
+    )
+
+    # Add subtitle
+    ax.set_title(
+        f"{horizon_label} across CPI level 2 subgroups (top/bottom 2 percent removed)",
+        loc="left",
+        fontsize=16,
+        x=-0.06,
+        # y=1.2,
+        pad=25,  # padding between the top of the plot and the subheading
+        color=CHARCOAL,
+    )
+
+    # Add annotations
+    ax.annotate(
+        "@mardywong",
+        xy=(1.0, -0.25),
+        xycoords="axes fraction",
+        ha="right",
+        va="center",
+        fontsize=11,
+        color=CHARCOAL,
+    )
+
     ax.annotate(
-        text,
-        xy=point,
-        xytext=(point[0] - 0.1, point[1] + 0.05),
-        arrowprops=dict(
-            facecolor=color, # Set the color of the arrowhead (the "face" of the arrow) 
-            shrink=0.01,# Shrink the start and end of the arrow by a small fraction to avoid overlap with the text and point
-            headwidth=8,  # Set the width of the arrowhead
-            width=0.6,  # Set the width of the arrow's body (the line part)
-            connectionstyle=conn_style,
-            alpha=0.5,
-        ),
-        fontsize=12,
-        color=color,
-        ha="center",
+        "Source: Statistics NZ",
+        xy=(-0.07, -0.25),
+        xycoords="axes fraction",
+        ha="left",
+        va="center",
+        fontsize=11,
+        color=CHARCOAL,
+    )
+
+    fig.tight_layout()
+
+
+# Colours and labels used by the chart functions, which are part of the chart keys
+style = {
+    "colors": [BLUE, GREEN, RED, GREY40, GREY98, CHARCOAL],
+    "labels": [horizon_label, axis_label],
+    "x_ticks": x_ticks.tolist(),
+    "x_range": [x_start, x_end],
+    "horizon": horizon,
+    **DENSITY_PARAMS,
+}
+
+if chart_selected("cpi-density"):
+    # Only draw the chart if its densities, style or code changed since last saved
+    density_chart_key = chart_key(
+        params={**style, "quarters": quarters_to_plot, "bands": SHOW_BANDS},
+        functions=[plot_multiple_densities_seaborn, customize_density_chart],
+        files=DENSITY_FILES + (BAND_FILES if SHOW_BANDS else []),
     )
+    if not restore_plot_image("cpi_inflation_density_nz", density_chart_key):
+        cpi_rates, densities = estimate_densities()
+        bands = None
+        if SHOW_BANDS:
+            from bootstrap_utils import density_bands
+
+            bands = density_bands(
+                cpi_rates, densities, quarters_to_plot, **DENSITY_PARAMS
+            )
+        fig, ax = plot_multiple_densities_seaborn(
+            densities, quarters_to_plot, bands=bands
+        )
+        customize_density_chart(fig, ax)
+        save_plot_as_image(  # Save the image into a folder
+            filename="cpi_inflation_density_nz", key=density_chart_key
+        )
+    show_plots()
+
+# --------------------------------------------------------------
+# Distribution over time (every quarter)
+# --------------------------------------------------------------
+
+
+def quarter_ticks(quarters, year_step=5):
+    """
+    Positions and labels for the first quarter of every year_step-th year.
+
+    Parameters:
+    - quarters (pd.Index): Quarter labels such as '2023Q4'.
+    - year_step (int): Number of years between labels.
+
+    Returns:
+    - tuple: The tick positions (np.ndarray) and labels (list).
+    """
+    years = quarters.str[:4].astype(int)
+    positions = np.flatnonzero(quarters.str.endswith("Q1") & (years % year_step == 0))
+    return positions, list(years[positions])
+
 
-# Add title
-fig.suptitle(
-    "CPI Inflation Density Distribution in New Zealand",
-    fontsize=22,
-    x=0.05,
-    y=0.97,
-    ha="left",
-    color=CHARCOAL,
-    weight="bold",
-)
-
-# Add subtitle
-ax.set_title(
-    "Annual inflation across CPI level 2 subgroups (top/bottom 2 percent removed)",
-    loc="left",
-    fontsize=16,
-    x=-0.06,
-    # y=1.2,
-    pad=25,  # padding between the top of the plot and the subheading
-    color=CHARCOAL,
-)
-
-# Add annotations
-ax.annotate(
-    "@mardywong",
-    xy=(1.0, -0.25),
-    xycoords="axes fraction",
-    ha="right",
-    va="center",
-    fontsize=11,
-    color=CHARCOAL,
-)
-
-ax.annotate(
-    "Source: Statistics NZ",
-    xy=(-0.07, -0.25),
-    xycoords="axes fraction",
-    ha="left",
-    va="center",
-    fontsize=11,
-    color=CHARCOAL,
-)
-
-plt.tight_layout()
-save_plot_as_image(filename="cpi_inflation_density_nz")  # Save the image into a folder
-plt.show()
+def plot_density_heatmap(densities, year_step=5):
+    """
+    Plot the density of every quarter as one heatmap image (quarter x annual percent change).
+
+    Parameters:
+    - densities (pd.DataFrame): Densities from kde_grid, with one row per quarter and one column per grid point.
+    - year_step (int): Number of years between the quarter labels.
+
+    Returns:
+    - tuple: The figure and axes.
+    """
+    import matplotlib.pyplot as plt
+
+    densities = densities.dropna(how="all")
+    grid = densities.columns.to_numpy()
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+
+    # One image for all quarters: rows are quarters (oldest at the top), NaN is left blank
+    image = ax.imshow(
+        np.ma.masked_invalid(densities.to_numpy()),
+        aspect="auto",
+        cmap="Blues",
+        interpolation="nearest",
+        extent=(grid[0], grid[-1], len(densities) - 0.5, -0.5),
+    )
+    fig.colorbar(image, ax=ax, label="Density", pad=0.02)
+
+    positions, labels = quarter_ticks(densities.index, year_step)
+    ax.set_yticks(positions)
+    ax.set_yticklabels(labels, weight=500, color=GREY40)
+    ax.grid(False)
+
+    ax.axvline(0, color=GREY40, linestyle="--", alpha=0.75)
+    ax.set_xlabel(axis_label, fontsize=14, labelpad=15)
+
+    return fig, ax
+
+
+def plot_density_ridgeline(densities, overlap=4.0, year_step=5):
+    """
+    Plot the density of every quarter as a ridgeline, with all ridges drawn as one
+    collection. Later quarters are drawn lower down and in front of earlier ones.
+
+    Parameters:
+    - densities (pd.DataFrame): Densities from kde_grid, with one row per quarter and one column per grid point.
+    - overlap (float): Height of a ridge with the median peak density, in rows.
+    - year_step (int): Number of years between the quarter labels.
+
+    Returns:
+    - tuple: The figure and axes.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import PolyCollection
+
+    densities = densities.dropna(how="all")
+    grid = densities.columns.to_numpy()
+    values = densities.to_numpy()
+    scale = overlap / np.nanmedian(np.nanmax(values, axis=1))
+
+    # One closed polygon per quarter, on the quarter's support only
+    ridges = []
+    for row, density in enumerate(values):
+        support = ~np.isnan(density)
+        x = grid[support]
+        y = len(values) - 1 - row + density[support] * scale
+        baseline = len(values) - 1 - row
+        ridges.append(
+            np.column_stack(
+                [np.r_[x[0], x, x[-1]], np.r_[baseline, y, baseline]]
+            )
+        )
+
+    fig, ax = plt.subplots(figsize=(10, 12))
+    ax.add_collection(
+        PolyCollection(ridges, facecolors=GREY98, edgecolors=BLUE, linewidths=0.8)
+    )
+    ax.autoscale_view()
+
+    positions, labels = quarter_ticks(densities.index, year_step)
+    ax.set_yticks(len(values) - 1 - positions)
+    ax.set_yticklabels(labels, weight=500, color=GREY40)
+    ax.grid(False)
+
+    ax.axvline(0, color=GREY40, linestyle="--", alpha=0.75, zorder=0)
+    ax.set_xlabel(axis_label, fontsize=14, labelpad=15)
+
+    return fig, ax
+
+
+def customize_over_time_chart(fig, ax):
+    """
+    Style a chart of the distribution over time: x-axis ticks, titles and footer.
+
+    Parameters:
+    fig (matplotlib.figure.Figure): The figure from plot_density_heatmap or plot_density_ridgeline.
+    ax (matplotlib.axes.Axes): Its axes.
+    """
+    ax.set_xlim(x_start, x_end)
+    ax.set_xticks(x_ticks)
+    ax.set_xticklabels(x_ticks, weight=500, color=GREY40)
+
+    # Add title
+    fig.suptitle(
+        "CPI Inflation Distribution in New Zealand Over Time",
+        fontsize=22,
+        x=0.05,
+        y=0.99,
+        ha="left",
+        color=CHARCOAL,
+        weight="bold",
+    )
+
+    # Add subtitle
+    ax.set_title(
+        f"{horizon_label} across CPI level 2 subgroups by quarter (top/bottom 2 percent removed)",
+        loc="left",
+        fontsize=14,
+        x=-0.06,
+        pad=25,
+        color=CHARCOAL,
+    )
+
+    ax.annotate(
+        "@mardywong",
+        xy=(1.0, -0.12),
+        xycoords="axes fraction",
+        ha="right",
+        va="center",
+        fontsize=11,
+        color=CHARCOAL,
+    )
+
+    ax.annotate(
+        "Source: Statistics NZ",
+        xy=(-0.07, -0.12),
+        xycoords="axes fraction",
+        ha="left",
+        va="center",
+        fontsize=11,
+        color=CHARCOAL,
+    )
+
+    fig.tight_layout()
+
+
+for chart, name, plot_function in [
+    ("cpi-heatmap", "cpi_inflation_density_heatmap_nz", plot_density_heatmap),
+    ("cpi-ridgeline", "cpi_inflation_density_ridgeline_nz", plot_density_ridgeline),
+]:
+    if not chart_selected(chart):
+        continue
+
+    # Only draw the chart if the densities, style or code changed since it was last saved
+    key = chart_key(
+        params=style,
+        functions=[plot_function, quarter_ticks, customize_over_time_chart],
+        files=DENSITY_FILES,
+    )
+    if not restore_plot_image(name, key):
+        _, densities = estimate_densities()
+        fig, ax = plot_function(densities)
+        customize_over_time_chart(fig, ax)
+        save_plot_as_image(filename=name, key=key)  # Save the image into a folder
+    show_plots()
+
+# Finish writing the queued image files (raises if any export failed)
+wait_for_exports()
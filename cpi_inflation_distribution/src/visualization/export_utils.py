@@ -0,0 +1,227 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib as mpl
+import numpy as np
+from PIL import Image
+
+# Formats encoded from the single raster render; the others are vector formats drawn by
+# matplotlib's own backends
+RASTER_FORMATS = {"png": "PNG", "webp": "WEBP"}
+VECTOR_FORMATS = ["svg", "pdf"]
+
+# Social-media variants (width, height in pixels); the chart is fitted inside and padded
+SOCIAL_SIZES = {
+    "twitter": (1600, 900),
+    "linkedin": (1200, 627),
+    "instagram": (1080, 1080),
+}
+
+# Same padding around the tight bounding box as plt.savefig(bbox_inches="tight")
+PAD_INCHES = 0.1
+
+# Leave out creation dates so unchanged charts give identical vector files
+VECTOR_METADATA = {"svg": {"Date": None}, "pdf": {"CreationDate": None}}
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="plot-export")
+_pending = []
+_lock = threading.Lock()
+
+
+def write_if_changed(path, data):
+    """
+    Write bytes to a file atomically, skipping the write if the file already holds them.
+
+    The bytes are written to a temporary file in the same directory, which then replaces
+    the target, so readers never see a partly written file.
+
+    Parameters:
+    - path (str): Path of the file.
+    - data (bytes): The content.
+
+    Returns:
+    - bool: Whether the file was written.
+    """
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+
+    # A unique name per process and thread; opened normally so the umask applies
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def render_figure(fig):
+    """
+    Draw a figure once and crop the raster to its tight bounding box.
+
+    If the tight bounding box reaches outside the figure (e.g. annotations placed beyond
+    the canvas), the figure is drawn a second time at the size of that box.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure.
+
+    Returns:
+    - tuple: The RGBA image (PIL.Image.Image) and the tight bounding box in inches, which
+      vector formats reuse instead of measuring it again.
+    """
+    fig.canvas.draw()
+    renderer = fig.canvas.get_renderer()
+    bbox = fig.get_tightbbox(renderer).padded(PAD_INCHES)
+
+    width, height = fig.get_size_inches()
+    inside = bbox.x0 >= 0 and bbox.y0 >= 0 and bbox.x1 <= width and bbox.y1 <= height
+    if inside and hasattr(fig.canvas, "buffer_rgba"):
+        pixels = np.asarray(fig.canvas.buffer_rgba())
+        dpi = fig.dpi
+        # Pixel rows run from the top of the figure; the size is truncated as savefig does
+        top = int(round((height - bbox.y1) * dpi))
+        left = int(round(bbox.x0 * dpi))
+        bottom = top + int(bbox.height * dpi)
+        right = left + int(bbox.width * dpi)
+        image = Image.fromarray(pixels[top:bottom, left:right].copy(), "RGBA")
+    else:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches=bbox)
+        image = Image.open(buffer)
+        image.load()
+    return image, bbox
+
+
+def fit_to_size(image, size, background=(255, 255, 255, 255)):
+    """
+    Scale an image to fit inside a size and centre it on a plain background.
+
+    Parameters:
+    - image (PIL.Image.Image): The RGBA image.
+    - size (tuple): Target (width, height) in pixels.
+    - background (tuple): RGBA colour of the padding.
+
+    Returns:
+    - PIL.Image.Image: The image at the target size.
+    """
+    scale = min(size[0] / image.width, size[1] / image.height)
+    resized = image.resize(
+        (round(image.width * scale), round(image.height * scale)), Image.LANCZOS
+    )
+    canvas = Image.new("RGBA", size, background)
+    offset = ((size[0] - resized.width) // 2, (size[1] - resized.height) // 2)
+    canvas.paste(resized, offset)
+    return canvas
+
+
+def _encode_raster(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        image.save(buffer, format="PNG")
+    else:
+        image.save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+
+def _export(path, image, image_format, size=None):
+    if size is not None:
+        image = fit_to_size(image, size)
+    return path, write_if_changed(path, _encode_raster(image, image_format))
+
+
+def _write(path, data):
+    return path, write_if_changed(path, data)
+
+
+def export_figure(
+    fig,
+    directory,
+    filename,
+    formats=("png",),
+    social=(),
+    message=None,
+    on_complete=None,
+):
+    """
+    Queue the export of a figure in several formats and sizes.
+
+    The figure is drawn once on the calling thread (plus once per vector format, as
+    matplotlib is not thread-safe). Encoding the raster formats and writing the files
+    happens in a background thread pool, so the caller can move on to the next chart.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure.
+    - directory (str): Output directory, created if missing.
+    - filename (str): File name without extension.
+    - formats (list): Any of "png", "webp", "svg" and "pdf".
+    - social (list): Names from SOCIAL_SIZES to also export as "<filename>_<name>.png".
+    - message (str, optional): Printed once all files of the figure are written.
+    - on_complete (callable, optional): Called with the list of written paths once all
+      files of the figure are written without errors.
+
+    Returns:
+    - list: Futures resolving to (path, written) for every file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    image, bbox = render_figure(fig)
+
+    jobs = []
+    for fmt in formats:
+        path = os.path.join(directory, f"{filename}.{fmt}")
+        if fmt in RASTER_FORMATS:
+            jobs.append((_export, path, image, RASTER_FORMATS[fmt]))
+        elif fmt in VECTOR_FORMATS:
+            buffer = io.BytesIO()
+            with mpl.rc_context({"svg.hashsalt": filename}):
+                fig.savefig(
+                    buffer, format=fmt, bbox_inches=bbox, metadata=VECTOR_METADATA[fmt]
+                )
+            jobs.append((_write, path, buffer.getvalue()))
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+    for name in social:
+        path = os.path.join(directory, f"{filename}_{name}.png")
+        jobs.append((_export, path, image, "PNG", SOCIAL_SIZES[name]))
+
+    futures = [_executor.submit(*job) for job in jobs]
+    remaining = [len(futures)]
+
+    def report(future):
+        if future.exception() is not None:
+            print(f"Failed to export {filename}: {future.exception()}")
+        with _lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if not done:
+            return
+        if message is not None:
+            print(message)
+        if on_complete is not None and all(f.exception() is None for f in futures):
+            on_complete([f.result()[0] for f in futures])
+
+    with _lock:
+        _pending.extend(futures)
+    for future in futures:
+        future.add_done_callback(report)
+    return futures
+
+
+def wait_for_exports():
+    """
+    Block until every queued export has been written, re-raising any export error.
+
+    Returns:
+    - list: (path, written) for every export finished since the last call.
+    """
+    with _lock:
+        futures = list(_pending)
+        _pending.clear()
+    return [future.result() for future in futures]
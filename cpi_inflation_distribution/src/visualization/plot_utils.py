@@ -1,28 +1,144 @@
 import datetime
+import hashlib
+import io
 import os
-import matplotlib.pyplot as plt
+import sys
+import matplotlib as mpl
+from export_utils import export_figure, write_if_changed
+from PIL import Image
+from render_cache_utils import RenderCache
 
-def save_plot_as_image(filename):
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# Figures are saved under the project's reports folder, wherever the script is run from
+FIGURES_PATH = os.path.join(PROJECT_PATH, "reports", "figures")
+
+# Rendered files of every chart saved with a key, reused while the key is unchanged
+render_cache = RenderCache(
+    os.path.join(PROJECT_PATH, "data", "interim", "render_cache")
+)
+
+
+def _figures_directory():
+    date = datetime.date.today().strftime("%d-%m-%Y")
+    return os.path.join(FIGURES_PATH, date)
+
+
+def _interactive_backend():
+    # Reading an automatic backend resolves it by importing pyplot, which is not needed
+    # to tell that no window can be opened (e.g. on a server)
+    backend = mpl.rcParams._get_backend_or_none()
+    if backend is None:
+        if mpl.cbook._get_running_interactive_framework() == "headless":
+            return False
+        backend = mpl.get_backend()
+    return backend in mpl.rcsetup.interactive_bk
+
+
+def _entry_key(key, formats, social):
+    # The same chart saved in other formats is a separate entry
+    return hashlib.sha1(f"{key}-{list(formats)}-{list(social)}".encode()).hexdigest()
+
+
+def save_plot_as_image(filename, formats=("png",), social=(), key=None):
     """
     Save the current matplotlib plot as an image with the given filename.
 
+    The figure is drawn once and the files are encoded and written in the background
+    (see export_utils); files whose content did not change are not rewritten.
+
     Parameters:
     - filename (str): The name of the file (without extension).
+    - formats (list): The formats to save, any of "png", "webp", "svg" and "pdf".
+    - social (list): Social-media size variants to also save (see export_utils.SOCIAL_SIZES).
+    - key (str, optional): Chart key from render_cache_utils.chart_key. If provided, the
+      files are also stored in the render cache for restore_plot_image.
 
     Returns:
-    - None
+    - list: Futures resolving to (path, written) for every file.
     """
-    
-    date = datetime.date.today().strftime("%d-%m-%Y")
-    path = f"../../reports/figures/{date}/"
+    import matplotlib.pyplot as plt
 
-    # Check if the path exists, if not, create it
-    if not os.path.exists(path):
-        os.makedirs(path)
+    on_complete = None
+    if key is not None:
+        entry_key = _entry_key(key, formats, social)
 
-    plt.savefig(path + filename + ".png", bbox_inches="tight")
-    print(f"Successfully exported {filename}")
+        def on_complete(paths):
+            files = {}
+            for path in paths:
+                with open(path, "rb") as f:
+                    files[os.path.basename(path)[len(filename) :]] = f.read()
+            render_cache.put(entry_key, files)
+
+    return export_figure(
+        plt.gcf(),
+        _figures_directory(),
+        filename,
+        formats=formats,
+        social=social,
+        message=f"Successfully exported {filename}",
+        on_complete=on_complete,
+    )
+
+
+def restore_plot_image(filename, key, formats=("png",), social=()):
+    """
+    Save a chart from the render cache without drawing it, if its key is cached.
+
+    With an interactive backend the cached PNG is opened in a figure, so a following
+    show_plots() still displays the chart.
+
+    Parameters:
+    - filename (str): The name of the file (without extension).
+    - key (str): Chart key from render_cache_utils.chart_key.
+    - formats (list): The formats to save, as for save_plot_as_image.
+    - social (list): Social-media size variants to save, as for save_plot_as_image.
+
+    Returns:
+    - bool: Whether the chart was restored; if not, draw it and call save_plot_as_image.
+    """
+    files = render_cache.get(_entry_key(key, formats, social))
+    if files is None:
+        return False
+
+    directory = _figures_directory()
+    os.makedirs(directory, exist_ok=True)
+    for suffix, data in files.items():
+        write_if_changed(os.path.join(directory, filename + suffix), data)
+    print(f"Successfully exported {filename} (unchanged, from the render cache)")
+
+    if ".png" in files and _interactive_backend():
+        import matplotlib.pyplot as plt
+
+        image = Image.open(io.BytesIO(files[".png"]))
+        dpi = mpl.rcParams["figure.dpi"]
+        fig = plt.figure(figsize=(image.width / dpi, image.height / dpi), dpi=dpi)
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.imshow(image)
+        ax.set_axis_off()
+    return True
+
+
+def show_plots():
+    """
+    Show the open figures, as plt.show(). pyplot is only imported by the charts that are
+    drawn (or opened from the render cache), so if none was, there is nothing to show and
+    pyplot is not imported here either.
+
+    Returns:
+    - None
+    """
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].show()
 
 # Example usage:
 # ... [your plot code]
 # save_plot_as_image("my_plot_name")
+# save_plot_as_image("my_plot_name", formats=["png", "svg"], social=["twitter"])
+#
+# Skip drawing charts whose data, parameters and code did not change:
+# key = chart_key([df], params={"year": 2023}, functions=[draw_my_plot])
+# if not restore_plot_image("my_plot_name", key):
+#     draw_my_plot(df, year=2023)
+#     save_plot_as_image("my_plot_name", key=key)
+# show_plots()
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import pickle
+import sys
+
+import matplotlib as mpl
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+sys.path.append(ROOT_PATH)
+from cache_utils import evict_least_recent, function_source, update_digest
+
+# Bump to invalidate every cached chart (e.g. after changing the export code)
+CACHE_VERSION = "1"
+
+# rcParams that do not change how a chart looks
+IGNORED_RC_PARAMS = {"backend", "backend_fallback", "interactive", "savefig.directory"}
+
+
+def chart_key(frames=(), params=None, functions=(), files=()):
+    """
+    Content hash of everything a chart depends on: the data it plots, its parameters,
+    the source of the functions that draw it and the current rcParams.
+
+    Parameters:
+    - frames (list): The data slices plotted (pd.DataFrame or pd.Series).
+    - params (dict, optional): Any other parameters of the chart (reprs are hashed).
+    - functions (list): The functions drawing the chart; editing one changes the key.
+    - files (list): Paths of files the plotted data is read or computed from (e.g. a
+      pickle and the modules transforming it), hashed by content. Keying on the files
+      instead of frames lets a chart be restored without loading its data.
+
+    Returns:
+    - str: The hex digest.
+    """
+    digest = hashlib.sha1(CACHE_VERSION.encode())
+    for frame in frames:
+        update_digest(digest, frame)
+    for path in files:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha1(f.read()).digest())
+    digest.update(repr(sorted((params or {}).items())).encode())
+    for function in functions:
+        digest.update(function_source(function).encode())
+    # Filter before reading, as reading "backend" can resolve and switch the backend
+    rc = [
+        (k, mpl.rcParams[k]) for k in sorted(mpl.rcParams) if k not in IGNORED_RC_PARAMS
+    ]
+    digest.update(repr(rc).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Size-bounded store of rendered charts, one pickle per chart key.
+
+    The modification time of an entry is refreshed whenever it is read, so evicting the
+    oldest entries first drops the least recently used charts.
+
+    Parameters:
+    - directory (str): Folder holding the entries, created if missing.
+    - max_bytes (int): Total size above which the least recently used entries are dropped.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Look up a chart.
+
+        Parameters:
+        - key (str): The chart key from chart_key.
+
+        Returns:
+        - object: The cached value, or None if the chart is not cached.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            # The entry may be evicted by another process after it was read
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return value
+
+    def put(self, key, value):
+        """
+        Store a chart and evict the least recently used entries over the size limit.
+
+        Parameters:
+        - key (str): The chart key from chart_key.
+        - value (object): The rendered chart (e.g. bytes per file), pickled to disk.
+
+        Returns:
+        - None
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+        - list: The keys that were dropped.
+        """
+        return evict_least_recent(self.directory, ".pkl", self.max_bytes)
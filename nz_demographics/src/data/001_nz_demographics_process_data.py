@@ -1,61 +1,11 @@
-import pandas as pd
+from profile_utils import profile_section
+from wide_table_utils import wide_table_to_csv
 
 ############### Population estimates by TA2 #####################
 
-# Load the Excel file into a DataFrame
-df = pd.read_csv('../../data/raw/population_data_nz_20240417.csv', header=[0, 1], sep=',')
-
-# Resetting the column names to a single level by joining the multi-index levels
-df.columns = [' '.join(col).strip() for col in df.columns.values]
-
-# Melting the DataFrame to transform it from wide to long format
-df_long = pd.melt(df, id_vars=['Age Year at 30 June'], var_name='Age and Year', value_name='Population')
-
-
-# Extracting the year from the 'Age and Year' column
-df_long['Year'] = df_long['Age and Year'].str.extract(r'(\d{4})$')
-
-# Cleaning the 'Age' column by removing any sequence of digits that are formatted like a year
-df_long['Age'] = df_long['Age and Year'].str.slice(start=0, stop=-5)
-
-# Dropping the 'Age and Year' column as it's no longer needed
-df_long.drop(columns='Age and Year', inplace=True)
-
-df_long=df_long.rename(columns={'Age Year at 30 June':'Region'})
-
-# save df to csv
-df_long.to_csv('../../data/interim/pop_estimate_interim.csv', index=False) 
-
-############### Population projections by TA2 #####################
-import pandas as pd
-
-# Load the Excel file into a DataFrame
-df = pd.read_csv('../../data/raw/pop_projections_TA2.csv', header=[0, 1], sep=',')
-
-# Resetting the column names to a single level by joining the multi-index levels
-df.columns = [' '.join(col).strip() for col in df.columns.values]
-
-# Melting the DataFrame to transform it from wide to long format
-df_long = pd.melt(df, id_vars=['Age Year at 30 June'], var_name='Age and Year', value_name='Population')
-
-
-# Extracting the year from the 'Age and Year' column
-df_long['Year'] = df_long['Age and Year'].str.extract(r'(\d{4})$')
-
-# Cleaning the 'Age' column by removing any sequence of digits that are formatted like a year
-df_long['Age'] = df_long['Age and Year'].str.slice(start=0, stop=-5)
-
-# Dropping the 'Age and Year' column as it's no longer needed
-df_long.drop(columns='Age and Year', inplace=True)
-
-df_long=df_long.rename(columns={'Age Year at 30 June':'Region'})
-
-df_long.to_csv('../../data/interim/pop_projection_interim.csv', index=False) 
-
-
-############### Population projections national #####################
-
-df_proj=pd.read_csv("../../data/raw/pop_projection_national.csv", sep=",")
-# make scenario cols as cols
-
-
+# Stream the wide table (two header rows: age band, year) straight into long format
+with profile_section("melt"):
+    wide_table_to_csv(
+        '../../data/raw/population_data_nz_20240417.csv',
+        '../../data/interim/pop_estimate_interim.csv',
+    )
@@ -0,0 +1,10 @@
+from profile_utils import profile_section
+from wide_table_utils import wide_table_to_csv
+
+############### Population projections by TA2 #####################
+
+with profile_section("melt"):
+    wide_table_to_csv(
+        '../../data/raw/pop_projections_TA2.csv',
+        '../../data/interim/pop_projection_interim.csv',
+    )
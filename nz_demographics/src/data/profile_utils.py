@@ -0,0 +1,233 @@
+import atexit
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, where peak RSS is not recorded
+    resource = None
+
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# Run reports are written here, one JSON file per run
+REPORTS_PATH = os.path.join(PROJECT_PATH, "reports", "profiles")
+
+# Profiling is off unless PROFILE is set (e.g. PROFILE=1, or python cli.py --profile)
+ENABLED = os.environ.get("PROFILE", "") not in ("", "0")
+
+MB = 1024 * 1024
+
+# Sections currently open (outermost first) and the totals of every finished section
+_stack = []
+_sections = {}
+_run = {}
+_disabled_section = contextlib.nullcontext()
+
+
+def _peak_rss_mb():
+    # Peak resident set size of the process so far (kilobytes on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (MB if sys.platform == "darwin" else 1024)
+
+
+class _Section:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        # Sections share the tracemalloc peak, so hand it to the open sections first
+        current, peak = tracemalloc.get_traced_memory()
+        for section in _stack:
+            section.traced_peak = max(section.traced_peak, peak)
+        tracemalloc.reset_peak()
+
+        self.path = " > ".join([s.name for s in _stack] + [self.name])
+        self.traced_start = self.traced_peak = current
+        self.rss_start = _peak_rss_mb()
+        _stack.append(self)
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        current, peak = tracemalloc.get_traced_memory()
+        for section in _stack:
+            section.traced_peak = max(section.traced_peak, peak)
+        _stack.pop()
+        rss = _peak_rss_mb()
+
+        # A section entered several times (e.g. in a loop) is reported once, summed
+        totals = _sections.setdefault(
+            self.path,
+            {
+                "calls": 0,
+                "wall_s": 0.0,
+                "cpu_s": 0.0,
+                "traced_peak_mb": 0.0,
+                "traced_net_mb": 0.0,
+                "peak_rss_mb": None,
+                "rss_growth_mb": None,
+            },
+        )
+        totals["calls"] += 1
+        totals["wall_s"] += wall
+        totals["cpu_s"] += cpu
+        totals["traced_peak_mb"] = max(
+            totals["traced_peak_mb"], (self.traced_peak - self.traced_start) / MB
+        )
+        totals["traced_net_mb"] += (current - self.traced_start) / MB
+        if rss is not None:
+            totals["peak_rss_mb"] = rss
+            totals["rss_growth_mb"] = (totals["rss_growth_mb"] or 0) + rss - self.rss_start
+        return False
+
+
+def profile_section(name):
+    """
+    Context manager recording the wall time, CPU time, peak RSS and tracemalloc peak of
+    a block of code, for the run report written when profiling is enabled.
+
+    Sections can be nested; a nested section is reported as "outer > inner". When
+    profiling is disabled this returns a shared no-op context manager.
+
+    Parameters:
+        name (str): The section name, e.g. "shares" or a chart name.
+
+    Returns:
+        contextlib.AbstractContextManager: The section.
+    """
+    if not ENABLED:
+        return _disabled_section
+    return _Section(name)
+
+
+def build_report():
+    """
+    Collects the totals of the run so far and of every finished section.
+
+    traced_peak_mb is the peak of Python allocations above the memory allocated when the
+    section started, traced_net_mb what the section left allocated, peak_rss_mb the peak
+    RSS of the process when the section ended and rss_growth_mb how much the section
+    raised it.
+
+    Returns:
+        dict: The report, with "run" and "sections" entries.
+    """
+    _, peak = tracemalloc.get_traced_memory()
+    run = dict(_run)
+    run.update(
+        {
+            "wall_s": time.perf_counter() - _run["wall_start"],
+            "cpu_s": time.process_time() - _run["cpu_start"],
+            "traced_peak_mb": peak / MB,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    )
+    del run["wall_start"], run["cpu_start"]
+    return {"run": run, "sections": _sections}
+
+
+def write_report(directory=REPORTS_PATH):
+    """
+    Writes the report of the run to <directory>/<script>-<timestamp>.json.
+
+    Parameters:
+        directory (str): Folder of the run reports.
+
+    Returns:
+        str: The path of the report.
+    """
+    report = build_report()
+    os.makedirs(directory, exist_ok=True)
+    timestamp = report["run"]["started"].replace(":", "").replace("-", "")
+    name = f"{report['run']['script']}-{timestamp}.json"
+    path = os.path.normpath(os.path.join(directory, name))
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Profile report written to {path}")
+    return path
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def diff_reports(old, new):
+    """
+    Compares the sections (and run totals) of two run reports.
+
+    Parameters:
+        old (dict): The baseline report.
+        new (dict): The report to compare with it.
+
+    Returns:
+        list: One (section, metric, old value, new value) tuple per metric, with None
+        for a section missing from one of the reports.
+    """
+    metrics = ["wall_s", "cpu_s", "traced_peak_mb", "peak_rss_mb"]
+    rows = []
+    names = list(old["sections"]) + [
+        name for name in new["sections"] if name not in old["sections"]
+    ]
+    for name in ["(run)"] + names:
+        if name == "(run)":
+            old_values, new_values = old["run"], new["run"]
+        else:
+            old_values = old["sections"].get(name, {})
+            new_values = new["sections"].get(name, {})
+        for metric in metrics:
+            rows.append((name, metric, old_values.get(metric), new_values.get(metric)))
+    return rows
+
+
+def format_diff(rows):
+    """
+    Formats the rows of diff_reports as a table, with the relative change of each
+    metric.
+
+    Parameters:
+        rows (list): The rows from diff_reports.
+
+    Returns:
+        str: The table.
+    """
+    width = max(len(name) for name, _, _, _ in rows)
+    lines = [f"{'section':<{width}}  {'metric':<14}{'old':>10}{'new':>10}{'change':>9}"]
+    for name, metric, old, new in rows:
+        if old is None and new is None:
+            continue
+        old_text = "-" if old is None else f"{old:.3f}"
+        new_text = "-" if new is None else f"{new:.3f}"
+        change = ""
+        if old and new is not None:
+            change = f"{(new - old) / old:+.0%}"
+        lines.append(
+            f"{name:<{width}}  {metric:<14}{old_text:>10}{new_text:>10}{change:>9}"
+        )
+    return "\n".join(lines)
+
+
+if ENABLED:
+    # The run is measured from the first import, i.e. after the script's own imports
+    tracemalloc.start()
+    _run.update(
+        {
+            "script": os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python",
+            "argv": sys.argv[1:],
+            "started": datetime.datetime.now().isoformat(timespec="seconds"),
+            "charts": os.environ.get("PLOT_CHARTS"),
+            "wall_start": time.perf_counter(),
+            "cpu_start": time.process_time(),
+        }
+    )
+    atexit.register(write_report)
@@ -0,0 +1,165 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Normalised spellings that refer to the same region under a different name
+REGION_ALIASES = {
+    "total, new zealand by territorial authority/sa2": "total, new zealand",
+}
+
+
+def normalize_region_key(name):
+    """
+    Normalises a region name so that spellings from different sources compare equal.
+
+    Parameters:
+        name (str): The region name as found in a dataset.
+
+    Returns:
+        str: The lower-case, whitespace-collapsed name with aliases resolved.
+    """
+    key = " ".join(str(name).lower().split())
+    return REGION_ALIASES.get(key, key)
+
+
+def capitalize_region_name(name):
+    def capitalize_word(word):
+        # Capitalize hyphenated words properly
+        return '-'.join([w.capitalize() for w in word.split('-')])
+
+    return ' '.join([capitalize_word(word) if word.lower() != "of" and word.lower() != "the" else word for word in name.split()])
+
+
+def region_type(names):
+    """
+    Classifies region names as "Total", "Local Board", "Territorial Authority" or "Other".
+    Each distinct name is classified once.
+
+    Parameters:
+        names (array-like): Region names in any of the source spellings.
+
+    Returns:
+        np.ndarray: The region type of each name.
+    """
+
+    def classify(name):
+        key = normalize_region_key(name)
+        if key == "total, new zealand":
+            return "Total"
+        elif key.endswith("local board area"):
+            return "Local Board"
+        elif key == "area outside territorial authority":
+            return "Other"
+        return "Territorial Authority"
+
+    codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+    lookup = np.array([classify(name) for name in uniques] + [None], dtype=object)
+    return lookup[codes]
+
+
+class RegionRegistry:
+    """
+    Maps region names from every dataset onto one integer key per region.
+
+    Each distinct name is normalised once; whole columns are then encoded with a
+    vectorised lookup, so joins between datasets can be done on the integer key.
+    """
+
+    def __init__(self, names=()):
+        self._codes = {}  # normalised key -> integer code
+        self.names = []  # integer code -> canonical display name
+        self.encode(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _code(self, name, add=True):
+        key = normalize_region_key(name)
+        code = self._codes.get(key)
+        if code is None and add:
+            code = self._codes[key] = len(self.names)
+            self.names.append(capitalize_region_name(key))
+        return -1 if code is None else code
+
+    def encode(self, names, add=True):
+        """
+        Converts region names to integer keys.
+
+        Parameters:
+            names (array-like): Region names in any of the source spellings.
+            add (bool): Register names not seen before. If False they are encoded as -1.
+
+        Returns:
+            np.ndarray: The integer key of each name (-1 for missing values).
+        """
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        lookup = np.array([self._code(name, add) for name in uniques] + [-1], dtype=int)
+        return lookup[codes]
+
+    def decode(self, codes):
+        """
+        Converts integer keys back to canonical region names.
+
+        Parameters:
+            codes (array-like): Integer keys from encode.
+
+        Returns:
+            np.ndarray: The canonical name of each key (None for -1).
+        """
+        lookup = np.array(self.names + [None], dtype=object)
+        return lookup[np.asarray(codes, dtype=int)]
+
+    def canonical(self, names):
+        """
+        Converts region names in any source spelling to their canonical spelling.
+
+        Parameters:
+            names (array-like or str): Region names.
+
+        Returns:
+            np.ndarray or str: The canonical names, matching the shape of the input.
+        """
+        if isinstance(names, str):
+            return self.decode(self.encode([names]))[0]
+        return self.decode(self.encode(names))
+
+
+def merge_on_region(left, right, left_on, right_on, how="left", registry=None):
+    """
+    Merges two datasets on region using integer region keys, warning about regions that
+    do not match instead of dropping them silently.
+
+    Parameters:
+        left (pd.DataFrame): The left dataset (can be a GeoDataFrame).
+        right (pd.DataFrame): The right dataset.
+        left_on (str): The region column in left.
+        right_on (str): The region column in right.
+        how (str): The type of merge to perform.
+        registry (RegionRegistry, optional): Registry to encode with. A new one is used if omitted.
+
+    Returns:
+        pd.DataFrame: The merged data, with a Region_Id column holding the integer key.
+    """
+    if registry is None:
+        registry = RegionRegistry()
+
+    left = left.assign(Region_Id=registry.encode(left[left_on]))
+    right = right.assign(Region_Id=registry.encode(right[right_on]))
+    if left_on == right_on:
+        right = right.drop(columns=right_on)
+
+    left_ids = np.unique(left["Region_Id"])
+    right_ids = np.unique(right["Region_Id"])
+    for side, missing in (
+        ("left", np.setdiff1d(left_ids, right_ids)),
+        ("right", np.setdiff1d(right_ids, left_ids)),
+    ):
+        missing = missing[missing >= 0]
+        if len(missing):
+            warnings.warn(
+                f"{len(missing)} region(s) only in the {side} dataset: "
+                + ", ".join(registry.decode(missing))
+            )
+
+    return left.merge(right, on="Region_Id", how=how)
@@ -0,0 +1,132 @@
+import pandas as pd
+
+# Birth-year cutoffs (first and last birth year) for each generation. Birth years
+# outside these ranges are labelled "Other".
+GENERATION_BIRTH_YEARS = {
+    "Silent": (1928, 1945),
+    "Baby Boomer": (1946, 1964),
+    "Gen X": (1965, 1980),
+    "Millennial": (1981, 1996),
+    "Gen Z": (1997, 2012),
+}
+
+# Generations from oldest to youngest, followed by the catch-all label
+GENERATIONS = [
+    name for name, _ in sorted(GENERATION_BIRTH_YEARS.items(), key=lambda item: item[1][0])
+] + ["Other"]
+
+GENERATION_DTYPE = pd.CategoricalDtype(GENERATIONS, ordered=True)
+
+# Set to True to split each age band across generations in proportion to the single
+# years of age it covers, rather than labelling the whole band by its lower bound. Read
+# by the transform and by the charts of generation totals.
+PROPORTIONAL_GENERATIONS = False
+
+
+def age_lower_bound(age_description):
+    """
+    Extracts the lower bound of an age label.
+
+    Parameters:
+        age_description (str): A range ('50-54 Years'), an 'over' format ('90 Years and over') or a numeric age.
+
+    Returns:
+        int: The lower bound of the age label.
+    """
+    age_description = str(age_description).strip()
+    if "-" in age_description:
+        return int(age_description.split("-")[0])
+    elif "over" in age_description:
+        return int(age_description.split(" ")[0])
+    return int(age_description)
+
+
+def age_bounds(age_description, open_band_width=10):
+    """
+    Extracts the lower and upper bound of an age label.
+
+    Parameters:
+        age_description (str): A range ('50-54 Years'), an 'over' format ('90 Years and over') or a numeric age.
+        open_band_width (int): Number of single years of age assumed for an 'over' band.
+
+    Returns:
+        tuple: The (lower, upper) bound of the age label, both inclusive.
+    """
+    lower = age_lower_bound(age_description)
+    age_description = str(age_description).strip()
+    if "-" in age_description:
+        upper = int(age_description.split("-")[1].split(" ")[0])
+    elif "over" in age_description:
+        upper = lower + open_band_width - 1
+    else:
+        upper = lower
+    return lower, upper
+
+
+def age_dtype(age_descriptions):
+    """
+    Builds an ordered categorical dtype for age labels, ordered by their age bounds.
+    Labels without bounds (such as 'Total people, age') are placed first.
+
+    Parameters:
+        age_descriptions (array-like): Age labels; only the distinct values are used.
+
+    Returns:
+        pd.CategoricalDtype: The ordered age dtype.
+    """
+
+    def sort_key(age):
+        try:
+            return (1,) + age_bounds(age)
+        except ValueError:
+            return (0, 0, 0)
+
+    labels = pd.unique(pd.Series(age_descriptions).dropna().astype(str))
+    return pd.CategoricalDtype(sorted(labels, key=sort_key), ordered=True)
+
+
+def apply_schema(df):
+    """
+    Converts the population columns of a frame to compact dtypes: categorical Region,
+    ordered categorical Age and Generation, and the narrowest integer type for Year and
+    integer Population. Columns that are not present are skipped.
+
+    Parameters:
+        df (pd.DataFrame): Population data.
+
+    Returns:
+        pd.DataFrame: The same frame with converted columns.
+    """
+    if "Region" in df:
+        df["Region"] = df["Region"].astype("category")
+    if "Age" in df:
+        ages = df["Age"]
+        if isinstance(ages.dtype, pd.CategoricalDtype):
+            ages = ages.cat.remove_unused_categories()
+            categories = age_dtype(ages.cat.categories).categories
+            df["Age"] = ages.cat.set_categories(categories, ordered=True)
+        else:
+            df["Age"] = ages.astype(age_dtype(ages))
+    if "Generation" in df:
+        df["Generation"] = df["Generation"].astype(GENERATION_DTYPE)
+    for col in ["Year", "Population"]:
+        if col in df and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def read_population_csv(path, **kwargs):
+    """
+    Reads a population CSV (interim or processed) with the compact schema applied.
+    Region, Age and Generation are parsed straight into categoricals.
+
+    Parameters:
+        path (str): Path of the CSV file.
+        **kwargs: Passed on to pd.read_csv.
+
+    Returns:
+        pd.DataFrame: The population data.
+    """
+    header = pd.read_csv(path, nrows=0, **kwargs).columns
+    dtype = {col: "category" for col in ["Region", "Age", "Generation"] if col in header}
+    return apply_schema(pd.read_csv(path, dtype=dtype, **kwargs))
@@ -0,0 +1,84 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from region_utils import region_type
+from schema_utils import apply_schema
+
+# Processed datasets are partitioned into one directory per year, and each file holds
+# one row group per region type. Readers filtering on these columns only open the
+# matching files and row groups.
+PARTITION_COLS = ["Year"]
+ROW_GROUP_COLS = ["Region_Type"]
+
+
+def write_dataset(df, path, partition_cols=PARTITION_COLS, row_group_cols=ROW_GROUP_COLS):
+    """
+    Writes a processed frame as a Parquet dataset partitioned by year, with one row group
+    per region type. Any existing dataset at the path is replaced.
+
+    Parameters:
+        df (pd.DataFrame): Processed data with a Region and Year column.
+        path (str): Directory of the dataset.
+        partition_cols (list): Columns to partition into directories on.
+        row_group_cols (list): Columns to split each file into row groups on.
+    """
+    if "Region_Type" not in df:
+        df = df.assign(Region_Type=region_type(df["Region"]))
+    df = apply_schema(df.assign(Region_Type=df["Region_Type"].astype("category")))
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    # One file per partition with a fixed name, so rewriting unchanged data gives
+    # identical files. The pandas schema metadata is dropped (dtypes are restored by
+    # apply_schema on read) as it is larger than the data in small partitions.
+    for keys, part in df.groupby(partition_cols, observed=True, sort=True):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        part_dir = os.path.join(
+            path, *[f"{col}={value}" for col, value in zip(partition_cols, keys)]
+        )
+        os.makedirs(part_dir)
+        part = part.drop(columns=partition_cols)
+        schema = pa.Schema.from_pandas(part, preserve_index=False).remove_metadata()
+
+        with pq.ParquetWriter(
+            os.path.join(part_dir, "part-0.parquet"), schema, compression="zstd"
+        ) as writer:
+            for _, group in part.groupby(row_group_cols, observed=True, sort=True):
+                # Each row group stores its own dictionaries, so keep them to the
+                # values that occur in the group
+                group = group.apply(
+                    lambda col: col.cat.remove_unused_categories()
+                    if isinstance(col.dtype, pd.CategoricalDtype)
+                    else col
+                )
+                writer.write_table(
+                    pa.Table.from_pandas(group, schema=schema, preserve_index=False)
+                )
+
+
+def read_dataset(path, columns=None, filters=None):
+    """
+    Reads a processed Parquet dataset, loading only the requested columns and the
+    partitions (and row groups) that match the filters.
+
+    Parameters:
+        path (str): Directory of the dataset.
+        columns (list, optional): Columns to load. All columns are loaded if omitted.
+        filters (list, optional): pyarrow filters, e.g. [("Year", "==", 2023),
+            ("Region_Type", "==", "Total")].
+
+    Returns:
+        pd.DataFrame: The data with the compact population schema applied.
+    """
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+
+    # Partition values come back as categoricals, and dictionaries can hold values
+    # from row groups that were filtered out
+    if "Year" in df and isinstance(df["Year"].dtype, pd.CategoricalDtype):
+        df["Year"] = df["Year"].astype(int)
+    for col in df.select_dtypes("category"):
+        df[col] = df[col].cat.remove_unused_categories()
+    return apply_schema(df)
@@ -0,0 +1,92 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# Parsed tenancy files, keyed on the content hash of the CSV they were read from
+CACHE_PATH = os.path.join(PROJECT_PATH, "data", "interim", "tenancy_cache")
+
+# Bump to rebuild every cached frame (e.g. after changing parse_tenancy_csv)
+CACHE_VERSION = "1"
+
+# Frames already loaded by this process, so each chart gets its own copy without
+# reading the cache again
+_loaded = {}
+
+
+def file_hash(path):
+    """
+    Hashes the content of a file.
+
+    Parameters:
+        path (str): Path of the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_tenancy_csv(path):
+    """
+    Parses an MBIE detailed monthly tenancy bond file into typed columns.
+
+    Bond counts quoted with thousands separators ("9,144") are read as integers, the
+    integer columns are downcast to the narrowest type, Location is categorical (the
+    "NA" location is a missing value) and the rows are indexed by month.
+
+    Parameters:
+        path (str): Path of the CSV file.
+
+    Returns:
+        pd.DataFrame: The tenancy data, indexed by a monthly PeriodIndex "Time Frame".
+    """
+    df = pd.read_csv(path, sep=",", thousands=",", dtype={"Location": "category"})
+    df.index = pd.PeriodIndex(df.pop("Time Frame"), freq="M")
+    for col in df.select_dtypes("integer"):
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def read_tenancy_csv(path, cache_path=CACHE_PATH):
+    """
+    Reads a tenancy bond file with parse_tenancy_csv, reusing the frame parsed from a
+    file with the same content.
+
+    The parsed frame is stored as a zstd-compressed Feather file named after the hash of
+    the CSV; caches of earlier versions of the same file are removed.
+
+    Parameters:
+        path (str): Path of the CSV file.
+        cache_path (str): Folder of the cached frames.
+
+    Returns:
+        pd.DataFrame: The tenancy data (a copy the caller can modify).
+    """
+    key = hashlib.sha1(f"{CACHE_VERSION}-{file_hash(path)}".encode()).hexdigest()
+    if key in _loaded:
+        return _loaded[key].copy()
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(cache_path, f"{stem}-{key[:16]}.feather")
+    if os.path.exists(cached):
+        df = pd.read_feather(cached).set_index("Time Frame")
+    else:
+        df = parse_tenancy_csv(path)
+        os.makedirs(cache_path, exist_ok=True)
+        pattern = os.path.join(cache_path, f"{glob.escape(stem)}-*.feather")
+        for stale in glob.glob(pattern):
+            os.remove(stale)
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        df.reset_index().to_feather(tmp_path, compression="zstd")
+        os.replace(tmp_path, cached)
+
+    _loaded[key] = df
+    return df.copy()
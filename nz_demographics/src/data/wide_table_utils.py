@@ -0,0 +1,76 @@
+import csv
+
+import numpy as np
+import pandas as pd
+from schema_utils import age_dtype
+
+
+def read_wide_header(path):
+    """
+    Decodes the two header rows of a Stats NZ wide table (age band over year) into
+    integer column codes.
+
+    Parameters:
+        path (str): Path of the CSV file.
+
+    Returns:
+        tuple: The age code of each data column, the ordered categorical dtype the codes
+        refer to, and the year of each data column (np.ndarray).
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        ages = [age.strip() for age in next(reader)[1:]]
+        years = np.array([int(year) for year in next(reader)[1:]], dtype=np.int16)
+
+    dtype = age_dtype(ages)
+    age_codes = pd.Categorical(ages, dtype=dtype).codes
+    return age_codes, dtype, years
+
+
+def stream_wide_table(path, id_name="Region", value_name="Population", chunksize=500):
+    """
+    Reads a Stats NZ wide table with a two-row (age band, year) header in row chunks and
+    yields each chunk in long format.
+
+    Only one chunk of the body is held in memory at a time, so the table can be much
+    larger than the ~90 territorial authorities of the current inputs.
+
+    Parameters:
+        path (str): Path of the CSV file.
+        id_name (str): Name of the output column for the first (area) column.
+        value_name (str): Name of the output value column.
+        chunksize (int): Number of body rows per chunk.
+
+    Yields:
+        pd.DataFrame: Long data with id_name, value_name, Year and Age columns.
+    """
+    age_codes, dtype, years = read_wide_header(path)
+    n_cols = len(years)
+
+    for chunk in pd.read_csv(
+        path, header=None, skiprows=2, chunksize=chunksize, dtype={0: str}
+    ):
+        values = chunk.iloc[:, 1:].to_numpy()
+        n_rows = len(chunk)
+        yield pd.DataFrame(
+            {
+                id_name: np.repeat(chunk[0].to_numpy(), n_cols),
+                value_name: values.ravel(),
+                "Year": np.tile(years, n_rows),
+                "Age": pd.Categorical.from_codes(np.tile(age_codes, n_rows), dtype=dtype),
+            }
+        )
+
+
+def wide_table_to_csv(path, out_path, chunksize=500, **kwargs):
+    """
+    Converts a Stats NZ wide table to a long-format CSV chunk by chunk.
+
+    Parameters:
+        path (str): Path of the wide CSV file.
+        out_path (str): Path of the long CSV file to write.
+        chunksize (int): Number of body rows per chunk.
+        **kwargs: Passed on to stream_wide_table.
+    """
+    for i, chunk in enumerate(stream_wide_table(path, chunksize=chunksize, **kwargs)):
+        chunk.to_csv(out_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
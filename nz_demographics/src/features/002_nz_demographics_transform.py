@@ -1,13 +1,36 @@
+import sys
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
+
+sys.path.append("../data")
+from region_utils import RegionRegistry
+from profile_utils import profile_section
+from schema_utils import (
+    GENERATION_BIRTH_YEARS,
+    GENERATIONS,
+    PROPORTIONAL_GENERATIONS,
+    age_bounds,
+    age_lower_bound,
+    apply_schema,
+    read_population_csv,
+)
+from store_utils import write_dataset
 
-df = pd.read_csv("../../data/interim/pop_estimate_interim.csv", sep=",")
+with profile_section("read"):
+    df = read_population_csv("../../data/interim/pop_estimate_interim.csv", sep=",")
 
-df_proj_2030=pd.read_csv("../../data/raw/pop_projection_2030.csv", sep=",")
+    df_proj_2030 = read_population_csv("../../data/raw/pop_projection_2030.csv", sep=",")
+
+# Region names are normalised once per distinct name and shared across datasets
+region_registry = RegionRegistry()
 
 
 ###### Tidy up column names #######
 
 df = df[df["Age"] != "Total people, age"]
+df["Age"] = df["Age"].cat.remove_unused_categories()
 
 # Replace the specific string in the 'region' column
 df["Region"] = df["Region"].replace(
@@ -16,71 +39,249 @@ df["Region"] = df["Region"].replace(
 
 ###### Add generation column to pop estimate #######
 
-def determine_generation(census_year, age_description):
+def generation_index(birth_years, cutoffs=GENERATION_BIRTH_YEARS):
     """
-    Determines the generation category based on birth year calculated from the census year and age description.
+    Looks up the generation of each birth year in the cutoff table.
 
     Parameters:
-        census_year (int): The year of the census.
-        age_description (str): Description of the age group, could be a range, a specific age, or an 'over' format.
+        birth_years (np.ndarray): Birth years of any shape.
+        cutoffs (dict): Generation name -> (first birth year, last birth year).
 
     Returns:
-        str: The generation name.
+        tuple: An array of generation positions shaped like birth_years, and the
+        generation names those positions refer to ("Other" last).
     """
-    # Check for numeric age or age range in the description
-    if "-" in age_description:
-        # It's a range, get the lower bound as the oldest possible age
-        oldest_age = int(age_description.split("-")[0])
-    elif "over" in age_description:
-        # It's an 'over' description, extract the number
-        oldest_age = int(age_description.split(" ")[0])
-    else:
-        # Otherwise, assume the entire string is a numeric age
-        oldest_age = int(age_description)
-
-    # Calculate the birth year assuming the age is the oldest age in the range
-    birth_year = census_year - oldest_age
-
-    # Determine generation based on birth year
-    if 1946 <= birth_year <= 1964:
-        return "Baby Boomer"
-    elif 1965 <= birth_year <= 1980:
-        return "Gen X"
-    elif 1981 <= birth_year <= 1996:
-        return "Millennial"
-    elif 1928 <= birth_year <= 1945:
-        return "Silent"
-    elif 1997 <= birth_year <= 2012:
-        return "Gen Z"
-    else:
-        return "Other"  # Return an empty string for ages outside these ranges
+    # Sort the cutoff table by first birth year so it can be searched
+    generations = sorted(cutoffs.items(), key=lambda item: item[1][0])
+    names = np.array([name for name, _ in generations] + ["Other"], dtype=object)
+    starts = np.array([first for _, (first, _) in generations])
+    ends = np.array([last for _, (_, last) in generations])
+
+    # Index of the last generation starting on or before each birth year
+    idx = np.searchsorted(starts, birth_years, side="right") - 1
+    in_range = (idx >= 0) & (birth_years <= ends[idx.clip(0)])
+    idx = np.where(in_range, idx, len(generations))
+
+    return idx, names
+
+
+def classify_generations(census_years, age_descriptions, cutoffs=GENERATION_BIRTH_YEARS):
+    """
+    Labels the generation of every row from its census year and age label, assuming the
+    age is the oldest age in the band (its lower bound).
+
+    Each distinct age label is parsed once, birth years are computed as an array and
+    generations are assigned in a single searchsorted pass over the cutoff table.
+
+    Parameters:
+        census_years (array-like): The census year of each row.
+        age_descriptions (array-like): The age label of each row.
+        cutoffs (dict): Generation name -> (first birth year, last birth year).
+
+    Returns:
+        np.ndarray: The generation name of each row.
+    """
+    age_codes, age_labels = pd.factorize(np.asarray(age_descriptions))
+    lower_bounds = np.array([age_lower_bound(age) for age in age_labels], dtype=int)
+    birth_years = np.asarray(census_years, dtype=int) - lower_bounds[age_codes]
+
+    idx, names = generation_index(birth_years, cutoffs)
+    return names[idx]
+
+
+def generation_allocation_matrix(
+    age_descriptions, census_years, cutoffs=GENERATION_BIRTH_YEARS, open_band_width=10
+):
+    """
+    Builds a sparse matrix that splits each (age band, census year) across generations.
+
+    Every band is assumed to be spread evenly over the single years of age it covers, so a
+    band straddling a generation boundary is shared between both generations. The columns
+    are (census year, generation) pairs, which keeps years apart when the matrix is applied
+    to a population array holding several years.
+
+    Parameters:
+        age_descriptions (array-like): Age labels; only the distinct values are used.
+        census_years (array-like): Census years; only the distinct values are used.
+        cutoffs (dict): Generation name -> (first birth year, last birth year).
+        open_band_width (int): Number of single years of age assumed for an 'over' band.
+
+    Returns:
+        tuple: The allocation matrix (scipy.sparse.csr_matrix), its row index
+        (pd.MultiIndex of Age, Year) and its column index (pd.MultiIndex of Year, Generation).
+    """
+    ages = pd.unique(np.asarray(age_descriptions))
+    years = np.sort(pd.unique(np.asarray(census_years, dtype=int)))
+
+    # Single years of age covered by each band, padded to the widest band
+    bounds = np.array([age_bounds(age, open_band_width) for age in ages], dtype=int)
+    widths = bounds[:, 1] - bounds[:, 0] + 1
+    offsets = np.arange(widths.max())
+    covered = offsets[None, :] < widths[:, None]  # (age band, single age)
+
+    # Birth year of every (age band, census year, single age) cell
+    single_ages = bounds[:, [0]] + offsets[None, :]
+    birth_years = years[None, :, None] - single_ages[:, None, :]
+    gen_idx, names = generation_index(birth_years, cutoffs)
+
+    age_pos, year_pos, _ = np.indices(birth_years.shape)
+    covered = np.broadcast_to(covered[:, None, :], birth_years.shape)
+    weights = np.broadcast_to((1 / widths)[:, None, None], birth_years.shape)
 
+    # Duplicate (row, column) entries are summed when converting to CSR
+    rows = age_pos * len(years) + year_pos
+    cols = year_pos * len(names) + gen_idx
+    matrix = sparse.coo_matrix(
+        (weights[covered], (rows[covered], cols[covered])),
+        shape=(len(ages) * len(years), len(years) * len(names)),
+    ).tocsr()
 
-def age_to_numeric(age):
+    row_index = pd.MultiIndex.from_product([ages, years], names=["Age", "Year"])
+    col_index = pd.MultiIndex.from_product([years, names], names=["Year", "Generation"])
+
+    return matrix, row_index, col_index
+
+
+def allocate_generations(df, cutoffs=GENERATION_BIRTH_YEARS, open_band_width=10):
     """
-    Converts age range strings to a numeric value by extracting the first age in the range.
-    Handles special cases like '90 Years and over' by stripping non-numeric characters and returning the integer.
+    Calculates the population of each generation for every region and year, splitting
+    age bands across generations with generation_allocation_matrix.
 
     Parameters:
-        age (str): The age range as a string.
+        df (pd.DataFrame): Long population data with Region, Year, Age and Population columns.
+        cutoffs (dict): Generation name -> (first birth year, last birth year).
+        open_band_width (int): Number of single years of age assumed for an 'over' band.
 
     Returns:
-        int: The numeric value representing the lower bound of the age range.
+        pd.DataFrame: Long data with Region, Year, Generation and (fractional) Population columns.
     """
-    # Handle the special case where the format is different (e.g., '90 Years and over')
-    if "over" in age:
-        # Extract numbers only and convert to integer
-        return int("".join(filter(str.isdigit, age)))
-    # Standard case: extract the first part of the age group string and convert to integer
-    return int(age.split("-")[0])
+    matrix, row_index, col_index = generation_allocation_matrix(
+        df["Age"], df["Year"], cutoffs, open_band_width
+    )
+
+    # Dense region x (age band, year) population array
+    region_codes, regions = pd.factorize(df["Region"])
+    row_codes = row_index.get_indexer(pd.MultiIndex.from_arrays([df["Age"], df["Year"]]))
+    population = np.zeros((len(regions), len(row_index)))
+    np.add.at(population, (region_codes, row_codes), df["Population"].to_numpy())
 
+    # One multiply gives region x (year, generation) totals
+    totals = (matrix.T @ population.T).T
 
-def capitalize_region_name(name):
-    def capitalize_word(word):
-        # Capitalize hyphenated words properly
-        return '-'.join([w.capitalize() for w in word.split('-')])
-    
-    return ' '.join([capitalize_word(word) if word.lower() != "of" and word.lower() != "the" else word for word in name.split()])
+    return pd.DataFrame(
+        {
+            "Region": np.repeat(np.asarray(regions), len(col_index)),
+            "Year": np.tile(col_index.get_level_values("Year"), len(regions)),
+            "Generation": np.tile(col_index.get_level_values("Generation"), len(regions)),
+            "Population": totals.ravel(),
+        }
+    )
+
+
+# Column name prefix used for each generation in the wide shares output
+GENERATION_COLUMN_NAMES = {"Baby Boomer": "Boomer"}
+
+
+def generation_share_cube(
+    df, group_cols, generations=None, generation_col="Generation", value_col="Population"
+):
+    """
+    Builds a dense (group 1 x ... x group n x generation) population array and the
+    share of each generation within every group, in one pass over the frame.
+
+    Parameters:
+        df (pd.DataFrame): Long population data.
+        group_cols (list): Columns to group by, e.g. ["Region", "Year"].
+        generations (list, optional): Generations to include, in output order. Defaults to
+            the cutoff table order followed by "Other".
+        generation_col (str): The generation column.
+        value_col (str): The population column.
+
+    Returns:
+        tuple: The population cube, the group totals, the share cube (percent), a boolean
+        array marking which groups appear in df, and the list of axis labels (one per group
+        column, then generations).
+    """
+    if generations is None:
+        generations = GENERATIONS
+
+    codes, labels = [], []
+    for col in group_cols:
+        col_codes, col_labels = pd.factorize(df[col], sort=True)
+        codes.append(col_codes)
+        labels.append(col_labels)
+    gen_codes = pd.Categorical(df[generation_col], categories=generations).codes
+    shape = tuple(len(col_labels) for col_labels in labels) + (len(generations),)
+
+    # Rows whose generation is not requested still count towards the group total
+    population = np.zeros(shape)
+    other_population = np.zeros(shape[:-1])
+    values = df[value_col].to_numpy(dtype=float)
+    known = gen_codes >= 0
+    np.add.at(
+        population, tuple(c[known] for c in codes) + (gen_codes[known],), values[known]
+    )
+    np.add.at(other_population, tuple(c[~known] for c in codes), values[~known])
+
+    observed = np.zeros(shape[:-1], dtype=bool)
+    observed[tuple(codes)] = True
+
+    totals = population.sum(axis=-1) + other_population
+    shares = np.divide(
+        population,
+        totals[..., None],
+        out=np.zeros_like(population),
+        where=totals[..., None] > 0,
+    ) * 100
+
+    return population, totals, shares, observed, labels + [pd.Index(generations)]
+
+
+def generation_shares(df, group_cols, generations=None, layout="wide"):
+    """
+    Calculates the population and share of every generation within each group.
+
+    Parameters:
+        df (pd.DataFrame): Long population data with a Generation and Population column.
+        group_cols (list): Columns to group by, e.g. ["Region", "Year"].
+        generations (list, optional): Generations to include, see generation_share_cube.
+        layout (str): "wide" gives one row per group with Total_Population and
+            <generation>_Population / <generation>_Share columns; "long" gives one row per
+            group and generation with Generation, Population, Total_Population and Share columns.
+
+    Returns:
+        pd.DataFrame: The generation shares.
+    """
+    population, totals, shares, observed, labels = generation_share_cube(
+        df, group_cols, generations
+    )
+    group_labels, generation_labels = labels[:-1], labels[-1]
+
+    # Keep only groups that appear in the data
+    group_pos = np.nonzero(observed)
+    groups = {
+        col: col_labels[pos]
+        for col, col_labels, pos in zip(group_cols, group_labels, group_pos)
+    }
+    population, total, shares = population[group_pos], totals[group_pos], shares[group_pos]
+
+    if layout == "long":
+        n_generations = len(generation_labels)
+        out = pd.DataFrame(
+            {col: np.repeat(values, n_generations) for col, values in groups.items()}
+        )
+        out["Generation"] = np.tile(generation_labels, len(total))
+        out["Population"] = population.ravel()
+        out["Total_Population"] = np.repeat(total, n_generations)
+        out["Share"] = shares.ravel()
+        return out
+
+    out = pd.DataFrame(groups)
+    out["Total_Population"] = total
+    names = [GENERATION_COLUMN_NAMES.get(gen, gen) for gen in generation_labels]
+    out[[f"{name}_Population" for name in names]] = population
+    out[[f"{name}_Share" for name in names]] = shares
+    return out
 
 
 # Add a column that marks if the Age group is 65 years and over
@@ -94,111 +295,69 @@ old_age_groups = [
 ]
 
 ############ Pop Estimates
-df["65 and over"] = df["Age"].isin(old_age_groups)
+with profile_section("estimates"):
+    df["65 and over"] = df["Age"].isin(old_age_groups)
 
-# Apply the function to each row to categorize generations
-df["Generation"] = df.apply(
-    lambda row: determine_generation(row["Year"], row["Age"]), axis=1
-)
+    # Categorize generations for all rows at once
+    df["Generation"] = classify_generations(df["Year"], df["Age"])
 
-# Use the function as a key for sorting
-df["Age"] = df["Age"].astype(str)  # Ensure the Age column is of type string
-df = df.sort_values("Age", key=lambda x: x.map(age_to_numeric))
+    # Sort by age using the age order of the categorical Age column
+    df = df.sort_values("Age", kind="stable")
 
-# Transform the 'region' column
-df['Region'] = df['Region'].apply(capitalize_region_name)
+    # Transform the 'region' column to the canonical region names
+    df["Region"] = region_registry.canonical(df["Region"])
+    df = apply_schema(df)
 
 ############# Pop Projections
-df_proj_2030["65 and over"] = df_proj_2030["Age"].isin(old_age_groups)
+with profile_section("projections"):
+    df_proj_2030["65 and over"] = df_proj_2030["Age"].isin(old_age_groups)
 
-# Apply the function to each row to categorize generations
-df_proj_2030["Generation"] = df_proj_2030.apply(
-    lambda row: determine_generation(row["Year"], row["Age"]), axis=1
-)
+    # Categorize generations for all rows at once
+    df_proj_2030["Generation"] = classify_generations(df_proj_2030["Year"], df_proj_2030["Age"])
 
-# Use the function as a key for sorting
-df_proj_2030["Age"] = df_proj_2030["Age"].astype(str)  # Ensure the Age column is of type string
-df_proj_2030 = df_proj_2030.sort_values("Age", key=lambda x: x.map(age_to_numeric))
+    # Sort by age using the age order of the categorical Age column
+    df_proj_2030 = df_proj_2030.sort_values("Age", kind="stable")
 
-# Transform the 'region' column
-df_proj_2030['Region'] = df_proj_2030['Region'].apply(capitalize_region_name)
+    # Transform the 'region' column to the canonical region names
+    df_proj_2030["Region"] = region_registry.canonical(df_proj_2030["Region"])
+    df_proj_2030 = apply_schema(df_proj_2030)
+
+
+# Generation totals with age bands split proportionally across generations
+with profile_section("allocate generations"):
+    generation_totals = allocate_generations(df)
 
 
 ###### Data by selected populatino share #######
 
-# Filter the DataFrame for Boomers and Millennials
-filtered_df = df[df["Generation"].isin(["Baby Boomer", "Millennial", "Gen Z", "Gen X"])]
-
-# Calculate the total population for each region and year
-total_population_df = df.groupby(["Region", "Year"])["Population"].sum().reset_index()
-total_population_df.rename(columns={"Population": "Total_Population"}, inplace=True)
-
-#  Merge the total population with the filtered DataFrame
-merged_df = pd.merge(filtered_df, total_population_df, on=["Region", "Year"])
-
-# Pivot the DataFrame to compare Population for Boomers and Millennials
-comparison_df = merged_df.pivot_table(
-    index=["Region", "Year", "Total_Population"],
-    columns="Generation",
-    values="Population",
-    aggfunc="sum",
-).reset_index()
-
-# Rename columns for clarity
-comparison_df.columns.name = None
-comparison_df.rename(
-    columns={
-        "Baby Boomer": "Boomer_Population",
-        "Millennial": "Millennial_Population",
-        "Gen Z": "Gen Z_Population",
-        "Gen X": "Gen X_Population",
-    },
-    inplace=True,
-)
+with profile_section("shares"):
+    # Population by generation, either from the row labels or split proportionally
+    if PROPORTIONAL_GENERATIONS:
+        generation_df = generation_totals
+    else:
+        generation_df = df
 
-# Calculate population shares
-comparison_df["Boomer_Share"] = (
-    comparison_df["Boomer_Population"] / comparison_df["Total_Population"]
-)*100
-
-comparison_df["Millennial_Share"] = (
-    comparison_df["Millennial_Population"] / comparison_df["Total_Population"]
-)*100
-comparison_df["Gen Z_Share"] = (
-    comparison_df["Gen Z_Population"] / comparison_df["Total_Population"]
-)*100
-comparison_df["Gen X_Share"] = (
-    comparison_df["Gen X_Population"] / comparison_df["Total_Population"]
-)*100
-
-# Fill NaN values with 0 (in case there are regions with none in a specific generation)
-comparison_df["Boomer_Share"].fillna(0, inplace=True)
-comparison_df["Gen Z_Share"].fillna(0, inplace=True)
-comparison_df["Millennial_Share"].fillna(0, inplace=True)
-comparison_df["Gen X_Population"].fillna(0, inplace=True)
-
-
-comparison_df["Millennial_Boomer_Share"] = (
-    comparison_df["Millennial_Share"] + comparison_df["Boomer_Share"]
-)
+    # Population and share of every generation for each region and year
+    comparison_df = generation_shares(generation_df, ["Region", "Year"])
+
+    comparison_df["Millennial_Boomer_Share"] = (
+        comparison_df["Millennial_Share"] + comparison_df["Boomer_Share"]
+    )
 
 ############## Save data ###############
 
-# save data
-comparison_df.to_csv(
-    "../../data/processed/pop_estimate_shares_processed.csv", index=False
-)
+# Each processed dataset is written once, partitioned by year and region type;
+# readers select subsets (e.g. New Zealand only, 2023 only) with filters
 
-# save df for NZ only to csv
-df_nz = df[(df["Region"] == "Total, New Zealand")].copy()
-df_nz.to_csv("../../data/processed/pop_estimate_processed_nz.csv", index=False)
+with profile_section("write"):
+    # save generation shares
+    write_dataset(comparison_df, "../../data/processed/pop_estimate_shares")
 
-# save df for All regions but 2023 only
-df_2023 = df[(df["Year"] == 2023)].copy()
-df_2023.to_csv("../../data/processed/pop_estimate_processed_2023.csv", index=False)
+    # save generation totals with age bands split proportionally across generations
+    write_dataset(generation_totals, "../../data/processed/pop_estimate_generations")
 
-# save complete data
-df.to_csv("../../data/processed/pop_estimate_processed.csv", index=False)
+    # save complete data
+    write_dataset(df, "../../data/processed/pop_estimate")
 
-# save 2030 projection data 
-df_proj_2030.to_csv("../../data/processed/pop_estimate_processed_2030.csv", index=False)
\ No newline at end of file
+    # save 2030 projection data
+    write_dataset(df_proj_2030, "../../data/processed/pop_projection_2030")
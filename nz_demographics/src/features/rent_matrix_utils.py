@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+# Tenancy bond metrics pivoted by default
+RENT_METRICS = [
+    "Median Rent",
+    "Geometric Mean Rent",
+    "Upper Quartile Rent",
+    "Lower Quartile Rent",
+    "Lodged Bonds",
+    "Active Bonds",
+]
+
+
+class RentMatrix:
+    """
+    Tenancy bond metrics pivoted once into dense (month x location) arrays.
+
+    Rebasing, changes and rolling or annual statistics are column-wise array operations
+    over every location at once. Results are computed once per set of arguments and the
+    same frame is returned to every chart asking for them, so charts should not modify
+    them in place.
+
+    Parameters:
+        df (pd.DataFrame): Tenancy data from tenancy_utils.read_tenancy_csv, indexed by
+            month with a Location column. Rows without a location are dropped.
+        metrics (list): Columns to pivot.
+        names (callable, optional): Maps the location labels to display names, e.g.
+            RegionRegistry.canonical.
+    """
+
+    def __init__(self, df, metrics=RENT_METRICS, names=None):
+        df = df[df["Location"].notnull()]
+        codes, labels = pd.factorize(df["Location"], sort=True)
+        labels = np.asarray(labels, dtype=object)
+
+        # Every month from the first to the last, so row offsets are month differences
+        first = df.index.min()
+        self.periods = pd.period_range(first, df.index.max(), freq="M", name="Time Frame")
+        self.locations = pd.Index(
+            labels if names is None else names(labels), name="Location"
+        )
+        rows = df.index.asi8 - first.ordinal
+
+        self.values = {}
+        for metric in metrics:
+            values = np.full((len(self.periods), len(self.locations)), np.nan)
+            values[rows, codes] = df[metric].to_numpy(dtype=float)
+            values.flags.writeable = False
+            self.values[metric] = values
+        self._results = {}
+
+    def _shared(self, key, compute):
+        # Compute a result once and return the same frame afterwards
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    def frame(self, metric):
+        """
+        The monthly values of a metric.
+
+        Parameters:
+            metric (str): One of the pivoted metrics.
+
+        Returns:
+            pd.DataFrame: One row per month and one column per location (NaN where a
+            location has no data).
+        """
+        return self._shared(
+            ("frame", metric),
+            lambda: pd.DataFrame(
+                self.values[metric], index=self.periods, columns=self.locations
+            ),
+        )
+
+    def annual_mean(self, metric):
+        """
+        The mean of each year's monthly values of a metric, skipping missing months (a
+        partial year is the mean of its available months).
+
+        Parameters:
+            metric (str): One of the pivoted metrics.
+
+        Returns:
+            pd.DataFrame: One row per year and one column per location.
+        """
+
+        def compute():
+            values = self.values[metric]
+            years = self.periods.year.to_numpy()
+            starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+
+            present = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(present, values, 0), starts, axis=0)
+            counts = np.add.reduceat(present, starts, axis=0)
+            with np.errstate(invalid="ignore"):
+                means = sums / counts
+            index = pd.Index(years[starts], name="Year")
+            return pd.DataFrame(means, index=index, columns=self.locations)
+
+        return self._shared(("annual_mean", metric), compute)
+
+    def rebase(self, metric, base, annual=False):
+        """
+        Index a metric to 100 in a base period.
+
+        Parameters:
+            metric (str): One of the pivoted metrics.
+            base (str or int): The base month (e.g. "2013-01"), or the base year when
+                annual is True (e.g. 2013). A base year of monthly values is the mean of
+                its months.
+            annual (bool): Index the annual means instead of the monthly values.
+
+        Returns:
+            pd.DataFrame: The index, NaN for locations without data in the base period.
+        """
+
+        def compute():
+            levels = self.annual_mean(metric) if annual else self.frame(metric)
+            base_rows = levels.loc[[base]] if annual else levels.loc[str(base)]
+            base_level = np.atleast_2d(base_rows.to_numpy())
+            present = ~np.isnan(base_level)
+            with np.errstate(invalid="ignore"):
+                base_level = np.where(present, base_level, 0).sum(0) / present.sum(0)
+            return levels / base_level * 100
+
+        return self._shared(("rebase", metric, str(base), annual), compute)
+
+    def change(self, metric, periods=12, annual=False):
+        """
+        Percent change of a metric over a number of periods, e.g. year-on-year change with
+        periods=12 for monthly values or periods=1 for annual means.
+
+        Parameters:
+            metric (str): One of the pivoted metrics.
+            periods (int): Number of rows (months, or years when annual) to compare over.
+            annual (bool): Compare the annual means instead of the monthly values.
+
+        Returns:
+            pd.DataFrame: The percent changes (NaN for the first rows).
+        """
+
+        def compute():
+            levels = self.annual_mean(metric) if annual else self.frame(metric)
+            values = levels.to_numpy()
+            changes = np.full(values.shape, np.nan)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                changes[periods:] = (values[periods:] / values[:-periods] - 1) * 100
+            return pd.DataFrame(changes, index=levels.index, columns=levels.columns)
+
+        return self._shared(("change", metric, periods, annual), compute)
+
+    def rolling_median(self, metric, window):
+        """
+        Trailing median of the monthly values of a metric, e.g. over 3 or 12 months.
+
+        Parameters:
+            metric (str): One of the pivoted metrics.
+            window (int): Number of months; NaN until a full window of data is available.
+
+        Returns:
+            pd.DataFrame: The rolling medians.
+        """
+
+        def compute():
+            values = self.values[metric]
+            medians = np.full(values.shape, np.nan)
+            windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+            medians[window - 1 :] = np.median(windows, axis=-1)
+            return pd.DataFrame(medians, index=self.periods, columns=self.locations)
+
+        return self._shared(("rolling_median", metric, window), compute)
@@ -1,10 +1,23 @@
+import sys
+
 import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly_express as px
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
+
+# Plotting libraries are imported by the charts that use them, so drawing one chart
+# (e.g. python cli.py plot choropleth) does not load all of them
+from figure_cache_utils import show_cached_figure
+
+sys.path.append("../../..")
+sys.path.append("../data")
+sys.path.append("../features")
+from chart_utils import chart_selected
+from profile_utils import profile_section
+from region_utils import RegionRegistry, merge_on_region
+from rent_matrix_utils import RentMatrix
+from store_utils import read_dataset
+from tenancy_utils import read_tenancy_csv
+
+# Region names differ between sources, so joins and filters use the canonical names
+region_registry = RegionRegistry()
 
 
 ########### Geo plot #############
@@ -12,29 +25,21 @@ import plotly.graph_objects as go
 # see https://datafinder.stats.govt.nz/layer/111194-territorial-authority-2023-generalised/
 
 
-# Read the shapefile
-shapefile_path = "../../data/raw/territorial-authority-2023-generalised.shp"
-gdf = gpd.read_file(shapefile_path)
-
-
 # Load the demographic share dataset
-df = pd.read_csv("../../data/processed/pop_estimate_shares_processed.csv", sep=",")
-
-# Filter out unneeded regions
-filtered_gdf = gdf[
-    ~gdf["TA2023_V_2"].isin(
-        ["Area Outside Territorial Authority", "Chatham Islands Territory"]
-    )
-]
+df = read_dataset("../../data/processed/pop_estimate_shares")
 
 
 # Plot function
 def plot_geodataframe_dark(df, gdf, year, plot_col):
+    import matplotlib.pyplot as plt
+
     # Filter for the specified year
     df_plot = df[df["Year"] == year].copy()
 
-    # Ensure you have consistent region names before merging with GeoDataFrame
-    gdf_merged = gdf.merge(df_plot, left_on="TA2023_V_2", right_on="Region", how="left")
+    # Merge on the region key so differently spelled names still match
+    gdf_merged = merge_on_region(
+        gdf, df_plot, "TA2023_V_2", "Region", how="left", registry=region_registry
+    )
 
     # Plot the GeoDataFrame
     fig, ax = plt.subplots(figsize=(10, 10), facecolor="#282a36")
@@ -98,15 +103,30 @@ def plot_geodataframe_dark(df, gdf, year, plot_col):
     plt.show()
 
 
-plot_geodataframe_dark(df, filtered_gdf, 2023, "Boomer_Share")
-plot_geodataframe_dark(df, filtered_gdf, 1996, "Boomer_Share")
-plot_geodataframe_dark(df, filtered_gdf, 2013, "Boomer_Share")
+if chart_selected("choropleth"):
+    with profile_section("choropleth"):
+        import geopandas as gpd
+
+        # Read the shapefile
+        shapefile_path = "../../data/raw/territorial-authority-2023-generalised.shp"
+        gdf = gpd.read_file(shapefile_path)
+
+        # Filter out unneeded regions
+        filtered_gdf = gdf[
+            ~gdf["TA2023_V_2"].isin(
+                ["Area Outside Territorial Authority", "Chatham Islands Territory"]
+            )
+        ]
 
-plot_geodataframe_dark(df, filtered_gdf, 2023, "Millennial_Share")
-plot_geodataframe_dark(df, filtered_gdf, 2013, "Millennial_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 2023, "Boomer_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 1996, "Boomer_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 2013, "Boomer_Share")
 
-plot_geodataframe_dark(df, filtered_gdf, 2013, "Millennial_Boomer_Share")
-plot_geodataframe_dark(df, filtered_gdf, 2023, "Millennial_Boomer_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 2023, "Millennial_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 2013, "Millennial_Share")
+
+        plot_geodataframe_dark(df, filtered_gdf, 2013, "Millennial_Boomer_Share")
+        plot_geodataframe_dark(df, filtered_gdf, 2023, "Millennial_Boomer_Share")
 
 
 ######## Small multiples plot  #########
@@ -176,91 +196,109 @@ list_regions_plot = list(
 # Filter the DataFrame for the specified regions
 multiples_df = df[df["Region"].isin(list_regions_plot)]
 
-# Define color map for generations
-color_map = {"Boomer": "blue", "Millennial": "green", "Gen X": "grey", "Gen Z": "grey"}
 
-# Create the subplots
-fig = make_subplots(
-    rows=4,
-    cols=3,
-    shared_xaxes=True,
-    shared_yaxes=True,
-    subplot_titles=list_regions_plot,
-)
+# Function to build the small multiples of generation shares, one panel per region
+def build_small_multiples_figure(multiples_df, list_regions_plot):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
-# Plot the data
-row = 1
-col = 1
-for region in list_regions_plot:
-    region_data = multiples_df[multiples_df["Region"] == region]
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Year"],
-            y=region_data["Boomer_Share"],
-            mode="lines",
-            name="Boomer Share",
-            legendgroup="Boomer",
-            line=dict(color=color_map["Boomer"]),
-            showlegend=(row == 1 and col == 1),
-        ),
-        row=row,
-        col=col,
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Year"],
-            y=region_data["Millennial_Share"],
-            mode="lines",
-            name="Millennial Share",
-            legendgroup="Millennial",
-            line=dict(color=color_map["Millennial"]),
-            showlegend=(row == 1 and col == 1),
-        ),
-        row=row,
-        col=col,
+    # Define color map for generations
+    color_map = {
+        "Boomer": "blue",
+        "Millennial": "green",
+        "Gen X": "grey",
+        "Gen Z": "grey",
+    }
+
+    # Create the subplots
+    fig = make_subplots(
+        rows=4,
+        cols=3,
+        shared_xaxes=True,
+        shared_yaxes=True,
+        subplot_titles=list_regions_plot,
     )
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Year"],
-            y=region_data["Gen X_Share"],
-            mode="lines",
-            name="Gen X Share",
-            legendgroup="Gen X",
-            line=dict(color=color_map["Gen X"], dash="dash"),
-            showlegend=(row == 1 and col == 1),
+
+    # Plot the data
+    row = 1
+    col = 1
+    for region in list_regions_plot:
+        region_data = multiples_df[multiples_df["Region"] == region]
+        fig.add_trace(
+            go.Scatter(
+                x=region_data["Year"],
+                y=region_data["Boomer_Share"],
+                mode="lines",
+                name="Boomer Share",
+                legendgroup="Boomer",
+                line=dict(color=color_map["Boomer"]),
+                showlegend=(row == 1 and col == 1),
+            ),
+            row=row,
+            col=col,
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=region_data["Year"],
+                y=region_data["Millennial_Share"],
+                mode="lines",
+                name="Millennial Share",
+                legendgroup="Millennial",
+                line=dict(color=color_map["Millennial"]),
+                showlegend=(row == 1 and col == 1),
+            ),
+            row=row,
+            col=col,
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=region_data["Year"],
+                y=region_data["Gen X_Share"],
+                mode="lines",
+                name="Gen X Share",
+                legendgroup="Gen X",
+                line=dict(color=color_map["Gen X"], dash="dash"),
+                showlegend=(row == 1 and col == 1),
+            ),
+            row=row,
+            col=col,
+        )
+
+        col += 1
+        if col > 3:
+            col = 1
+            row += 1
+
+    # Update layout for dark mode and larger figure size
+    fig.update_layout(
+        title="Population Share Over Time by Region",
+        template="plotly_dark",
+        plot_bgcolor="#282a36",
+        paper_bgcolor="#282a36",
+        showlegend=True,
+        width=1400,
+        height=1000,
+        legend=dict(
+            title="Generation",
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5,
         ),
-        row=row,
-        col=col,
     )
 
-    col += 1
-    if col > 3:
-        col = 1
-        row += 1
-
-# Update layout for dark mode and larger figure size
-fig.update_layout(
-    title="Population Share Over Time by Region",
-    template="plotly_dark",
-    plot_bgcolor="#282a36",
-    paper_bgcolor="#282a36",
-    showlegend=True,
-    width=1400,
-    height=1000,
-    legend=dict(
-        title="Generation",
-        orientation="h",
-        yanchor="bottom",
-        y=-0.3,
-        xanchor="center",
-        x=0.5,
-    ),
-)
+    # Update axes
+    fig.update_yaxes(title_text="")
+
+    return fig
 
-# Update axes
-fig.update_yaxes(title_text="")
 
-fig.show()
+if chart_selected("generation-multiples"):
+    with profile_section("generation-multiples"):
+        show_cached_figure(
+            build_small_multiples_figure, multiples_df, list_regions_plot
+        )
 
 ###### Home ownership plot
 # Load the demographic share dataset
@@ -269,6 +307,8 @@ df_ownership = pd.read_csv("../../data/raw/home_ownership_generation.csv", sep="
 
 # Function to plot home ownership rates by age and generation using Plotly
 def plot_ownership_by_age_and_generation_plotly(df):
+    import plotly_express as px
+
     # Define the custom color palette
     colors = {
         "Gen X": "#636EFA",  # blue
@@ -318,7 +358,7 @@ def plot_ownership_by_age_and_generation_plotly(df):
         font=dict(size=12, color="white", family="Consolas"),
     )
 
-    fig.show()
+    return fig
 
 
 # Plot the data using Plotly
@@ -334,7 +374,11 @@ df_ownership_grouped = (
     .reset_index()
 )
 
-plot_ownership_by_age_and_generation_plotly(df_ownership_grouped)
+if chart_selected("ownership-by-generation"):
+    with profile_section("ownership-by-generation"):
+        show_cached_figure(
+            plot_ownership_by_age_and_generation_plotly, df_ownership_grouped
+        )
 
 # Filter the data for the age ranges 25 to 74
 age_ranges = [
@@ -378,378 +422,398 @@ df_grouped = (
     .reset_index()
 )
 
-# Create a line plot using Plotly
-fig = go.Figure()
-
-# Define colors for each age group
-colors = {
-    "25-34": "#636EFA",  #  blue
-    "35-44": "#B6E880",  # light green
-    "45-54": "#FFA15A",  # orange
-    "55-64": "#EF553B",  # red
-    "65-74": "#FF97FF",  # pink
-}
-
-# Add traces for each age group
-for age_group in df_grouped["Age_Group"].unique():
-    age_group_data = df_grouped[df_grouped["Age_Group"] == age_group]
-    fig.add_trace(
-        go.Scatter(
-            x=age_group_data["Year"],
-            y=age_group_data["Home Ownership Rate"],
-            mode="lines+markers",
-            name=age_group,
-            line=dict(color=colors[age_group]),
-            showlegend=False,
+
+# Function to build the mean home ownership rate by age group over time
+def build_ownership_by_age_group_figure(df_grouped):
+    import plotly.graph_objects as go
+
+    # Create a line plot using Plotly
+    fig = go.Figure()
+
+    # Define colors for each age group
+    colors = {
+        "25-34": "#636EFA",  #  blue
+        "35-44": "#B6E880",  # light green
+        "45-54": "#FFA15A",  # orange
+        "55-64": "#EF553B",  # red
+        "65-74": "#FF97FF",  # pink
+    }
+
+    # Add traces for each age group
+    for age_group in df_grouped["Age_Group"].unique():
+        age_group_data = df_grouped[df_grouped["Age_Group"] == age_group]
+        fig.add_trace(
+            go.Scatter(
+                x=age_group_data["Year"],
+                y=age_group_data["Home Ownership Rate"],
+                mode="lines+markers",
+                name=age_group,
+                line=dict(color=colors[age_group]),
+                showlegend=False,
+            )
         )
+        # Add annotation for the last data point of each age group
+        fig.add_annotation(
+            x=age_group_data["Year"].values[-1] + 1,
+            y=age_group_data["Home Ownership Rate"].values[-1],
+            text=age_group,
+            font=dict(color=colors[age_group], family="Consolas"),
+            showarrow=False,
+            xanchor="left",
+            yanchor="middle",
+        )
+
+    # Update layout for dark mode
+    fig.update_layout(
+        title="Home Ownership Rate (mean) by Age Group",
+        template="plotly_dark",
+        plot_bgcolor="#282a36",
+        paper_bgcolor="#282a36",
+        title_font=dict(size=18, family="Consolas"),
+        xaxis_title="Year",
+        yaxis_title="Home Ownership Rate",
+        font=dict(size=14, family="Consolas"),
     )
-    # Add annotation for the last data point of each age group
+
+    # Add footer annotation
     fig.add_annotation(
-        x=age_group_data["Year"].values[-1] + 1,
-        y=age_group_data["Home Ownership Rate"].values[-1],
-        text=age_group,
-        font=dict(color=colors[age_group], family="Consolas"),
+        text="Source: Statistics NZ",
+        xref="paper",
+        yref="paper",
+        x=1.2,
+        y=-0.25,
         showarrow=False,
-        xanchor="left",
-        yanchor="middle",
+        font=dict(size=12, color="white", family="Consolas"),
     )
 
-# Update layout for dark mode
-fig.update_layout(
-    title="Home Ownership Rate (mean) by Age Group",
-    template="plotly_dark",
-    plot_bgcolor="#282a36",
-    paper_bgcolor="#282a36",
-    title_font=dict(size=18, family="Consolas"),
-    xaxis_title="Year",
-    yaxis_title="Home Ownership Rate",
-    font=dict(size=14, family="Consolas"),
-)
+    fig.update_yaxes(title_text="", range=[40, 90])
+    fig.update_xaxes(title_text="", range=[1985, 2020])
 
-# Add footer annotation
-fig.add_annotation(
-    text="Source: Statistics NZ",
-    xref="paper",
-    yref="paper",
-    x=1.2,
-    y=-0.25,
-    showarrow=False,
-    font=dict(size=12, color="white", family="Consolas"),
-)
+    return fig
 
-fig.update_yaxes(title_text="", range=[40, 90])
-fig.update_xaxes(title_text="", range=[1985, 2020])
 
-fig.show()
+if chart_selected("ownership-by-age"):
+    with profile_section("ownership-by-age"):
+        show_cached_figure(build_ownership_by_age_group_figure, df_grouped)
 
 ############## ############## ############## ##############
-# Rent inflation plot - monthly index - all locations
+# Rent data shared by the rent charts
+
+if chart_selected("rent-monthly") or chart_selected("rent-annual"):
+    with profile_section("rent-matrix"):
+        # Tenancy metrics as (month x location) arrays with the canonical region names,
+        # so locations match the population data
+        rent_matrix = RentMatrix(
+            read_tenancy_csv(
+                "../../data/raw/detailed-monthly-march-2024-tla-tenancy.csv"
+            ),
+            names=region_registry.canonical,
+        )
 
-# Load the demographic share dataset
-df_rent = pd.read_csv(
-    "../../data/raw/detailed-monthly-march-2024-tla-tenancy.csv", sep=","
-)
 
 
-# Convert the 'Time Frame' column to datetime
-df_rent["Time Frame"] = pd.to_datetime(df_rent["Time Frame"])
+# Function to build the monthly rent index of every location, highlighting some
+def build_monthly_rent_figure(rent_index, top_12_regions):
+    import plotly.graph_objects as go
 
-# Filter the DataFrame to exclude 'All', remove null location, only include 2013 and onwards
-df_rent = df_rent[
-    (df_rent["Location"] != "ALL")
-    & (df_rent["Location"].notnull())
-    & (df_rent["Time Frame"] >= ("2013-01-01"))
-]
+    # Plot the data
+    fig = go.Figure()
 
-# Create df for median rent
-df_median_rent = df_rent[["Time Frame", "Location", "Median Rent"]]
-
-
-# Index the median rent to January 2013
-def calculate_index(group):
-    base = group.loc[group["Time Frame"] == "2013-01-01", "Median Rent"].mean()
-    group["Index"] = group["Median Rent"] / base * 100
-    return group
-
-
-df_median_rent = df_median_rent.groupby("Location").apply(calculate_index)
-
-# Get the top 12 regions with the highest increase in Millennial share
-top_12_regions = [
-    "Waiheke Local Board Area",
-    "Central Otago District",
-    "Queenstown-Lakes District",
-    "Aotea/great Barrier Local Board Area",
-    "Selwyn District",
-    "Rodney Local Board Area",
-    "Waimate District",
-    "Mackenzie District",
-    "Western Bay of Plenty District",
-    "Waimakariri District",
-    "Waitaki District",
-    "Kapiti Coast District",
-]
+    # One column per location; lines are drawn across months without data
+    months = rent_index.index.to_timestamp()
+    highlighted = rent_index.reindex(columns=top_12_regions)
+
+    # Plot all regions with a lighter color and low alpha
+    for region in rent_index.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=months,
+                y=rent_index[region],
+                mode="lines",
+                name=region,
+                line=dict(color="grey", width=1),
+                connectgaps=True,
+                showlegend=False,
+            )
+        )
 
-# Plot the data
-fig = go.Figure()
-
-all_regions = df_median_rent["Location"].unique()
-
-# Plot all regions with a lighter color and low alpha
-for region in all_regions:
-    region_data = df_median_rent[df_median_rent["Location"] == region]
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Time Frame"],
-            y=region_data["Index"],
-            mode="lines",
-            name=region,
-            line=dict(color="grey", width=1),
-            showlegend=False,
+    # Highlight the top 12 regions
+    for region in top_12_regions:
+        fig.add_trace(
+            go.Scatter(
+                x=months,
+                y=highlighted[region],
+                mode="lines",
+                name=region,
+                line=dict(width=3),
+                connectgaps=True,
+                showlegend=True,
+            )
         )
+
+    # Customize the plot
+    fig.update_layout(
+        title="Indexed Median Rent Inflation Since January 2013",
+        template="plotly_dark",
+        xaxis_title="Year",
+        yaxis_title="Indexed Median Rent (Jan 2013 = 100)",
+        plot_bgcolor="#282a36",
+        paper_bgcolor="#282a36",
+        showlegend=True,
+        width=1400,
+        height=800,
+        legend=dict(
+            title="Region",
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5,
+        ),
     )
 
-# Highlight the top 12 regions
-for region in top_12_regions:
-    region_data = df_median_rent[df_median_rent["Location"] == region]
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Time Frame"],
-            y=region_data["Index"],
-            mode="lines",
-            name=region,
-            line=dict(width=3),
-            showlegend=True,
+    return fig
+
+
+############## ############## ############## ##############
+# Rent inflation plot - monthly index - all locations
+
+if chart_selected("rent-monthly"):
+    with profile_section("rent-monthly"):
+        # Index the median rent to January 2013, from 2013 onwards and excluding 'All'
+        rent_index = rent_matrix.rebase("Median Rent", "2013-01").loc["2013-01":]
+        rent_index = rent_index.drop(columns=region_registry.canonical("ALL"))
+
+        # Get the top 12 regions with the highest increase in Millennial share
+        top_12_regions = [
+            "Waiheke Local Board Area",
+            "Central Otago District",
+            "Queenstown-Lakes District",
+            "Aotea/great Barrier Local Board Area",
+            "Selwyn District",
+            "Rodney Local Board Area",
+            "Waimate District",
+            "Mackenzie District",
+            "Western Bay of Plenty District",
+            "Waimakariri District",
+            "Waitaki District",
+            "Kapiti Coast District",
+        ]
+        top_12_regions = region_registry.canonical(top_12_regions)
+
+        show_cached_figure(build_monthly_rent_figure, rent_index, top_12_regions)
+
+
+
+# Function to build the annual rent index of every location, highlighting some
+def build_annual_rent_figure(rent_index, top_12_regions):
+    import plotly.graph_objects as go
+
+    # Plot the data
+    fig = go.Figure()
+
+    # One column per location; lines are drawn across years without data
+    highlighted = rent_index.reindex(columns=top_12_regions)
+
+    # Plot all regions with a lighter color and low alpha
+    for region in rent_index.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=rent_index.index,
+                y=rent_index[region],
+                mode="lines",
+                name=region,
+                line=dict(color="grey", width=1),
+                opacity=0.3,
+                connectgaps=True,
+                showlegend=False,
+            )
+        )
+
+    # Highlight the top 12 regions
+    for region in top_12_regions:
+        fig.add_trace(
+            go.Scatter(
+                x=rent_index.index,
+                y=highlighted[region],
+                mode="lines",
+                name=region,
+                line=dict(width=3),
+                connectgaps=True,
+                showlegend=True,
+            )
         )
+
+    # Customize the plot
+    fig.update_layout(
+        title="Indexed Median Rent Inflation Since 2013",
+        template="plotly_dark",
+        xaxis_title="Year",
+        yaxis_title="Indexed Median Rent (2013 = 100)",
+        plot_bgcolor="#282a36",
+        paper_bgcolor="#282a36",
+        showlegend=True,
+        width=1400,
+        height=800,
+        legend=dict(
+            title="Region",
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5,
+        ),
     )
 
-# Customize the plot
-fig.update_layout(
-    title="Indexed Median Rent Inflation Since January 2013",
-    template="plotly_dark",
-    xaxis_title="Year",
-    yaxis_title="Indexed Median Rent (Jan 2013 = 100)",
-    plot_bgcolor="#282a36",
-    paper_bgcolor="#282a36",
-    showlegend=True,
-    width=1400,
-    height=800,
-    legend=dict(
-        title="Region",
-        orientation="h",
-        yanchor="bottom",
-        y=-0.3,
-        xanchor="center",
-        x=0.5,
-    ),
-)
+    return fig
 
-fig.show()
 
 ############## ############## ############## ##############
 # Rent inflation plot - annual index - all locations
 
-# Load the demographic share dataset
-df_rent = pd.read_csv(
-    "../../data/raw/detailed-monthly-march-2024-tla-tenancy.csv", sep=","
-)
+if chart_selected("rent-annual"):
+    with profile_section("rent-annual"):
+        # Index the annual average median rent of all regions (including 'All') to the
+        # year 2013, from 2013 onwards
+        rent_index = rent_matrix.rebase("Median Rent", 2013, annual=True).loc[2013:]
 
-# Convert the 'Time Frame' column to datetime
-df_rent["Time Frame"] = pd.to_datetime(df_rent["Time Frame"])
+        """ # Get the top 12 regions with the highest increase in Millennial share
+        top_12_regions = [
+            'Waiheke Local Board Area', 'Central Otago District', 'Queenstown-Lakes District', 
+            'Aotea/great Barrier Local Board Area', 'Selwyn District', 'Rodney Local Board Area', 
+            'Waimate District', 'Mackenzie District', 'Western Bay of Plenty District', 
+            'Waimakariri District', 'Waitaki District', 'Kapiti Coast District','ALL'
+        ] """
 
-# Filter the DataFrame to exclude 'ALL' and remove null location
-df_rent = df_rent[
-    # (df_rent['Location'] != 'ALL') &
-    (df_rent["Location"].notnull())
-    & (df_rent["Time Frame"] >= ("2013-01-01"))
-]
+        """ top_12_regions = list(
+            df_filtered[df_filtered['Year']==2023].sort_values(by='Boomer_Share', ascending=False).head(12).reset_index()["Region"].unique()
+        )+['ALL'] """
 
-# Create df for median rent for all regions
-df_rent["Year"] = df_rent["Time Frame"].dt.year
-df_median_rent = (
-    df_rent.groupby(["Location", "Year"])["Median Rent"].mean().reset_index()
-)
+        """ top_12_regions = list(
+            df_filtered[df_filtered['Year']==2023].sort_values(by='Millennial_Share', ascending=False).head(20)["Region"].unique()
+        )+['ALL'] 
 
+         """
 
-# Index the median rent to the year 2013
-def calculate_index(group):
-    base = group.loc[group["Year"] == 2013, "Median Rent"].mean()
-    group["Index"] = group["Median Rent"] / base * 100
-    return group
-
-
-df_median_rent = df_median_rent.groupby("Location").apply(calculate_index)
-
-""" # Get the top 12 regions with the highest increase in Millennial share
-top_12_regions = [
-    'Waiheke Local Board Area', 'Central Otago District', 'Queenstown-Lakes District', 
-    'Aotea/great Barrier Local Board Area', 'Selwyn District', 'Rodney Local Board Area', 
-    'Waimate District', 'Mackenzie District', 'Western Bay of Plenty District', 
-    'Waimakariri District', 'Waitaki District', 'Kapiti Coast District','ALL'
-] """
-
-""" top_12_regions = list(
-    df_filtered[df_filtered['Year']==2023].sort_values(by='Boomer_Share', ascending=False).head(12).reset_index()["Region"].unique()
-)+['ALL'] """
-
-""" top_12_regions = list(
-    df_filtered[df_filtered['Year']==2023].sort_values(by='Millennial_Share', ascending=False).head(20)["Region"].unique()
-)+['ALL'] 
-
- """
-
-""" # Regions with highest change in millenial share
-top_12_regions = list(
-    df_pivot_millennial.sort_values(by='Difference', ascending=False).head(20).reset_index()["Region"].unique()
-)+['ALL']  """
-
-# Regions with highest change in millenial share and boomer share high
-top_12_regions = list(
-    df_sorted_filtered_boomer.head(19).reset_index()["Region"].unique()
-) + ["ALL"]
-
-# Plot the data
-fig = go.Figure()
-
-all_regions = df_median_rent["Location"].unique()
-
-# Plot all regions with a lighter color and low alpha
-for region in all_regions:
-    region_data = df_median_rent[df_median_rent["Location"] == region]
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Year"],
-            y=region_data["Index"],
-            mode="lines",
-            name=region,
-            line=dict(color="grey", width=1),
-            opacity=0.3,
-            showlegend=False,
-        )
-    )
+        """ # Regions with highest change in millenial share
+        top_12_regions = list(
+            df_pivot_millennial.sort_values(by='Difference', ascending=False).head(20).reset_index()["Region"].unique()
+        )+['ALL']  """
 
-# Highlight the top 12 regions
-for region in top_12_regions:
-    region_data = df_median_rent[df_median_rent["Location"] == region]
-    fig.add_trace(
-        go.Scatter(
-            x=region_data["Year"],
-            y=region_data["Index"],
-            mode="lines",
-            name=region,
-            line=dict(width=3),
-            showlegend=True,
-        )
-    )
+        # Regions with highest change in millenial share and boomer share high
+        top_12_regions = list(
+            df_sorted_filtered_boomer.head(19).reset_index()["Region"].unique()
+        ) + ["ALL"]
+        top_12_regions = region_registry.canonical(top_12_regions)
 
-# Customize the plot
-fig.update_layout(
-    title="Indexed Median Rent Inflation Since 2013",
-    template="plotly_dark",
-    xaxis_title="Year",
-    yaxis_title="Indexed Median Rent (2013 = 100)",
-    plot_bgcolor="#282a36",
-    paper_bgcolor="#282a36",
-    showlegend=True,
-    width=1400,
-    height=800,
-    legend=dict(
-        title="Region",
-        orientation="h",
-        yanchor="bottom",
-        y=-0.3,
-        xanchor="center",
-        x=0.5,
-    ),
-)
+        show_cached_figure(build_annual_rent_figure, rent_index, top_12_regions)
 
-fig.show()
 
-############ Plot of population overtime ##############
 
-# Load the dataset
-df = pd.read_csv("../../data/processed/pop_estimate_processed_nz.csv", sep=",")
-df_2030 = pd.read_csv("../../data/processed/pop_estimate_processed_2030.csv", sep=",")
+# Function to build the population by age group, one panel per year
+def build_population_by_age_figure(df_combined, years):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
+    # Create a subplot figure with 2 rows and 2 columns
+    fig = make_subplots(
+        rows=2,
+        cols=2,
+        shared_yaxes=True,
+        subplot_titles=[f"{year}" for year in years],
+    )
 
-# Concatenate df_2030 to df
-df_combined = pd.concat([df, df_2030], ignore_index=True)
+    row_col_pairs = [(1, 1), (1, 2), (2, 1), (2, 2)]
+
+    for (row, col), year in zip(row_col_pairs, years):
+        # Filter data for the specific year
+        year_data = df_combined[df_combined["Year"] == year]
+
+        # Determine bar colors based on 'Generation'
+        colors = [
+            "orange" if gen == "Baby Boomer" else "skyblue"
+            for gen in year_data["Generation"]
+        ]
+
+        # Create bar traces for each age group
+        fig.add_trace(
+            go.Bar(
+                x=year_data["Age"],
+                y=year_data["Population"],
+                marker_color=colors,
+                showlegend=False,
+            ),
+            row=row,
+            col=col,
+        )
 
-# Apply the relabeling function to the 'Age' column
-df_combined["Age"] = df_combined["Age"].apply(
-    lambda age: "90+" if age == "90 Years and over" else age
-)
+    # Add annotation pointing to the 'Baby Boomer' bar for 1996
+    fig.add_annotation(
+        x="65-69 Years",
+        y=250000,  # Adjust the y-coordinate to move the annotation down
+        xref="x1",
+        yref="y1",
+        text="Baby Boomers",
+        showarrow=False,
+        font=dict(
+            color="orange", size=16, family="Consolas"
+        ),  # Increase the font size and set font family
+    )
 
-# Define the years of interest for plotting (excluding 2018)
-years = [1996, 2006, 2023, 2030]
+    # Update layout for dark mode
+    fig.update_layout(
+        template="plotly_dark",
+        width=1000,
+        height=1000,
+        title_text="Population Distribution by Age Group",
+        plot_bgcolor="#282a36",
+        paper_bgcolor="#282a36",
+        font=dict(size=14, family="Consolas"),  # Set the font family for the entire plot
+    )
 
-# Create a subplot figure with 2 rows and 2 columns
-fig = make_subplots(
-    rows=2, cols=2, shared_yaxes=True, subplot_titles=[f"{year}" for year in years]
-)
+    # Update axis labels and rotate x-axis tick labels
+    fig.update_xaxes(
+        title_text="", tickangle=45, tickfont=dict(family="Consolas")
+    )
+    fig.update_yaxes(
+        title_text="", showticklabels=True, tickfont=dict(family="Consolas")
+    )
+    fig.update_yaxes(title_text="", range=[0, 400000])
 
-row_col_pairs = [(1, 1), (1, 2), (2, 1), (2, 2)]
+    # Add footer annotation
+    fig.add_annotation(
+        text="Source: Statistics NZ",
+        xref="paper",
+        yref="paper",
+        x=1.05,
+        y=-0.14,
+        showarrow=False,
+        font=dict(size=12, color="white", family="Consolas"),
+    )
 
-for (row, col), year in zip(row_col_pairs, years):
-    # Filter data for the specific year
-    year_data = df_combined[df_combined["Year"] == year]
+    return fig
 
-    # Determine bar colors based on 'Generation'
-    colors = [
-        "orange" if gen == "Baby Boomer" else "skyblue"
-        for gen in year_data["Generation"]
-    ]
 
-    # Create bar traces for each age group
-    fig.add_trace(
-        go.Bar(
-            x=year_data["Age"],
-            y=year_data["Population"],
-            marker_color=colors,
-            showlegend=False,
-        ),
-        row=row,
-        col=col,
-    )
+############ Plot of population overtime ##############
 
-# Add annotation pointing to the 'Baby Boomer' bar for 1996
-fig.add_annotation(
-    x="65-69 Years",
-    y=250000,  # Adjust the y-coordinate to move the annotation down
-    xref="x1",
-    yref="y1",
-    text="Baby Boomers",
-    showarrow=False,
-    font=dict(
-        color="orange", size=16, family="Consolas"
-    ),  # Increase the font size and set font family
-)
+if chart_selected("population-by-age"):
+    with profile_section("population-by-age"):
+        # Load the dataset
+        df = read_dataset(
+            "../../data/processed/pop_estimate",
+            filters=[("Region_Type", "==", "Total")],
+        )
+        df_2030 = read_dataset("../../data/processed/pop_projection_2030")
 
-# Update layout for dark mode
-fig.update_layout(
-    template="plotly_dark",
-    width=1000,
-    height=1000,
-    title_text="Population Distribution by Age Group",
-    plot_bgcolor="#282a36",
-    paper_bgcolor="#282a36",
-    font=dict(size=14, family="Consolas"),  # Set the font family for the entire plot
-)
+        # Concatenate df_2030 to df
+        df_combined = pd.concat([df, df_2030], ignore_index=True)
 
-# Update axis labels and rotate x-axis tick labels
-fig.update_xaxes(title_text="", tickangle=45, tickfont=dict(family="Consolas"))
-fig.update_yaxes(title_text="", showticklabels=True, tickfont=dict(family="Consolas"))
-fig.update_yaxes(title_text="", range=[0, 400000])
-
-# Add footer annotation
-fig.add_annotation(
-    text="Source: Statistics NZ",
-    xref="paper",
-    yref="paper",
-    x=1.05,
-    y=-0.14,
-    showarrow=False,
-    font=dict(size=12, color="white", family="Consolas"),
-)
+        # Apply the relabeling function to the 'Age' column
+        df_combined["Age"] = df_combined["Age"].apply(
+            lambda age: "90+" if age == "90 Years and over" else age
+        )
+
+        # Define the years of interest for plotting (excluding 2018)
+        years = [1996, 2006, 2023, 2030]
 
-fig.show()
+        show_cached_figure(build_population_by_age_figure, df_combined, years)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import sys
+
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+sys.path.append(os.path.join(PROJECT_PATH, ".."))
+from cache_utils import evict_least_recent, function_source, update_digest
+
+# Figure JSON of every chart shown with show_cached_figure, keyed on its inputs
+CACHE_PATH = os.path.join(PROJECT_PATH, "data", "interim", "render_cache")
+
+# Total size above which the least recently shown figures are dropped
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def figure_key(build, args=(), params=None):
+    """
+    Content hash of everything a plotly chart depends on: the frames and other arguments
+    passed to the function building it, the source of that function, the default
+    template and the plotly version.
+
+    Parameters:
+        build (callable): Function returning the figure.
+        args (tuple): Positional arguments of build; frames are hashed by content.
+        params (dict, optional): Keyword arguments of build (reprs are hashed).
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha1(function_source(build).encode())
+    for arg in args:
+        update_digest(digest, arg)
+    digest.update(repr(sorted((params or {}).items())).encode())
+    import plotly
+    import plotly.io as pio
+
+    digest.update(f"{pio.templates.default}-{plotly.__version__}".encode())
+    return digest.hexdigest()
+
+
+def evict_figures(directory=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+    """
+    Drops the least recently shown figures until the cache fits in max_bytes.
+
+    Parameters:
+        directory (str): Folder holding the cached figures.
+        max_bytes (int): Size limit of the folder.
+
+    Returns:
+        list: The keys that were dropped.
+    """
+    return evict_least_recent(directory, ".json", max_bytes)
+
+
+def show_cached_figure(build, *args, **params):
+    """
+    Shows the plotly figure returned by build(*args, **params), reusing the figure JSON
+    of an earlier run with the same inputs instead of building and validating it again.
+
+    A cached figure is shown without validation, and its modification time is refreshed
+    so the least recently shown figures are evicted first.
+
+    Parameters:
+        build (callable): Function returning the figure.
+        *args: Positional arguments of build (e.g. the frames plotted).
+        **params: Keyword arguments of build.
+    """
+    import plotly.io as pio
+
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    path = os.path.join(CACHE_PATH, f"{figure_key(build, args, params)}.json")
+
+    # The entry may be evicted by another process while it is read, then it is rebuilt
+    try:
+        with open(path) as f:
+            figure = json.load(f)
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    else:
+        pio.show(figure, validate=False)
+        return
+
+    fig = build(*args, **params)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(fig.to_json())
+    os.replace(tmp_path, path)
+    evict_figures()
+    fig.show()
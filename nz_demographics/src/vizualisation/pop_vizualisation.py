@@ -1,526 +1,605 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import sys
+
+# matplotlib, seaborn and pywaffle are imported by the charts that use them, so drawing
+# one chart (e.g. python cli.py plot generation-heatmap) does not load all of them
+sys.path.append("../../..")
+sys.path.append("../data")
+from chart_utils import chart_selected
+from region_utils import RegionRegistry
+from schema_utils import PROPORTIONAL_GENERATIONS
+from store_utils import read_dataset
+
+# Region names below use a different spelling to the processed data, so filters
+# compare canonical names
+region_registry = RegionRegistry()
 
 ###########################################################################
 # Bar plot of boomers across time
+if chart_selected("boomers-by-age"):
+    import matplotlib.pyplot as plt
 
-# Load the dataset
-df = pd.read_csv("../../data/processed/pop_estimate_processed_nz.csv", sep=",")
+    # Load the dataset
+    df = read_dataset(
+        "../../data/processed/pop_estimate", filters=[("Region_Type", "==", "Total")]
+    )
 
-# Define the years of interest for plotting
-years = [1996, 2006, 2018, 2023]
+    # Define the years of interest for plotting
+    years = [1996, 2006, 2018, 2023]
 
-# Set up the figure for plotting 4 bar plots in a 2x2 grid
-fig, axes = plt.subplots(
-    nrows=2, ncols=2, figsize=(14, 10), sharey=True
-)  # sharey to have uniform scale on y-axis
+    # Set up the figure for plotting 4 bar plots in a 2x2 grid
+    fig, axes = plt.subplots(
+        nrows=2, ncols=2, figsize=(14, 10), sharey=True
+    )  # sharey to have uniform scale on y-axis
 
-for i, year in enumerate(years):
-    # Select subplot
-    ax = axes[i // 2, i % 2]
+    for i, year in enumerate(years):
+        # Select subplot
+        ax = axes[i // 2, i % 2]
 
-    # Filter data for the specific year
-    year_data = df[df["Year"] == year]
+        # Filter data for the specific year
+        year_data = df[df["Year"] == year]
 
-    # Determine bar colors based on '65 and over' condition
-    colors = [
-        "orange" if over_65 else "skyblue" for over_65 in year_data["65 and over"]
-    ]
+        # Determine bar colors based on '65 and over' condition
+        colors = [
+            "orange" if over_65 else "skyblue" for over_65 in year_data["65 and over"]
+        ]
 
-    # Determine hatch patterns based on 'Generation' being 'Baby Boomer'
-    hatches = ["//" if gen == "Baby Boomer" else "" for gen in year_data["Generation"]]
+        # Determine hatch patterns based on 'Generation' being 'Baby Boomer'
+        hatches = [
+            "//" if gen == "Baby Boomer" else "" for gen in year_data["Generation"]
+        ]
 
-    # Create each bar individually to apply hatches
-    bars = ax.bar(year_data["Age"], year_data["Population"], color=colors)
+        # Create each bar individually to apply hatches
+        bars = ax.bar(year_data["Age"], year_data["Population"], color=colors)
 
-    # Apply hatches to each bar
-    for bar, hatch in zip(bars, hatches):
-        bar.set_hatch(hatch)
+        # Apply hatches to each bar
+        for bar, hatch in zip(bars, hatches):
+            bar.set_hatch(hatch)
 
-    # Set titles and labels
-    ax.set_title(f"Population by Age in {year}")
-    ax.set_xlabel("Age")
-    ax.set_ylabel("Population")
+        # Set titles and labels
+        ax.set_title(f"Population by Age in {year}")
+        ax.set_xlabel("Age")
+        ax.set_ylabel("Population")
+
+    # Show the plot
+    plt.tight_layout()
+    plt.show()
+
+
+# Calculate the correlation over the years for each region (boomers vs millenials)
+def calculate_correlation(group):
+    if len(group["Boomer_Population"]) > 1 and len(group["Millennial_Population"]) > 1:
+        return group["Boomer_Population"].corr(group["Millennial_Population"])
+    else:
+        return None
 
-# Show the plot
-plt.tight_layout()
-plt.show()
 
 ###########################################################################
 # Small multiple plot of boomers vs millenials across time by region
-df = pd.read_csv("../../data/processed/pop_estimate_processed.csv", sep=",")
+if chart_selected("boomer-millennial-multiples"):
+    import matplotlib.pyplot as plt
 
+    df = read_dataset(
+        "../../data/processed/pop_estimate",
+        columns=["Region", "Year", "Generation", "Population"],
+    )
 
-# Filter the DataFrame for Boomers and Millennials
-filtered_df = df[df["Generation"].isin(["Baby Boomer", "Millennial"])]
 
-# Pivot the DataFrame to compare Population for Boomers and Millennials
-comparison_df = filtered_df.pivot_table(
-    index=["Region", "Year"], columns="Generation", values="Population", aggfunc="sum"
-).reset_index()
+    # Filter the DataFrame for Boomers and Millennials
+    filtered_df = df[df["Generation"].isin(["Baby Boomer", "Millennial"])]
+
+    # Pivot the DataFrame to compare Population for Boomers and Millennials
+    comparison_df = filtered_df.pivot_table(
+        index=["Region", "Year"],
+        columns="Generation",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
+    ).reset_index()
+
+    # Rename columns for clarity
+    comparison_df.columns.name = None
+    comparison_df.rename(
+        columns={
+            "Baby Boomer": "Boomer_Population",
+            "Millennial": "Millennial_Population",
+        },
+        inplace=True,
+    )
 
-# Rename columns for clarity
-comparison_df.columns.name = None
-comparison_df.rename(
-    columns={"Baby Boomer": "Boomer_Population", "Millennial": "Millennial_Population"},
-    inplace=True,
-)
+    # Apply the correlation calculation for each region
+    correlations = (
+        comparison_df.groupby("Region", observed=True)
+        .apply(lambda group: calculate_correlation(group))
+        .reset_index(name="Correlation")
+    )
 
+    correlations.sort_values(by="Correlation", ascending=False).head(20)
+
+    # multiples plot
+    comparison_df = read_dataset("../../data/processed/pop_estimate_shares")
+
+    comparison_df[
+        (comparison_df["Year"] == 2023)
+        & (comparison_df["Boomer_Share"] > 0.19)
+        & (comparison_df["Millennial_Share"] > 0.19)
+        & (
+            comparison_df["Region"]
+            != region_registry.canonical("Area outside territorial authority")
+        )
+        & (
+            comparison_df["Region"]
+            != region_registry.canonical("Chatham Islands territory")
+        )
+    ]["Region"].unique()
+
+    comparison_df[
+        (comparison_df["Year"] == 2023)
+        & (comparison_df["Millennial_Boomer_Share"] > 0.43)
+        & (
+            comparison_df["Region"]
+            != region_registry.canonical("Area outside territorial authority")
+        )
+        & (
+            comparison_df["Region"]
+            != region_registry.canonical("Chatham Islands territory")
+        )
+    ]["Region"].unique()
+
+    # Specify the list of 16 regions
+    regions = [
+        "Ashburton district",
+        "Central Otago district",
+        "Devonport-Takapuna local board area",
+        "Hastings district",
+        "Hibiscus and Bays local board area",
+        "Invercargill city",
+        "Mackenzie district",
+        "Nelson city",
+        "New Plymouth district",
+        "Orakei local board area",
+        "Otorohanga district",
+        "Rodney local board area",
+        "South Taranaki district",
+        "Southland district",
+        "Tauranga city",
+        "Waiheke local board area",
+    ]
 
-# Calculate the correlation over the years for each region
-def calculate_correlation(group):
-    if len(group["Boomer_Population"]) > 1 and len(group["Millennial_Population"]) > 1:
-        return group["Boomer_Population"].corr(group["Millennial_Population"])
+    # boomer + millenials are greater than 43%
+    regions = [
+        "Aotea/Great Barrier local board area",
+        "Buller district",
+        "Central Otago district",
+        "Hauraki district",
+        "Hurunui district",
+        "Kaikoura district",
+        "Kaipara district",
+        "Mackenzie district",
+        "Marlborough district",
+        "Queenstown-Lakes district",
+        "South Wairarapa district",
+        "Thames-Coromandel district",
+        "Waiheke local board area",
+        "Waimate district",
+        "Waitaki district",
+        "Waitemata local board area",
+    ]
+    regions = region_registry.canonical(regions)
+
+    # Filter the DataFrame for the specified regions
+    filtered_comparison_df = comparison_df[comparison_df["Region"].isin(regions)]
+
+    # Create the small multiples plot
+    # Could show the other generations in grey in background (Gen X and Gen Z)
+    import seaborn as sns
+
+    fig, axes = plt.subplots(4, 4, figsize=(20, 15), sharex=True, sharey=True)
+    axes = axes.flatten()
+
+    for i, region in enumerate(regions):
+        ax = axes[i]
+        region_data = filtered_comparison_df[filtered_comparison_df["Region"] == region]
+        sns.lineplot(
+            x="Year", y="Boomer_Share", data=region_data, ax=ax, label="Boomer Share"
+        )
+        sns.lineplot(
+            x="Year",
+            y="Millennial_Share",
+            data=region_data,
+            ax=ax,
+            label="Millennial Share",
+        )
+        ax.set_title(region)
+        ax.set_xlabel("")
+        ax.set_ylabel("Population Share")
+
+    # Adjust the layout and display the plot
+    plt.tight_layout()
+    plt.show()
+
+###########################################################################
+# waffle plot of boomers, genz, and millenials amongst population for different regions - show the extremes and largest population regions for 2023
+if chart_selected("waffle"):
+    import matplotlib.pyplot as plt
+    from pywaffle import Waffle
+
+    # Load the dataset, using generation totals with age bands split proportionally
+    # across generations if schema_utils.PROPORTIONAL_GENERATIONS is set (see
+    # allocate_generations in 002_nz_demographics_transform.py)
+    if PROPORTIONAL_GENERATIONS:
+        df_waffle = read_dataset(
+            "../../data/processed/pop_estimate_generations",
+            filters=[("Year", "==", 2023)],
+        )
     else:
-        return None
+        df_waffle = read_dataset(
+            "../../data/processed/pop_estimate", filters=[("Year", "==", 2023)]
+        )
+
+    # NZ total only
+    df_waffle_nz = df_waffle[
+        (df_waffle["Region"] == "Total, New Zealand")
+        & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
+    ].copy()
+
+    # Pivot the DataFrame using pivot_table
+    df_waffle_nz = df_waffle_nz.pivot_table(
+        index="Generation",
+        columns="Region",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
+    )
 
+    # Waffle plot
+    df_plot = df_waffle_nz.copy()
+
+    # Calculate the total sum for the percentage calculation
+    total_population = df_plot["Total, New Zealand"].sum()
+
+    # Prepare plot details
+    plot = {
+        # Convert actual number to a reasonable block number
+        "values": [value / 100000 for value in df_plot["Total, New Zealand"].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot["Total, New Zealand"])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": "Total, New Zealand", "loc": "left", "fontsize": 12},
+    }
+
+    # Create the Waffle Chart
+    fig = plt.figure(
+        FigureClass=Waffle,
+        plots={311: plot},
+        rows=5,  # Number of rows
+        cmap_name="Accent",  # Color map name
+        rounding_rule="ceil",  # Rounding rule for values
+        figsize=(8, 6),  # Figure size
+    )
 
-# Apply the correlation calculation for each region
-correlations = (
-    comparison_df.groupby("Region")
-    .apply(lambda group: calculate_correlation(group))
-    .reset_index(name="Correlation")
-)
-
-correlations.sort_values(by="Correlation", ascending=False).head(20)
-
-# multiples plot
-comparison_df = pd.read_csv(
-    "../../data/processed/pop_estimate_shares_processed.csv", sep=","
-)
-
-comparison_df[
-    (comparison_df["Year"] == 2023)
-    & (comparison_df["Boomer_Share"] > 0.19)
-    & (comparison_df["Millennial_Share"] > 0.19)
-    & (comparison_df["Region"] != "Area outside territorial authority")
-    & (comparison_df["Region"] != "Chatham Islands territory")
-]["Region"].unique()
-
-comparison_df[
-    (comparison_df["Year"] == 2023)
-    & (comparison_df["Millennial_Boomer_Share"] > 0.43)
-    & (comparison_df["Region"] != "Area outside territorial authority")
-    & (comparison_df["Region"] != "Chatham Islands territory")
-]["Region"].unique()
-
-# Specify the list of 16 regions
-regions = [
-    "Ashburton district",
-    "Central Otago district",
-    "Devonport-Takapuna local board area",
-    "Hastings district",
-    "Hibiscus and Bays local board area",
-    "Invercargill city",
-    "Mackenzie district",
-    "Nelson city",
-    "New Plymouth district",
-    "Orakei local board area",
-    "Otorohanga district",
-    "Rodney local board area",
-    "South Taranaki district",
-    "Southland district",
-    "Tauranga city",
-    "Waiheke local board area",
-]
-
-# boomer + millenials are greater than 43%
-regions = [
-    "Aotea/Great Barrier local board area",
-    "Buller district",
-    "Central Otago district",
-    "Hauraki district",
-    "Hurunui district",
-    "Kaikoura district",
-    "Kaipara district",
-    "Mackenzie district",
-    "Marlborough district",
-    "Queenstown-Lakes district",
-    "South Wairarapa district",
-    "Thames-Coromandel district",
-    "Waiheke local board area",
-    "Waimate district",
-    "Waitaki district",
-    "Waitemata local board area",
-]
-
-# Filter the DataFrame for the specified regions
-filtered_comparison_df = comparison_df[comparison_df["Region"].isin(regions)]
-
-# Create the small multiples plot
-# Could show the other generations in grey in background (Gen X and Gen Z)
-fig, axes = plt.subplots(4, 4, figsize=(20, 15), sharex=True, sharey=True)
-axes = axes.flatten()
-
-for i, region in enumerate(regions):
-    ax = axes[i]
-    region_data = filtered_comparison_df[filtered_comparison_df["Region"] == region]
-    sns.lineplot(
-        x="Year", y="Boomer_Share", data=region_data, ax=ax, label="Boomer Share"
+    # Display the chart
+    plt.show()
+
+    # NZ + other regions waffle plot
+    region_1 = "Thames-Coromandel district"
+    region_2 = "Queenstown-Lakes district"
+    region_3 = "Waitemata local board area"
+    scale_factor = 1000
+    region_1, region_2, region_3 = region_registry.canonical(
+        [region_1, region_2, region_3]
     )
-    sns.lineplot(
-        x="Year",
-        y="Millennial_Share",
-        data=region_data,
-        ax=ax,
-        label="Millennial Share",
+
+    df_waffle_region = df_waffle[
+        (df_waffle["Region"].isin([region_1, region_2, region_3]))
+        & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
+    ].copy()
+
+    # Pivot the DataFrame using pivot_table
+    df_waffle_region = df_waffle_region.pivot_table(
+        index="Generation",
+        columns="Region",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
     )
-    ax.set_title(region)
-    ax.set_xlabel("")
-    ax.set_ylabel("Population Share")
 
-# Adjust the layout and display the plot
-plt.tight_layout()
-plt.show()
+    df_plot = df_waffle_region.copy()
+
+    # Calculate the total sum for the percentage calculation
+    total_population = df_plot[region_1].sum()
+
+    plot1 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_1].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_1])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_1, "loc": "left", "fontsize": 12},
+    }
+
+    total_population = df_plot[region_2].sum()
+
+    plot2 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_2].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_2])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_2, "loc": "left", "fontsize": 12},
+    }
+
+    total_population = df_plot[region_3].sum()
+
+    plot3 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_3].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_3])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_3, "loc": "left", "fontsize": 12},
+    }
+
+    fig = plt.figure(
+        FigureClass=Waffle,
+        plots={
+            311: plot1,
+            312: plot2,
+            313: plot3,
+        },
+        rows=5,  # Outside parameter applied to all subplots, same as below
+        cmap_name="Accent",  # Change color with cmap
+        rounding_rule="ceil",  # Change rounding rule, so value less than 1000 will still have at least 1 block
+        figsize=(8, 6),
+    )
 
-###########################################################################
-# waffle plot of boomers, genz, and millenials amongst population for different regions - show the extremes and largest population regions for 2023
+    # Add a title and a small detail at the bottom
+    fig.suptitle("Population demographics by region", fontsize=14, fontweight="bold")
+    fig.supxlabel(
+        "1 block = 1k people",
+        fontsize=8,
+        x=0.14,  # position at the 14% axis
+    )
+    fig.set_facecolor("#EEEDE7")
+
+    plt.show()
+
+    # NZ + main centres waffle plot
+    region_1 = "Wellington city"
+    region_2 = "Auckland"
+    region_3 = "Christchurch city"
+    scale_factor = 10000
+    region_1, region_2, region_3 = region_registry.canonical(
+        [region_1, region_2, region_3]
+    )
+
+    df_waffle_region = df_waffle[
+        (df_waffle["Region"].isin([region_1, region_2, region_3]))
+        & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
+    ].copy()
+
+    # Pivot the DataFrame using pivot_table
+    df_waffle_region = df_waffle_region.pivot_table(
+        index="Generation",
+        columns="Region",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
+    )
+
+    df_plot = df_waffle_region.copy()
+
+    # Calculate the total sum for the percentage calculation
+    total_population = df_plot[region_1].sum()
+
+    plot1 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_1].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_1])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_1, "loc": "left", "fontsize": 12},
+    }
+
+    total_population = df_plot[region_2].sum()
+
+    plot2 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_2].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_2])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_2, "loc": "left", "fontsize": 12},
+    }
+
+    total_population = df_plot[region_3].sum()
+
+    plot3 = {
+        # Convert actual number to a reasonable block number
+        "values": [value / scale_factor for value in df_plot[region_3].tolist()],
+        # Change labels to display the percentage of the whole
+        "labels": [
+            f"{index} ({value/total_population:.1%})"
+            for index, value in zip(df_plot.index, df_plot[region_3])
+        ],
+        "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
+        "title": {"label": region_3, "loc": "left", "fontsize": 12},
+    }
+
+    fig = plt.figure(
+        FigureClass=Waffle,
+        plots={
+            311: plot1,
+            312: plot2,
+            313: plot3,
+        },
+        rows=5,  # Outside parameter applied to all subplots, same as below
+        cmap_name="Accent",  # Change color with cmap
+        rounding_rule="ceil",  # Change rounding rule, so value less than 1000 will still have at least 1 block
+        figsize=(8, 6),
+    )
 
-import matplotlib.pyplot as plt
-from pywaffle import Waffle
-import pandas as pd
-
-# Load the dataset
-df_waffle = pd.read_csv("../../data/processed/pop_estimate_processed_2023.csv", sep=",")
-
-# NZ total only
-df_waffle_nz = df_waffle[
-    (df_waffle["Region"] == "Total, New Zealand")
-    & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
-].copy()
-
-# Pivot the DataFrame using pivot_table
-df_waffle_nz = df_waffle_nz.pivot_table(
-    index="Generation", columns="Region", values="Population", aggfunc="sum"
-)
-
-# Waffle plot
-df_plot = df_waffle_nz.copy()
-
-# Calculate the total sum for the percentage calculation
-total_population = df_plot["Total, New Zealand"].sum()
-
-# Prepare plot details
-plot = {
-    # Convert actual number to a reasonable block number
-    "values": [value / 100000 for value in df_plot["Total, New Zealand"].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot["Total, New Zealand"])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": "Total, New Zealand", "loc": "left", "fontsize": 12},
-}
-
-# Create the Waffle Chart
-fig = plt.figure(
-    FigureClass=Waffle,
-    plots={311: plot},
-    rows=5,  # Number of rows
-    cmap_name="Accent",  # Color map name
-    rounding_rule="ceil",  # Rounding rule for values
-    figsize=(8, 6),  # Figure size
-)
-
-# Display the chart
-plt.show()
-
-# NZ + other regions waffle plot
-region_1 = "Thames-Coromandel district"
-region_2 = "Queenstown-Lakes district"
-region_3 = "Waitemata local board area"
-scale_factor = 1000
-
-df_waffle_region = df_waffle[
-    (df_waffle["Region"].isin([region_1, region_2, region_3]))
-    & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
-].copy()
-
-# Pivot the DataFrame using pivot_table
-df_waffle_region = df_waffle_region.pivot_table(
-    index="Generation", columns="Region", values="Population", aggfunc="sum"
-)
-
-df_plot = df_waffle_region.copy()
-
-# Calculate the total sum for the percentage calculation
-total_population = df_plot[region_1].sum()
-
-plot1 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_1].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_1])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_1, "loc": "left", "fontsize": 12},
-}
-
-total_population = df_plot[region_2].sum()
-
-plot2 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_2].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_2])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_2, "loc": "left", "fontsize": 12},
-}
-
-total_population = df_plot[region_3].sum()
-
-plot3 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_3].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_3])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_3, "loc": "left", "fontsize": 12},
-}
-
-fig = plt.figure(
-    FigureClass=Waffle,
-    plots={
-        311: plot1,
-        312: plot2,
-        313: plot3,
-    },
-    rows=5,  # Outside parameter applied to all subplots, same as below
-    cmap_name="Accent",  # Change color with cmap
-    rounding_rule="ceil",  # Change rounding rule, so value less than 1000 will still have at least 1 block
-    figsize=(8, 6),
-)
-
-# Add a title and a small detail at the bottom
-fig.suptitle("Population demographics by region", fontsize=14, fontweight="bold")
-fig.supxlabel(
-    "1 block = 1k people",
-    fontsize=8,
-    x=0.14,  # position at the 14% axis
-)
-fig.set_facecolor("#EEEDE7")
-
-plt.show()
-
-# NZ + main centres waffle plot
-region_1 = "Wellington city"
-region_2 = "Auckland"
-region_3 = "Christchurch city"
-scale_factor = 10000
-
-df_waffle_region = df_waffle[
-    (df_waffle["Region"].isin([region_1, region_2, region_3]))
-    & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
-].copy()
-
-# Pivot the DataFrame using pivot_table
-df_waffle_region = df_waffle_region.pivot_table(
-    index="Generation", columns="Region", values="Population", aggfunc="sum"
-)
-
-df_plot = df_waffle_region.copy()
-
-# Calculate the total sum for the percentage calculation
-total_population = df_plot[region_1].sum()
-
-plot1 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_1].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_1])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_1, "loc": "left", "fontsize": 12},
-}
-
-total_population = df_plot[region_2].sum()
-
-plot2 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_2].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_2])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_2, "loc": "left", "fontsize": 12},
-}
-
-total_population = df_plot[region_3].sum()
-
-plot3 = {
-    # Convert actual number to a reasonable block number
-    "values": [value / scale_factor for value in df_plot[region_3].tolist()],
-    # Change labels to display the percentage of the whole
-    "labels": [
-        f"{index} ({value/total_population:.1%})"
-        for index, value in zip(df_plot.index, df_plot[region_3])
-    ],
-    "legend": {"loc": "upper left", "bbox_to_anchor": (1.05, 1), "fontsize": 8},
-    "title": {"label": region_3, "loc": "left", "fontsize": 12},
-}
-
-fig = plt.figure(
-    FigureClass=Waffle,
-    plots={
-        311: plot1,
-        312: plot2,
-        313: plot3,
-    },
-    rows=5,  # Outside parameter applied to all subplots, same as below
-    cmap_name="Accent",  # Change color with cmap
-    rounding_rule="ceil",  # Change rounding rule, so value less than 1000 will still have at least 1 block
-    figsize=(8, 6),
-)
-
-# Add a title and a small detail at the bottom
-fig.suptitle("Population demographics by region", fontsize=14, fontweight="bold")
-fig.supxlabel(
-    "1 block = 10k people",
-    fontsize=8,
-    x=0.14,  # position at the 14% axis
-)
-fig.set_facecolor("#EEEDE7")
-
-plt.show()
+    # Add a title and a small detail at the bottom
+    fig.suptitle("Population demographics by region", fontsize=14, fontweight="bold")
+    fig.supxlabel(
+        "1 block = 10k people",
+        fontsize=8,
+        x=0.14,  # position at the 14% axis
+    )
+    fig.set_facecolor("#EEEDE7")
+
+    plt.show()
 
 ###########################################################################
 # Waffle function with Icon
+if chart_selected("waffle"):
+    # colorblind_palette = sns.color_palette("colorblind").as_hex()
+    # pastel_palette = sns.color_palette("colorblind").as_hex()
+    # print(colorblind_palette)
+    # cmap accent =['#7fc97f', '#beaed4', '#fdc086', '#bf5b17', '#386cb0']
+    # pastel = ['#0173b2', '#de8f05', '#029e73', '#d55e00', '#ece133']
+
+    import matplotlib.patches as mpatches  # for the legend
+    import matplotlib.pyplot as plt
+
+    # NZ + other regions waffle plot
+    region_1 = "Thames-Coromandel district"
+    region_2 = "Queenstown-Lakes district"
+    region_3 = "Waitemata local board area"
+    scale_factor = 1000
+    region_1, region_2, region_3 = region_registry.canonical(
+        [region_1, region_2, region_3]
+    )
 
-# colorblind_palette = sns.color_palette("colorblind").as_hex()
-# pastel_palette = sns.color_palette("colorblind").as_hex()
-# print(colorblind_palette)
-# cmap accent =['#7fc97f', '#beaed4', '#fdc086', '#bf5b17', '#386cb0']
-# pastel = ['#0173b2', '#de8f05', '#029e73', '#d55e00', '#ece133']
-
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches  # for the legend
-from pywaffle import Waffle
-import pandas as pd
-
-# NZ + other regions waffle plot
-region_1 = "Thames-Coromandel district"
-region_2 = "Queenstown-Lakes district"
-region_3 = "Waitemata local board area"
-scale_factor = 1000
-
-df_waffle_region = df_waffle[
-    (df_waffle["Region"].isin([region_1, region_2, region_3]))
-    & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
-].copy()
-
-# Pivot the DataFrame using pivot_table
-df_waffle_region = df_waffle_region.pivot_table(
-    index="Generation", columns="Region", values="Population", aggfunc="sum"
-)
-
-
-df_plot = df_waffle_region.copy()
-
-
-number_of_bars = len(df_plot.columns)  # one bar per year
-
-
-BLUE = "#0173b2"
-RED = "#de8f05"
-GREEN = "#029e73"
-YELLOW = "#ece133"
-PINK = "#cc78bc"
-colors = [BLUE, RED, GREEN, YELLOW, PINK]
-# colors=['#4a7493', '#b6a57a', '#5a7d6d', '#a3735a', '#b3b179']
-
-# Init the whole figure and axes
-fig, axs = plt.subplots(
-    nrows=1,
-    ncols=3,
-    figsize=(10, 6),
-)
-
-# Iterate over each bar and create it
-for i, ax in enumerate(axs):
-
-    col_name = df_plot.columns[i]
-    values = df_plot[col_name] / 1000  # values from the i-th column
-    # values = df_plot[col_name]   # values from the i-th column
-
-    Waffle.make_waffle(
-        ax=ax,  # pass axis to make_waffle
-        rows=20,
-        columns=5,
-        values=values,
-        title={"label": col_name, "loc": "left"},
-        colors=colors,
-        vertical=True,
-        # icons='person',
-        # font_size=0.01,  # size of each point
-        # icon_legend=True,
-        legend={"loc": "upper left", "bbox_to_anchor": (1, 1)},
+    df_waffle_region = df_waffle[
+        (df_waffle["Region"].isin([region_1, region_2, region_3]))
+        & (df_waffle["Generation"] != "Other")  # Remove under 15 year olds
+    ].copy()
+
+    # Pivot the DataFrame using pivot_table
+    df_waffle_region = df_waffle_region.pivot_table(
+        index="Generation",
+        columns="Region",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
     )
 
-# Add a title
-fig.suptitle(
-    "Population Demographics by Region", fontsize=14, fontweight="bold", ha="right"
-)
 
+    df_plot = df_waffle_region.copy()
 
-# Add a legend
-legend_labels = df_plot.index
-legend_elements = [
-    mpatches.Patch(color=colors[i], label=legend_labels[i]) for i in range(len(colors))
-]
-fig.legend(
-    handles=legend_elements,
-    loc="upper right",
-    title="Generation",
-    bbox_to_anchor=(1.04, 0.9),
-)
 
-plt.subplots_adjust(right=0.85, wspace=0.5)
-plt.show()
+    number_of_bars = len(df_plot.columns)  # one bar per year
+
+
+    BLUE = "#0173b2"
+    RED = "#de8f05"
+    GREEN = "#029e73"
+    YELLOW = "#ece133"
+    PINK = "#cc78bc"
+    colors = [BLUE, RED, GREEN, YELLOW, PINK]
+    # colors=['#4a7493', '#b6a57a', '#5a7d6d', '#a3735a', '#b3b179']
+
+    # Init the whole figure and axes
+    fig, axs = plt.subplots(
+        nrows=1,
+        ncols=3,
+        figsize=(10, 6),
+    )
+
+    # Iterate over each bar and create it
+    for i, ax in enumerate(axs):
+
+        col_name = df_plot.columns[i]
+        values = df_plot[col_name] / 1000  # values from the i-th column
+        # values = df_plot[col_name]   # values from the i-th column
+
+        Waffle.make_waffle(
+            ax=ax,  # pass axis to make_waffle
+            rows=20,
+            columns=5,
+            values=values,
+            title={"label": col_name, "loc": "left"},
+            colors=colors,
+            vertical=True,
+            # icons='person',
+            # font_size=0.01,  # size of each point
+            # icon_legend=True,
+            legend={"loc": "upper left", "bbox_to_anchor": (1, 1)},
+        )
+
+    # Add a title
+    fig.suptitle(
+        "Population Demographics by Region", fontsize=14, fontweight="bold", ha="right"
+    )
 
-###########################################################################
-# Heat map of generation vs region with proportion as values
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+    # Add a legend
+    legend_labels = df_plot.index
+    legend_elements = [
+        mpatches.Patch(color=colors[i], label=legend_labels[i])
+        for i in range(len(colors))
+    ]
+    fig.legend(
+        handles=legend_elements,
+        loc="upper right",
+        title="Generation",
+        bbox_to_anchor=(1.04, 0.9),
+    )
 
-# Load the dataset
-df_heatmap = pd.read_csv(
-    "../../data/processed/pop_estimate_processed_2023.csv", sep=","
-)
+    plt.subplots_adjust(right=0.85, wspace=0.5)
+    plt.show()
 
-# Pivot the DataFrame using pivot_table
-df_heatmap_pivot = df_heatmap.pivot_table(
-    index="Region", columns="Generation", values="Population", aggfunc="sum"
-)
+###########################################################################
+# Heat map of generation vs region with proportion as values
+if chart_selected("generation-heatmap"):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-# Calculate the total population per region (sum across columns)
-region_totals = df_heatmap_pivot.sum(axis=1)
+    # Load the dataset
+    df_heatmap = read_dataset(
+        "../../data/processed/pop_estimate", filters=[("Year", "==", 2023)]
+    )
+
+    # Pivot the DataFrame using pivot_table
+    df_heatmap_pivot = df_heatmap.pivot_table(
+        index="Region",
+        columns="Generation",
+        values="Population",
+        aggfunc="sum",
+        observed=True,
+    )
 
-# Divide each value in the dataframe by the corresponding region total to get the population share
-df_heatmap_pivot_share = df_heatmap_pivot.div(region_totals, axis=0)
+    # Calculate the total population per region (sum across columns)
+    region_totals = df_heatmap_pivot.sum(axis=1)
 
-# Create the heatmap
-plt.figure(figsize=(14, 20))
-sns.heatmap(df_heatmap_pivot_share, annot=True, fmt=".2%", cmap="coolwarm")
-plt.title("Population Share by Generation and Region")
-plt.xlabel("Generation")
-plt.ylabel("Region")
-plt.show()
+    # Divide each value in the dataframe by the corresponding region total to get the population share
+    df_heatmap_pivot_share = df_heatmap_pivot.div(region_totals, axis=0)
 
+    # Create the heatmap
+    plt.figure(figsize=(14, 20))
+    sns.heatmap(df_heatmap_pivot_share, annot=True, fmt=".2%", cmap="coolwarm")
+    plt.title("Population Share by Generation and Region")
+    plt.xlabel("Generation")
+    plt.ylabel("Region")
+    plt.show()
 
 ###########################################################################
 # Plot a horizontal bar plot of boomer share by TA
@@ -0,0 +1,356 @@
+"""
+Stage runner for every project: each stage declares the files it reads and writes, and
+is only rerun when the content of its inputs or code changed since its last run.
+
+    python cli.py run                     # every stage that is out of date
+    python cli.py run cpi-plot            # a stage and the stages it depends on
+    python cli.py run --force cpi-transform
+
+A stage depends on the stages writing its inputs. Stages whose dependencies are done run
+concurrently, each in its own Python process started from the script's directory.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Content hashes of the last successful run of every stage
+STATE_PATH = os.path.join(ROOT, ".pipeline_state.json")
+
+CPI = "cpi_inflation_distribution"
+DEMOGRAPHICS = "nz_demographics"
+
+# Territorial authority boundaries: geopandas reads the shapefile and its sidecar files
+TA_SHAPEFILE = f"{DEMOGRAPHICS}/data/raw/territorial-authority-2023-generalised"
+SHAPEFILE_PARTS = [".shp", ".shx", ".dbf", ".prj", ".cpg"]
+
+# Paths are relative to the repository root. "code" lists the folders (or files) of the
+# Python modules the script imports; "inputs" and "outputs" are files or folders.
+STAGES = {
+    "cpi-process": {
+        "script": f"{CPI}/src/data/001_process_data.py",
+        "code": [f"{CPI}/src/data"],
+        "inputs": [f"{CPI}/data/raw/nz_cpi_subgroup_2_2023q4.csv"],
+        "outputs": [f"{CPI}/data/interim/nz_cpi_group_3_vintages"],
+    },
+    "cpi-transform": {
+        "script": f"{CPI}/src/features/002_transform_data.py",
+        "code": [f"{CPI}/src/features", f"{CPI}/src/data"],
+        "inputs": [f"{CPI}/data/interim/nz_cpi_group_3_vintages"],
+        "outputs": [
+            f"{CPI}/data/processed/nz_cpi_group_3_apc",
+            f"{CPI}/data/processed/nz_cpi_group_3_growth.pkl",
+            f"{CPI}/data/processed/nz_cpi_group_3_stats.pkl",
+            f"{CPI}/data/processed/nz_cpi_group_3_movers.pkl",
+            f"{CPI}/data/processed/nz_cpi_group_3_core.pkl",
+            f"{CPI}/data/processed/nz_cpi_group_3_wasserstein.pkl",
+            f"{CPI}/data/processed/nz_cpi_group_3_ks.pkl",
+        ],
+    },
+    "cpi-plot": {
+        "script": f"{CPI}/src/visualization/003_visualize.py",
+        "code": [
+            f"{CPI}/src/visualization",
+            f"{CPI}/src/features",
+            "cache_utils.py",
+            "chart_utils.py",
+        ],
+        "inputs": [f"{CPI}/data/processed/nz_cpi_group_3_growth.pkl"],
+        "outputs": [f"{CPI}/reports/figures"],
+    },
+    "demographics-estimates": {
+        "script": f"{DEMOGRAPHICS}/src/data/001_nz_demographics_process_data.py",
+        "code": [f"{DEMOGRAPHICS}/src/data"],
+        "inputs": [f"{DEMOGRAPHICS}/data/raw/population_data_nz_20240417.csv"],
+        "outputs": [f"{DEMOGRAPHICS}/data/interim/pop_estimate_interim.csv"],
+    },
+    "demographics-projections": {
+        "script": f"{DEMOGRAPHICS}/src/data/001_nz_demographics_process_projections.py",
+        "code": [f"{DEMOGRAPHICS}/src/data"],
+        "inputs": [f"{DEMOGRAPHICS}/data/raw/pop_projections_TA2.csv"],
+        "outputs": [f"{DEMOGRAPHICS}/data/interim/pop_projection_interim.csv"],
+    },
+    "demographics-transform": {
+        "script": f"{DEMOGRAPHICS}/src/features/002_nz_demographics_transform.py",
+        "code": [f"{DEMOGRAPHICS}/src/features", f"{DEMOGRAPHICS}/src/data"],
+        "inputs": [
+            f"{DEMOGRAPHICS}/data/interim/pop_estimate_interim.csv",
+            f"{DEMOGRAPHICS}/data/raw/pop_projection_2030.csv",
+        ],
+        "outputs": [
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate",
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate_shares",
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate_generations",
+            f"{DEMOGRAPHICS}/data/processed/pop_projection_2030",
+        ],
+    },
+    "demographics-plot": {
+        "script": f"{DEMOGRAPHICS}/src/vizualisation/003_vizualisation.py",
+        "code": [
+            f"{DEMOGRAPHICS}/src/vizualisation",
+            f"{DEMOGRAPHICS}/src/features",
+            f"{DEMOGRAPHICS}/src/data",
+            "cache_utils.py",
+            "chart_utils.py",
+        ],
+        "inputs": [
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate",
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate_shares",
+            f"{DEMOGRAPHICS}/data/processed/pop_projection_2030",
+            *(TA_SHAPEFILE + part for part in SHAPEFILE_PARTS),
+            f"{DEMOGRAPHICS}/data/raw/home_ownership_generation.csv",
+            f"{DEMOGRAPHICS}/data/raw/detailed-monthly-march-2024-tla-tenancy.csv",
+        ],
+        # The charts are shown, not saved, so there are no files to check
+        "outputs": [],
+    },
+    "demographics-population-plot": {
+        "script": f"{DEMOGRAPHICS}/src/vizualisation/pop_vizualisation.py",
+        "code": [
+            f"{DEMOGRAPHICS}/src/vizualisation",
+            f"{DEMOGRAPHICS}/src/data",
+            "chart_utils.py",
+        ],
+        "inputs": [
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate",
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate_shares",
+            f"{DEMOGRAPHICS}/data/processed/pop_estimate_generations",
+        ],
+        # The charts are shown, not saved, so there are no files to check
+        "outputs": [],
+    },
+}
+
+
+def dependencies(stages=STAGES):
+    """
+    Find the stages each stage depends on: those writing one of its inputs (or a file
+    inside an input folder).
+
+    Parameters:
+    - stages (dict): Stage name -> {"script", "code", "inputs", "outputs"}.
+
+    Returns:
+    - dict: Stage name -> set of the names of its upstream stages.
+    """
+    writers = {
+        output: name for name, stage in stages.items() for output in stage["outputs"]
+    }
+    upstream = {}
+    for name, stage in stages.items():
+        upstream[name] = {
+            writer
+            for input_path in stage["inputs"]
+            for output, writer in writers.items()
+            if input_path == output or input_path.startswith(output + "/")
+        }
+    return upstream
+
+
+class Hasher:
+    """
+    Content hashes of files and folders, reusing the hash of a file whose size and
+    modification time did not change since it was last hashed.
+
+    Parameters:
+    - known (dict): Relative path -> [size, modification time (ns), hash] from a
+      previous run, updated in place.
+    """
+
+    def __init__(self, known):
+        self.known = known
+
+    def file(self, path):
+        stat = os.stat(os.path.join(ROOT, path))
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = self.known.get(path)
+        if entry is not None and entry[:2] == signature:
+            return entry[2]
+
+        digest = hashlib.sha1()
+        with open(os.path.join(ROOT, path), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.known[path] = signature + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def files(self, path, suffix=""):
+        # Relative paths of the files of a folder (or the file itself), sorted
+        full = os.path.join(ROOT, path)
+        if os.path.isfile(full):
+            return [path]
+        found = []
+        for directory, folders, names in os.walk(full):
+            folders[:] = sorted(f for f in folders if f != "__pycache__")
+            relative = os.path.relpath(directory, ROOT).replace(os.sep, "/")
+            found += [f"{relative}/{n}" for n in sorted(names) if n.endswith(suffix)]
+        return found
+
+    def paths(self, paths, suffix=""):
+        """
+        Hash files and folders together, including which of them are missing.
+
+        Parameters:
+        - paths (list): Files or folders, relative to the repository root.
+        - suffix (str): Only hash the files of folders with this suffix (e.g. ".py").
+
+        Returns:
+        - str: The hex digest.
+        """
+        digest = hashlib.sha1()
+        for path in paths:
+            if not os.path.exists(os.path.join(ROOT, path)):
+                digest.update(f"{path}:missing\n".encode())
+                continue
+            for file in self.files(path, suffix):
+                digest.update(f"{file}:{self.file(file)}\n".encode())
+        return digest.hexdigest()
+
+
+def stage_inputs_hash(stage, hasher):
+    """
+    Hash of everything a stage run depends on: its script, the modules it imports and
+    its input files.
+
+    Parameters:
+    - stage (dict): The stage from STAGES.
+    - hasher (Hasher): The file hasher.
+
+    Returns:
+    - str: The hex digest.
+    """
+    code = hasher.paths([stage["script"]] + stage["code"], suffix=".py")
+    return hashlib.sha1((code + hasher.paths(stage["inputs"])).encode()).hexdigest()
+
+
+def run_stage(name, stage):
+    """
+    Run a stage script in a new Python process from its own directory. Matplotlib uses
+    the non-interactive Agg backend unless MPLBACKEND is set, so charts are saved
+    without opening windows.
+
+    Parameters:
+    - name (str): The stage name.
+    - stage (dict): The stage from STAGES.
+
+    Returns:
+    - tuple: The stage name, exit code, combined output (str) and duration in seconds.
+    """
+    script = os.path.join(ROOT, stage["script"])
+    env = dict(os.environ)
+    env.setdefault("MPLBACKEND", "Agg")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.basename(script)],
+        cwd=os.path.dirname(script),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return name, result.returncode, result.stdout, time.perf_counter() - start
+
+
+def load_state(path=STATE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"files": {}, "stages": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(targets=None, force=(), workers=None, stages=STAGES):
+    """
+    Run the out-of-date stages among the targets and their upstream stages, in
+    dependency order with independent stages running concurrently.
+
+    A stage is skipped if the hash of its script, code and inputs matches its last
+    successful run and its outputs were not changed since. Stages downstream of a
+    failed stage are not run.
+
+    Parameters:
+    - targets (list, optional): Stage names to bring up to date. Defaults to all.
+    - force (list): Stage names to run even if they are up to date.
+    - workers (int, optional): Number of stages run at once. Defaults to the CPU count.
+    - stages (dict): Stage name -> {"script", "code", "inputs", "outputs"}.
+
+    Returns:
+    - dict: Stage name -> "ran", "skipped", "failed" or "blocked" (upstream failed).
+    """
+    upstream = dependencies(stages)
+    selected = set()
+    pending = list(targets or stages)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(upstream[name])
+
+    state = load_state()
+    hasher = Hasher(state["files"])
+    status = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        while len(status) < len(selected):
+            busy = {name for name, _ in running.values()}
+            for name in sorted(selected - set(status) - busy):
+                if not upstream[name] <= set(status):
+                    continue
+                if any(status[u] in ("failed", "blocked") for u in upstream[name]):
+                    status[name] = "blocked"
+                    print(f"[{name}] not run: an upstream stage failed")
+                    continue
+
+                stage = stages[name]
+                inputs_hash = stage_inputs_hash(stage, hasher)
+                previous = state["stages"].get(name, {})
+                unchanged = (
+                    previous.get("inputs") == inputs_hash
+                    and previous.get("outputs") == hasher.paths(stage["outputs"])
+                )
+                if unchanged and name not in force:
+                    status[name] = "skipped"
+                    print(f"[{name}] up to date")
+                    continue
+
+                print(f"[{name}] running {stage['script']}")
+                future = executor.submit(run_stage, name, stage)
+                running[future] = (name, inputs_hash)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, inputs_hash = running.pop(future)
+                _, code, output, seconds = future.result()
+                if output:
+                    print(output.rstrip("\n"))
+                if code != 0:
+                    status[name] = "failed"
+                    print(f"[{name}] failed (exit code {code}) after {seconds:.1f} s")
+                    continue
+
+                status[name] = "ran"
+                state["stages"][name] = {
+                    "inputs": inputs_hash,
+                    "outputs": hasher.paths(stages[name]["outputs"]),
+                }
+                save_state(state)
+                print(f"[{name}] done in {seconds:.1f} s")
+
+    save_state(state)
+    return status